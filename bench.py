@@ -0,0 +1,877 @@
+"""
+bench.py
+
+Micro-benchmarks for the storage layer. Each benchmark runs against a
+throwaway database in a temp directory, never against sbmotz.db.
+
+Run: python bench.py [name ...]
+With no names every benchmark is run.
+"""
+
+import asyncio
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+import db
+import inventory
+import response_cache
+
+
+def use_temp_db():
+    tmp = Path(tempfile.mkdtemp(prefix="sbmotz-bench-"))
+    db.DB_FILE = tmp / "bench.db"
+    return tmp
+
+
+def fake_sale(i):
+    return {"order_id": str(uuid.uuid4()), "session_id": str(uuid.uuid4()), "car_id": f"car-{i}", "price": 500000 + i, "timestamp": datetime.utcnow().isoformat()}
+
+
+def timed(fn, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def bench_row_writes(sizes=(1_000, 10_000, 50_000)):
+    """Checkout-style single-row write: whole-table rewrite vs db.insert_row."""
+    print("rows      rewrite (ms)   insert_row (ms)")
+    for size in sizes:
+        use_temp_db()
+        db.write_table("sales", pd.DataFrame([fake_sale(i) for i in range(size)]))
+
+        def rewrite():
+            sales = db.read_table("sales")
+            sales = pd.concat([sales, pd.DataFrame([fake_sale(size)])], ignore_index=True)
+            db.write_table("sales", sales)
+
+        rewrite_ms = timed(rewrite, repeat=5)
+        insert_ms = timed(lambda: db.insert_row("sales", fake_sale(size)))
+        print(f"{size:<9} {rewrite_ms:>12.2f}   {insert_ms:>15.2f}")
+
+
+def fake_request(path="/", headers=()):
+    """A bare Starlette request for calling endpoint functions directly."""
+    from starlette.requests import Request
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": b"",
+                    "headers": [(k.lower().encode(), v.encode()) for k, v in headers]})
+
+
+def load_server(cars=200):
+    """Import server.py against a temp database seeded with `cars` listings."""
+    os.chdir(use_temp_db())
+    import server
+    # what the server does at startup
+    server.init_data()
+    conn = db.get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO cars (id, make, model, year, price, mileage, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(f"bench-{i}", "Maruti", "Swift", 2015 + i % 9, 300000 + i, 1000 * i, "available") for i in range(cars)],
+        )
+    return server
+
+
+def bench_api_cars(threads=16, requests=400):
+    """/api/cars requests/sec from a thread pool, with a writer running alongside."""
+    server = load_server()
+    pooled = db.get_connection
+
+    def fresh_connection():
+        # what get_connection did before pooling: a new connection per call
+        return sqlite3.connect(db.DB_FILE, check_same_thread=False)
+
+    # journal_mode is stored in the file, so put it back to the default for the baseline
+    db.close_connections()
+    sqlite3.connect(db.DB_FILE).execute("PRAGMA journal_mode=DELETE").fetchone()
+
+    for label, factory in (("connect per call", fresh_connection), ("pooled + WAL", pooled)):
+        db.get_connection = factory
+        stop = threading.Event()
+        writes = [0]
+
+        def writer():
+            while not stop.is_set():
+                db.insert_row("contacts", {"contact_id": str(uuid.uuid4()), "name": "bench", "email": "", "message": "", "timestamp": datetime.utcnow().isoformat()})
+                writes[0] += 1
+
+        w = threading.Thread(target=writer)
+        w.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(lambda _: server.api_list_cars(fake_request()), range(requests)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        w.join()
+        print(f"{label:<18} {requests / elapsed:8.1f} req/s   writer {writes[0] / elapsed:8.1f} writes/s")
+    db.get_connection = pooled
+
+
+def bench_catalog_cache(cars=1_000, requests=2_000):
+    """Public catalog endpoints with the read cache bypassed vs in use."""
+    server = load_server(cars)
+    cached = db.cached
+
+    def uncached(table_name, name, build):
+        return build()
+
+    def catalog():
+        server.api_list_cars(fake_request())
+        server.list_cars(None)
+        server.get_social_links(fake_request())
+
+    for label, fn in (("read per request", uncached), ("read cache", cached)):
+        db.cached = fn
+        before = db.cache_stats()
+        ms = timed(catalog, repeat=requests // 3)
+        after = db.cache_stats()
+        print(f"{label:<18} {ms:8.3f} ms/round   hits {after['hits'] - before['hits']}   misses {after['misses'] - before['misses']}")
+    db.cached = cached
+
+
+def bench_catalog_page(sizes=(1_000, 10_000, 100_000), page=24):
+    """Available cars sorted by price: load everything in pandas vs one keyset page (first and 50th)."""
+    print("cars      full load (ms)   first page (ms)   page 50 (ms)")
+    for size in sizes:
+        use_temp_db()
+        db.init_db()
+        conn = db.get_connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO cars (id, make, model, year, price, mileage, status, type) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(f"bench-{i}", "Maruti", "Swift", 2010 + i % 14, 200000 + (i * 7919) % 900000, i, "available" if i % 4 else "sold", "suv" if i % 2 else "sedan")
+                 for i in range(size)],
+            )
+
+        def full_load():
+            cars = db.read_table("cars")
+            cars = cars[cars["status"] == "available"].sort_values(["price", "id"])
+            return cars.to_dict(orient="records")[:page]
+
+        def first_page():
+            return db.fetch_page("cars", where={"status": "available"}, order_by="price", limit=page)
+
+        cursor = None
+        for _ in range(49):
+            cursor = db.fetch_page("cars", where={"status": "available"}, order_by="price", limit=page, cursor=cursor)[1]
+        deep_ms = timed(lambda: db.fetch_page("cars", where={"status": "available"}, order_by="price", limit=page, cursor=cursor))
+        print(f"{size:<9} {timed(full_load, repeat=5):>14.2f}   {timed(first_page):>15.3f}   {deep_ms:>12.3f}")
+
+
+def bench_search(listings=100_000):
+    """Free-text search over synthetic listings: FTS5 ranked page vs LIKE scan vs pandas filtering."""
+    use_temp_db()
+    db.init_db()
+    rng = random.Random(7)
+    models = [("Hyundai", "Creta"), ("Hyundai", "Venue"), ("Maruti", "Swift"), ("Maruti", "Ertiga"), ("Tata", "Nexon"),
+              ("Kia", "Seltos"), ("Honda", "City"), ("Toyota", "Innova"), ("Mahindra", "XUV700"), ("MG", "Hector")]
+    colours = ["white", "red", "silver", "black", "blue", "grey"]
+    conn = db.get_connection()
+    start = time.perf_counter()
+    with conn:
+        conn.executemany(
+            "INSERT INTO cars (id, make, model, fuel, transmission, type, description, status, price) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(f"bench-{i}", *rng.choice(models), rng.choice(["Petrol", "Diesel", "CNG"]), rng.choice(["Manual", "Automatic"]),
+              rng.choice(["suv", "sedan", "hatchback"]), f"{rng.choice(colours)} {rng.choice(['single owner', 'well kept', 'company serviced'])}",
+              "available", 300000 + i) for i in range(listings)],
+        )
+    print(f"{listings} listings indexed in {time.perf_counter() - start:.1f} s")
+    cars = db.read_table("cars")
+
+    for text in ("white creta diesel automatic", "seltos", "hect", "silver company serviced innova"):
+        words = text.split()
+
+        def like_scan():
+            sql = "SELECT * FROM cars WHERE " + " AND ".join(
+                "(make || ' ' || model || ' ' || type || ' ' || fuel || ' ' || transmission || ' ' || description) LIKE ?" for _ in words)
+            return conn.execute(sql + " LIMIT 24", [f"%{w}%" for w in words]).fetchall()
+
+        def pandas_filter():
+            blob = (cars["make"] + " " + cars["model"] + " " + cars["type"] + " " + cars["fuel"] + " " + cars["transmission"] + " " + cars["description"]).str.lower()
+            mask = pd.Series(True, index=cars.index)
+            for w in words:
+                mask &= blob.str.contains(w, regex=False)
+            return cars[mask].head(24)
+
+        matches = conn.execute("SELECT COUNT(*) FROM cars_fts WHERE cars_fts MATCH ?", (db.match_expression(text),)).fetchone()[0]
+        fts_ms = timed(lambda: db.search_page("cars", text, limit=24))
+        print(f"{text!r:<34} {matches:6} hits   fts5 {fts_ms:7.2f} ms   LIKE {timed(like_scan, 5):7.2f} ms   pandas {timed(pandas_filter, 3):7.1f} ms")
+
+
+def bench_facets(cars=100_000):
+    """Filtered buy-page query with facet counts: DataFrame per request vs the columnar inventory index."""
+    use_temp_db()
+    db.init_db()
+    rng = random.Random(5)
+    conn = db.get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO cars (id, make, fuel, type, transmission, price, year, mileage, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(f"bench-{i}", rng.choice(["Hyundai", "Maruti", "Tata", "Kia", "Honda", "Toyota"]), rng.choice(["Petrol", "Diesel", "CNG"]),
+              rng.choice(["suv", "sedan", "hatchback"]), rng.choice(["Manual", "Automatic"]), rng.randrange(200000, 3000000),
+              rng.randrange(2010, 2024), rng.randrange(0, 150000), "available" if i % 5 else "sold") for i in range(cars)],
+        )
+    db.touch("cars")
+    categories = {"fuel": ["Diesel"], "type": ["suv"]}
+    ranges = {"price": (500000, 1500000), "year": (2016, None)}
+
+    def dataframe():
+        df = db.read_table("cars")
+        df = df[df["status"] == "available"]
+        masks = {
+            "fuel": df["fuel"].str.lower() == "diesel",
+            "type": df["type"].str.lower() == "suv",
+            "price": df["price"].between(500000, 1500000),
+            "year": df["year"] >= 2016,
+        }
+        result = {}
+        for col in ("make", "fuel", "type", "transmission"):
+            mask = pd.Series(True, index=df.index)
+            for other, m in masks.items():
+                if other != col:
+                    mask &= m
+            result[col] = df[mask][col].value_counts().to_dict()
+        return result
+
+    start = time.perf_counter()
+    inventory.get_index()
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"{cars} cars, index built in {build_ms:.1f} ms")
+    print(f"DataFrame per request   {timed(dataframe, 5):8.2f} ms")
+    print(f"inventory.query         {timed(lambda: inventory.query(categories, ranges)):8.2f} ms")
+
+
+def bench_checkout(cars=2_000, buyers=400, threads=16):
+    """Concurrent checkouts over overlapping carts: per-row helpers vs one conditional transaction."""
+    server = load_server(cars)
+
+    def unchecked(session_id):
+        # checkout as it was: read, then write each row in its own transaction
+        items = [row["car_id"] for row in db.fetch_rows("cart_items", ["car_id"], {"session_id": session_id})]
+        cars_df = db.read_table("cars")
+        for cid in items:
+            row = cars_df[cars_df["id"] == cid]
+            if row.empty or row.iloc[0]["status"] != "available":
+                continue
+            db.insert_row("sales", {"order_id": str(uuid.uuid4()), "session_id": session_id, "car_id": cid, "price": int(row.iloc[0]["price"]), "timestamp": datetime.utcnow().isoformat()})
+            db.update_rows("cars", {"id": cid}, {"status": "sold"})
+        db.delete_rows("cart_items", {"session_id": session_id})
+
+    def transactional(session_id):
+        server.checkout_cart(session_id)
+
+    rng = random.Random(1)
+    for label, fn in (("per-row helpers", unchecked), ("transaction", transactional)):
+        conn = db.get_connection()
+        with conn:
+            conn.execute("DELETE FROM sales")
+            conn.execute("DELETE FROM cart_items")
+            conn.execute("UPDATE cars SET status = 'available'")
+            # every buyer wants 3 of the same few hundred cars, so carts collide
+            conn.executemany(
+                "INSERT INTO cart_items (session_id, car_id) VALUES (?, ?)",
+                [(f"buyer-{b}", car_id) for b in range(buyers) for car_id in rng.sample([f"bench-{i}" for i in range(300)], 3)],
+            )
+        db.touch("cars", "sales", "cart_items")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(fn, [f"buyer-{b}" for b in range(buyers)]))
+        elapsed = time.perf_counter() - start
+        sales, sold = conn.execute("SELECT COUNT(*), COUNT(DISTINCT car_id) FROM sales").fetchone()
+        print(f"{label:<16} {buyers / elapsed:8.1f} checkouts/s   sales {sales:4}   cars sold twice {sales - sold}")
+
+def bench_holds(cars=2_000, hot=20, buyers=400, threads=16):
+    """Flash sale on a few hot cars: checkouts that fail at the end with and without cart holds, and held_cars() on the hot path."""
+    import holds
+    server = load_server(cars)
+    conn = db.get_connection()
+    rng = random.Random(1)
+    hot_ids = [f"bench-{i}" for i in range(hot)]
+    wanted = {f"buyer-{b}": rng.sample(hot_ids, 2) for b in range(buyers)}
+
+    def shop(session_id):
+        # add what's wanted; a buyer refused at add time shops elsewhere instead of checking out
+        added = [car_id for car_id in wanted[session_id] if server.add_cart_item(session_id, car_id) == "added"]
+        if not added:
+            return "refused"
+        return "sold" if server.checkout_cart(session_id)[0] else "failed"
+
+    hold_seconds = holds.HOLD_SECONDS
+    for label, seconds in (("no holds", 0), ("holds", hold_seconds)):
+        holds.HOLD_SECONDS = seconds
+        with conn:
+            for table in ("sales", "cart_items", "car_holds"):
+                conn.execute(f"DELETE FROM {table}")
+            conn.execute("UPDATE cars SET status = 'available'")
+        db.touch("cars", "sales", "cart_items", "car_holds")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            results = list(pool.map(shop, wanted))
+        elapsed = time.perf_counter() - start
+        print(f"{label:<9} {buyers / elapsed:8.1f} buyers/s   sold {results.count('sold'):4}   "
+              f"checkouts failed {results.count('failed'):4}   refused at add {results.count('refused'):4}")
+    holds.HOLD_SECONDS = hold_seconds
+
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO car_holds VALUES (?, 'x', ?)",
+                         [(f"bench-{i}", (datetime.utcnow() + timedelta(minutes=5)).isoformat()) for i in range(0, cars, 4)])
+    db.touch("car_holds")
+    holds.held_cars()
+    print(f"held_cars() with {len(holds.held_cars()[1])} holds  {timed(holds.held_cars, 10_000) * 1000:8.2f} us")
+
+
+def bench_cart(cars=20_000, carts=20_000, items=5):
+    """Cart add/remove and view: JSON list in carts.items_json (old) vs cart_items rows and one join."""
+    server = load_server(cars)
+    conn = db.get_connection()
+    rng = random.Random(1)
+    baskets = {f"cart-{c}": rng.sample(range(cars), items) for c in range(carts)}
+    with conn:
+        conn.executemany("INSERT INTO carts (session_id, items_json) VALUES (?, ?)",
+                         [(sid, json.dumps([f"bench-{i}" for i in ids])) for sid, ids in baskets.items()])
+        conn.executemany("INSERT INTO cart_items (session_id, car_id, added_at) VALUES (?, ?, '')",
+                         [(sid, f"bench-{i}") for sid, ids in baskets.items() for i in ids])
+    db.touch("carts", "cart_items")
+
+    def json_add_remove():
+        # add and remove as they were: parse, change and rewrite the list
+        for op in ("add", "remove"):
+            found = db.find_rows("carts", {"session_id": "cart-7"})
+            listed = json.loads(found.iloc[0]["items_json"])
+            listed.append("bench-0") if op == "add" else listed.remove("bench-0")
+            db.update_rows("carts", {"session_id": "cart-7"}, {"items_json": json.dumps(listed)})
+
+    def row_add_remove():
+        server.add_cart_item("cart-7", "bench-0")
+        db.delete_rows("cart_items", {"session_id": "cart-7", "car_id": "bench-0"})
+
+    def json_view():
+        found = db.find_rows("carts", {"session_id": "cart-7"})
+        cars_df = db.read_table("cars")
+        chosen = [cars_df[cars_df["id"] == cid].iloc[0].to_dict() for cid in json.loads(found.iloc[0]["items_json"])]
+        return chosen, sum(car["price"] for car in chosen)
+
+    assert json_view()[1] == server.cart_contents("cart-7")[1]
+    print(f"{cars} cars, {carts} carts of {items}")
+    print(f"add + remove, JSON list  {timed(json_add_remove, 50):8.3f} ms")
+    print(f"add + remove, rows       {timed(row_add_remove, 200):8.3f} ms")
+    print(f"view, pandas per item    {timed(json_view, 5):8.2f} ms")
+    print(f"view, one join           {timed(lambda: server.cart_contents('cart-7'), 200):8.3f} ms")
+
+
+def bench_conditional_get(cars=2_000, requests=500):
+    """Repeat visits to /api/cars?limit=100 handled in-process: full 200 responses vs 304 revalidation with the ETag."""
+    server = load_server(cars)
+    # bypass the read cache so the 200 path does its real query and serialization
+    cached = db.cached
+    db.cached = lambda table_name, name, build: build()
+    etag = server.api_list_cars(fake_request(), limit=100).headers["etag"]
+    for label, headers in (("no validator", ()), ("If-None-Match", (("If-None-Match", etag),))):
+        sizes = []
+        ms = timed(lambda: sizes.append(len(server.api_list_cars(fake_request(headers=headers), limit=100).body)), repeat=requests)
+        print(f"{label:<14} {ms:8.3f} ms/request   {sum(sizes) / len(sizes):8.0f} body bytes/request")
+    db.cached = cached
+
+
+def bench_json_cache(cars=3_000):
+    """Employee car list: to_dict + FastAPI encoding per request vs bytes serialized once per table version."""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    load_server(0)
+    conn = db.get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO cars (id, make, model, year, price, mileage, fuel, transmission, owner, type, image, description, status) "
+            "VALUES (?, 'Maruti', 'Swift', 2018, ?, ?, 'Petrol', 'Manual', '1st Owner', 'hatchback', '', 'well kept', 'available')",
+            [(f"bench-{i}", 300000 + i, 1000 * i) for i in range(cars)],
+        )
+    db.touch("cars")
+
+    def per_request():
+        return JSONResponse(content=jsonable_encoder(db.read_table("cars").to_dict(orient="records"))).body
+
+    def pre_serialized():
+        return response_cache.json_response("cars", "bench_cars", lambda: db.fetch_rows("cars")).body
+
+    assert json.loads(per_request()) == json.loads(pre_serialized())
+    print(f"{cars} cars, {len(pre_serialized()) / 1024:.0f} KiB body")
+    print(f"to_dict + FastAPI encoding {timed(per_request, 10):8.2f} ms")
+    print(f"pre-serialized bytes       {timed(pre_serialized, 100):8.3f} ms")
+    print(f"stats {response_cache.stats()}")
+
+
+def legacy_sales_list():
+    """The employee sales list as it used to be built: a pandas filter over every car for each sale."""
+    sales, cars = db.read_table("sales"), db.read_table("cars")
+    result = []
+    for _, sale in sales.iterrows():
+        car_data = cars[cars["id"] == sale["car_id"]]
+        car_name = f"{car_data.iloc[0]['make']} {car_data.iloc[0]['model']}" if not car_data.empty else "Unknown"
+        result.append({"order_id": sale["order_id"], "car_id": sale["car_id"], "car_name": car_name, "price": int(sale["price"]),
+                       "timestamp": sale["timestamp"], "session_id": sale.get("session_id", "")})
+    return result
+
+
+def bench_sales(sizes=(10_000, 100_000), cars=20_000):
+    """Employee sales list: per-sale pandas filter (old) vs one JOIN per keyset page, by timestamp and by price."""
+    server = load_server(cars)
+    conn = db.get_connection()
+    with conn:
+        conn.executemany("INSERT INTO customers (phone, name) VALUES (?, ?)", [(f"9{i:09d}", f"Customer {i}") for i in range(1_000)])
+    inserted = 0
+    for size in sizes:
+        base = datetime(2024, 1, 1)
+        with conn:
+            conn.executemany(
+                "INSERT INTO sales (order_id, session_id, car_id, price, timestamp, phone) VALUES (?, ?, ?, ?, ?, ?)",
+                [(f"order-{i}", f"s-{i}", f"bench-{i % cars}", 300000 + i * 7 % 900000,
+                  (base + timedelta(minutes=i)).isoformat(), f"9{i % 1_000:09d}") for i in range(inserted, size)],
+            )
+        db.touch("sales")
+        inserted = size
+        page, _ = server.sales_page("timestamp", True, 50)
+        assert page[0]["customer_name"] and page[0]["car_name"] != "Unknown"
+
+        def page_50(order_by, cursor=None):
+            return lambda: server.sales_page(order_by, True, 50, cursor)
+
+        deep = None
+        for _ in range(50):
+            _, deep = server.sales_page("price", True, 50, deep)
+        print(f"{size} sales, {cars} cars")
+        if size <= 10_000:
+            print(f"  iterrows join (old)        {timed(legacy_sales_list, 1):10.1f} ms")
+        print(f"  pandas merge, all rows     {timed(lambda: db.read_table('sales').merge(db.read_table('cars'), left_on='car_id', right_on='id', how='left'), 3):10.1f} ms")
+        print(f"  JOIN page by timestamp     {timed(page_50('timestamp')):10.3f} ms")
+        print(f"  JOIN page by price         {timed(page_50('price')):10.3f} ms")
+        print(f"  JOIN page 51 by price      {timed(page_50('price', deep)):10.3f} ms")
+
+
+def legacy_profile(phone, session_id):
+    """A customer's profile as it used to be built: pandas lookups and a scan of every car per order."""
+    customer = db.find_rows("customers", {"phone": phone}).iloc[0]
+    sales, cars = db.find_rows("sales", {"session_id": session_id}), db.read_table("cars")
+    orders = []
+    for _, sale in sales.iterrows():
+        car = cars[cars["id"] == sale["car_id"]].iloc[0]
+        orders.append({"order_id": sale["order_id"], "car_name": f"{car['make']} {car['model']}", "price": int(sale["price"])})
+    requests = [dict(r) for _, r in db.find_rows("sell_requests", {"phone": phone}).iterrows()]
+    services = [dict(r) for _, r in db.find_rows("services", {"phone": phone}).iterrows()]
+    return {"user": customer["name"], "orders": orders, "sell_requests": requests, "services": services}
+
+
+def bench_profile(sizes=(10_000, 100_000), customers=5_000):
+    """Customer profile: pandas lookups (old) vs indexed queries vs the per-customer cache, as the tables grow."""
+    server = load_server(0)
+    conn = db.get_connection()
+    now = datetime.utcnow().isoformat()
+    with conn:
+        conn.executemany("INSERT INTO customers (phone, name) VALUES (?, ?)", [(f"9{i:09d}", f"Customer {i}") for i in range(customers)])
+    inserted = 0
+    for size in sizes:
+        with conn:
+            conn.executemany("INSERT INTO cars (id, make, model, year, price, status) VALUES (?, 'Maruti', 'Swift', 2018, ?, 'sold')",
+                             [(f"bench-{i}", 300000 + i) for i in range(inserted, size)])
+            conn.executemany("INSERT INTO sales (order_id, session_id, car_id, price, timestamp, phone) VALUES (?, ?, ?, ?, ?, ?)",
+                             [(f"order-{i}", f"s-{i % customers}", f"bench-{i}", 300000 + i, now, f"9{i % customers:09d}") for i in range(inserted, size)])
+            conn.executemany("INSERT INTO sell_requests (request_id, phone, make, model, status, timestamp) VALUES (?, ?, 'Kia', 'Rio', 'pending', ?)",
+                             [(f"req-{i}", f"9{i % customers:09d}", now) for i in range(inserted, size)])
+            conn.executemany("INSERT INTO services (service_id, phone, status, timestamp) VALUES (?, ?, 'pending', ?)",
+                             [(f"svc-{i}", f"9{i % customers:09d}", now) for i in range(inserted, size)])
+        db.touch("cars", "sales", "sell_requests", "services")
+        inserted = size
+        phone, other = "9000000007", "9000000008"
+        profile = server.build_profile(phone)
+        assert len(profile["orders"]) == size // customers
+        print(f"{size} sales, sell requests and services; {customers} customers")
+        print(f"  pandas lookups (old)     {timed(lambda: legacy_profile(phone, 's-7'), 3):9.2f} ms")
+        print(f"  indexed queries          {timed(lambda: server.build_profile(phone), 50):9.3f} ms")
+        cached = lambda: db.cached_for_owner(phone, "profile", lambda: server.build_profile(phone))
+        cached()
+        print(f"  per-customer cache       {timed(cached, 200):9.3f} ms")
+        db.insert_row("services", {"service_id": f"svc-other-{size}", "phone": other})
+        misses = db.cache_stats()["misses"]
+        cached()
+        print(f"  still cached after another customer's write: {db.cache_stats()['misses'] == misses}")
+
+
+def bench_dashboard(rows=10_000, sales=2_000):
+    """Employee dashboard load, cold: six endpoints' worth of full-table reads vs the one-request bundle."""
+    server = load_server(rows)
+    conn = db.get_connection()
+    now = datetime.utcnow().isoformat()
+    with conn:
+        conn.executemany("INSERT INTO sales (order_id, session_id, car_id, price, timestamp) VALUES (?, ?, ?, ?, ?)",
+                         [(f"order-{i}", f"s-{i}", f"bench-{i}", 500000 + i, now) for i in range(sales)])
+        conn.executemany("INSERT INTO sell_requests (request_id, owner_name, phone, make, model, status, timestamp) VALUES (?, 'A', ?, 'Kia', 'Seltos', ?, ?)",
+                         [(f"req-{i}", str(i), ("pending", "approved")[i % 2], now) for i in range(rows)])
+        conn.executemany("INSERT INTO services (service_id, owner_name, phone, status, timestamp) VALUES (?, 'A', ?, ?, ?)",
+                         [(f"svc-{i}", str(i), ("pending", "done")[i % 2], now) for i in range(rows)])
+        conn.executemany("INSERT INTO contacts VALUES (?, 'A', 'a@b.c', 'hello', ?)", [(f"msg-{i}", now) for i in range(rows)])
+    db.touch("cars", "sales", "sell_requests", "services", "contacts")
+
+    def six_requests():
+        tables = {t: db.read_table(t) for t in ("cars", "sales", "sell_requests", "services")}
+        stats = {t: len(df) for t, df in tables.items()}
+        lists = [db.fetch_rows(t) for t in ("cars", "sell_requests", "services", "contacts")]
+        return stats, lists, legacy_sales_list()
+
+    def bundle():
+        return server.dashboard_stats(), [server.dashboard_section(s, server.DASHBOARD_PAGE_SIZE) for s in server.DASHBOARD_SECTIONS]
+
+    assert bundle()[0]["pending_services"] == rows // 2
+    print(f"{rows} cars, requests, services and contacts; {sales} sales")
+    print(f"six endpoints        {timed(six_requests, 2):8.1f} ms")
+    print(f"dashboard bundle     {timed(bundle, 20):8.2f} ms")
+
+
+def legacy_dashboard_html():
+    """The employee dashboard's tabs as they used to be built: every row of every table, iterrows() and f-strings, in one string."""
+    body = ""
+    for table, columns in (("sell_requests", ("request_id", "owner_name", "make", "model", "year", "asking_price", "status")),
+                           ("services", ("service_id", "owner_name", "phone", "car_id", "service_date", "status")),
+                           ("sales", ("order_id", "session_id", "car_id", "price", "timestamp")),
+                           ("contacts", ("contact_id", "name", "email", "message")),
+                           ("cars", ("id", "make", "model", "year", "price", "mileage", "status"))):
+        df = db.read_table(table)
+        rows = ["<tr>" + "".join(f"<td>{r[c]}</td>" for c in columns) + f"<td><form method='get' action='/employee/edit'><input type='hidden' value='{r[columns[0]]}'><button>Edit</button></form></td></tr>"
+                for _, r in df.iterrows()]
+        body += f"<div id='{table}' class='tab'><table>" + "".join(rows) + "</table></div>"
+    return body
+
+
+def bench_dashboard_html(rows=20_000):
+    """The /employee/dashboard page: the whole page built in memory vs streamed, paged tabs (first byte, total, peak memory)."""
+    server = load_server(rows)
+    conn = db.get_connection()
+    now = datetime.utcnow().isoformat()
+    with conn:
+        conn.executemany("INSERT INTO sales (order_id, session_id, car_id, price, timestamp) VALUES (?, ?, ?, ?, ?)",
+                         [(f"order-{i}", f"s-{i}", f"bench-{i}", 500000 + i, now) for i in range(rows)])
+        conn.executemany("INSERT INTO sell_requests (request_id, owner_name, phone, make, model, status, timestamp) VALUES (?, 'A', ?, 'Kia', 'Seltos', 'pending', ?)",
+                         [(f"req-{i}", str(i), now) for i in range(rows)])
+        conn.executemany("INSERT INTO services (service_id, owner_name, phone, status, timestamp) VALUES (?, 'A', ?, 'pending', ?)",
+                         [(f"svc-{i}", str(i), now) for i in range(rows)])
+        conn.executemany("INSERT INTO contacts VALUES (?, 'A', 'a@b.c', 'hello', ?)", [(f"msg-{i}", now) for i in range(rows)])
+    db.touch("cars", "sales", "sell_requests", "services", "contacts")
+    token = server.create_emp_session("admin")
+    request = fake_request("/employee/dashboard", [("cookie", f"{server.EMP_SESSION_COOKIE}={token}")])
+
+    def buffered():
+        yield server.layout("Employee Dashboard", legacy_dashboard_html())
+
+    async def drain(response):
+        async for chunk in response.body_iterator:
+            yield chunk
+
+    def streamed():
+        chunks = drain(server.employee_dashboard(request))
+        loop = asyncio.new_event_loop()
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(chunks.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.close()
+
+    print(f"{rows} rows in each of cars, sales, sell requests, services and contacts")
+    for label, make in (("iterrows, whole page", buffered), ("streamed, paged", streamed)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        first, sent = None, 0
+        for chunk in make():
+            if first is None:
+                first = time.perf_counter() - start
+            sent += len(chunk)
+        total = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{label:<22} first byte {first * 1000:8.1f} ms   total {total * 1000:8.1f} ms   peak {peak / 2**20:7.1f} MiB   {sent / 1024:8.0f} KB")
+
+
+def bench_csv_export(rows=200_000):
+    """Sales CSV export: DataFrame + StringIO vs streamed cursor chunks (time to first byte, total, peak memory)."""
+    server = load_server()
+    conn = db.get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO sales (order_id, session_id, car_id, price, timestamp) VALUES (:order_id, :session_id, :car_id, :price, :timestamp)",
+            (fake_sale(i) for i in range(rows)),
+        )
+
+    def buffered():
+        df = db.read_table("sales")
+        stream = io.StringIO()
+        df.to_csv(stream, index=False)
+        yield stream.getvalue()
+
+    def streamed():
+        return server.csv_chunks(*db.stream_table("sales"))
+
+    print(f"{rows} rows")
+    for label, make in (("DataFrame + StringIO", buffered), ("streamed chunks", streamed)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        first = None
+        for _ in make():
+            if first is None:
+                first = time.perf_counter() - start
+        total = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{label:<22} first byte {first * 1000:8.1f} ms   total {total * 1000:8.1f} ms   peak {peak / 2**20:7.1f} MiB")
+
+
+def bench_csv_import(rows=100_000):
+    """Sales CSV upload: pd.read_csv + write_table vs db.import_csv staging swap."""
+    use_temp_db()
+    db.init_db()
+    text = pd.DataFrame([fake_sale(i) for i in range(rows)]).to_csv(index=False)
+
+    def replace():
+        db.write_table("sales", pd.read_csv(io.StringIO(text)))
+
+    def staged():
+        db.import_csv("sales", io.StringIO(text, newline=""))
+
+    print(f"{rows} rows")
+    for label, fn in (("read_csv + write_table", replace), ("import_csv", staged)):
+        print(f"{label:<24} {timed(fn, repeat=3):8.1f} ms")
+
+def _serve_for_uploads(port, token_queue):
+    # runs in its own process so the upload clients don't share its GIL
+    import shutil
+    import uvicorn
+    from fastapi import File, UploadFile
+
+    server = load_server(2_000)
+
+    @server.app.post("/bench/legacy-upload")
+    async def legacy_upload(file: UploadFile = File(...)):
+        # the handlers as they were: FastAPI spools the body, then a blocking copy on the event loop
+        with (Path("static/videos") / f"hero_{uuid.uuid4().hex}.mp4").open("wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+        return {}
+
+    lag = {"max_ms": 0.0}
+
+    async def watch_loop():
+        # how late a 5 ms sleep wakes up is how long the event loop was blocked
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lag["max_ms"] = max(lag["max_ms"], (time.perf_counter() - start - 0.005) * 1000)
+
+    @server.app.post("/bench/loop-lag")
+    async def loop_lag():
+        # the first call starts the watcher on the server's loop
+        if "task" not in lag:
+            lag["task"] = asyncio.get_running_loop().create_task(watch_loop())
+        worst, lag["max_ms"] = lag["max_ms"], 0.0
+        return {"max_ms": worst}
+
+    token_queue.put(server.create_emp_session("admin"))
+    uvicorn.run(server.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def bench_uploads(uploads=16, uploaders=4, size=4 * 1024 * 1024, probes=200):
+    """/api/cars latency under uvicorn while 4 MB videos upload: blocking copy in the handler vs media.py."""
+    import multiprocessing
+    import socket
+    import httpx
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    tokens = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_serve_for_uploads, args=(port, tokens), daemon=True)
+    proc.start()
+    token = tokens.get(timeout=60)
+    base = f"http://127.0.0.1:{port}"
+    while True:
+        try:
+            httpx.get(base + "/api/cars")
+            break
+        except httpx.TransportError:
+            time.sleep(0.1)
+    video = b"\x00\x00\x00\x18ftypmp42" + os.urandom(size)
+
+    def upload(path):
+        with httpx.Client(base_url=base, cookies={"employee_session": token}, timeout=60) as client:
+            assert client.post(path, files={"file": ("hero.mp4", video, "video/mp4")}).status_code == 200
+
+    def probe_latencies(stop):
+        latencies = []
+        with httpx.Client(base_url=base) as client:
+            while len(latencies) < probes or not stop.is_set():
+                start = time.perf_counter()
+                client.get("/api/cars", params={"limit": 24})
+                latencies.append((time.perf_counter() - start) * 1000)
+        return sorted(latencies)
+
+    httpx.post(base + "/bench/loop-lag")
+    for label, path in (("idle", None), ("blocking copy", "/bench/legacy-upload"), ("media.py stream", "/api/employee/upload-video")):
+        stop = threading.Event()
+        with ThreadPoolExecutor(uploaders + 1) as pool:
+            probing = pool.submit(probe_latencies, stop)
+            start = time.perf_counter()
+            if path:
+                list(pool.map(upload, [path] * uploads))
+            elapsed = time.perf_counter() - start
+            stop.set()
+            latencies = probing.result()
+        stall = httpx.post(base + "/bench/loop-lag").json()["max_ms"]
+        p50, p99 = latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+        rate = f"{uploads * size / 1024 / 1024 / elapsed:7.1f} MB/s" if path else " " * 12
+        print(f"{label:<16} uploads {rate}   /api/cars p50 {p50:6.2f} ms   p99 {p99:7.2f} ms   longest loop stall {stall:7.2f} ms")
+    proc.terminate()
+
+def _serve_static(port, url_queue, size):
+    # its own process, like _serve_for_uploads; Starlette's StaticFiles is mounted alongside for comparison
+    import hashlib
+    import uvicorn
+    from fastapi.staticfiles import StaticFiles as StarletteStaticFiles
+
+    server = load_server(10)
+    video = b"\x00\x00\x00\x18ftypmp42" + os.urandom(size)
+    name = f"{hashlib.sha256(video).hexdigest()}.mp4"
+    (Path("static/videos") / name).write_bytes(video)
+    server.app.mount("/legacy-static", StarletteStaticFiles(directory="static"))
+    url_queue.put(f"/videos/{name}")
+    uvicorn.run(server.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def bench_static(streams=8, rounds=4, seeks=16, size=4 * 1024 * 1024):
+    """Concurrent hero-video streams and seeks under uvicorn: Starlette's StaticFiles vs static_files.py."""
+    import multiprocessing
+    import socket
+    import httpx
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    urls = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_serve_static, args=(port, urls, size), daemon=True)
+    proc.start()
+    video = urls.get(timeout=60)
+    base = f"http://127.0.0.1:{port}"
+    while True:
+        try:
+            httpx.get(base + "/api/cars")
+            break
+        except httpx.TransportError:
+            time.sleep(0.1)
+
+    def play(prefix):
+        with httpx.Client(base_url=base, timeout=60) as client:
+            for _ in range(rounds):
+                with client.stream("GET", prefix + video) as r:
+                    for _ in r.iter_raw():
+                        pass
+
+    def scrub(prefix):
+        # a viewer seeking: 256 KB from random points
+        rng = random.Random()
+        sent = 0
+        with httpx.Client(base_url=base, timeout=60) as client:
+            for _ in range(seeks):
+                start = rng.randrange(size - 262144)
+                with client.stream("GET", prefix + video, headers={"range": f"bytes={start}-{start + 262143}"}) as r:
+                    sent += sum(len(chunk) for chunk in r.iter_raw())
+        return sent
+
+    for label, prefix in (("StaticFiles", "/legacy-static"), ("static_files.py", "/static")):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(streams) as pool:
+            list(pool.map(play, [prefix] * streams))
+        play_s = time.perf_counter() - start
+        start = time.perf_counter()
+        with ThreadPoolExecutor(streams) as pool:
+            sent = sum(pool.map(scrub, [prefix] * streams))
+        scrub_s = time.perf_counter() - start
+        cache = httpx.head(base + prefix + video).headers.get("cache-control", "-")
+        print(f"{label:<16} {streams} streams {streams * rounds * size / 1024 / 1024 / play_s:7.1f} MB/s   "
+              f"{streams * seeks} seeks {scrub_s * 1000:7.0f} ms, {sent / 1024 / 1024:6.1f} MB sent   cache-control: {cache}")
+    proc.terminate()
+
+
+def bench_derivatives(images=16, width=4000, height=3000):
+    """Resizing camera-sized JPEGs: one at a time in-process vs derivatives.py's process pool."""
+    from PIL import Image
+    import derivatives
+
+    tmp = Path(tempfile.mkdtemp(prefix="sbmotz-bench-"))
+    rng = random.Random(1)
+    sources = []
+    for i in range(images):
+        # noise over a gradient, so the encoder has real work to do
+        im = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+        im.paste(Image.effect_noise((width // 4, height // 4), 40).convert("RGB"), (rng.randrange(width // 2), rng.randrange(height // 2)))
+        path = tmp / f"source-{i}.jpg"
+        im.save(path, "JPEG", quality=90)
+        sources.append(str(path))
+    print(f"{images} images {width}x{height}, {os.path.getsize(sources[0]) / 1024:.0f} KB each, {os.cpu_count()} CPUs")
+
+    start = time.perf_counter()
+    results = [derivatives.render(path, tmp) for path in sources]
+    serial = time.perf_counter() - start
+    pool = derivatives._executor()
+    # start the workers before timing
+    list(pool.map(abs, range(derivatives.WORKERS)))
+    start = time.perf_counter()
+    pooled = list(pool.map(derivatives.render, sources, [tmp] * images))
+    parallel = time.perf_counter() - start
+    derivatives.shutdown()
+    assert pooled == results
+    print(f"serial  {serial * 1000 / images:7.1f} ms/image  {images / serial:6.1f} images/s")
+    print(f"pool    {parallel * 1000 / images:7.1f} ms/image  {images / parallel:6.1f} images/s  ({derivatives.WORKERS} workers)")
+    sizes = {name: os.path.getsize(tmp / filename) for name, filename, _, _ in results[0]}
+    print("bytes   original " + f"{os.path.getsize(sources[0]):,}  " + "  ".join(f"{name} {size:,}" for name, size in sizes.items()))
+
+
+BENCHMARKS = {
+    "row_writes": bench_row_writes,
+    "api_cars": bench_api_cars,
+    "catalog_cache": bench_catalog_cache,
+    "catalog_page": bench_catalog_page,
+    "search": bench_search,
+    "facets": bench_facets,
+    "checkout": bench_checkout,
+    "cart": bench_cart,
+    "holds": bench_holds,
+    "conditional_get": bench_conditional_get,
+    "json_cache": bench_json_cache,
+    "dashboard": bench_dashboard,
+    "dashboard_html": bench_dashboard_html,
+    "sales": bench_sales,
+    "profile": bench_profile,
+    "csv_export": bench_csv_export,
+    "csv_import": bench_csv_import,
+    "uploads": bench_uploads,
+    "static": bench_static,
+    "derivatives": bench_derivatives,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name}")
+        BENCHMARKS[name]()
@@ -1,7 +1,13 @@
 import sqlite3
+import base64
+import csv
 import pandas as pd
 from pathlib import Path
 import json
+import math
+import re
+import threading
+from contextlib import contextmanager
 
 DB_FILE = Path("sbmotz.db")
 DATA_DIR = Path("./data")
@@ -20,24 +26,203 @@ CSV_MAPPING = {
     "customer_sessions.json": "customer_sessions"
 }
 
+# Declared schema for every table: typed columns, primary key and secondary
+# indexes. init_db creates these and write_table keeps them intact. An index
+# column may carry a collation, e.g. "make COLLATE NOCASE". A "search" entry
+# adds an FTS5 index over the listed columns, ranked with per-column weights.
+# An "owned_by" entry is a SELECT of the customer phone(s) a row belongs to,
+# written against {row}; triggers count every change per owner in
+# owner_versions (see cached_for_owner()). A "media" entry lists columns that
+# hold /static URLs of uploaded files, optionally only for rows matching
+# "where" (written against {row}); triggers keep media_refs in step with them.
+SCHEMA = {
+    "cars": {
+        "columns": [("id", "TEXT"), ("make", "TEXT"), ("model", "TEXT"), ("year", "INTEGER"), ("price", "INTEGER"),
+                    ("mileage", "INTEGER"), ("fuel", "TEXT"), ("transmission", "TEXT"), ("owner", "TEXT"), ("type", "TEXT"),
+                    ("image", "TEXT"), ("description", "TEXT"), ("status", "TEXT")],
+        "primary_key": ["id"],
+        # the catalog query filters on status and pages in (sort column, id) order
+        "indexes": [["status", "id"], ["status", "price", "id"], ["status", "year", "id"], ["status", "mileage", "id"],
+                    ["type COLLATE NOCASE"], ["make COLLATE NOCASE", "model COLLATE NOCASE"]],
+        # a sold car's details show on its buyer's profile
+        "owned_by": "SELECT phone AS owner FROM sales WHERE car_id = {row}.id",
+        "media": {"columns": ["image"]},
+        "search": {
+            "columns": ["make", "model", "type", "fuel", "transmission", "description"],
+            "weights": [10, 10, 4, 3, 3, 1],
+        },
+    },
+    "employees": {
+        "columns": [("username", "TEXT"), ("password_hash", "TEXT"), ("name", "TEXT")],
+        "primary_key": ["username"],
+        "indexes": [],
+    },
+    "sales": {
+        # phone links a sale to its customer; session_id is the login it was made under
+        "columns": [("order_id", "TEXT"), ("session_id", "TEXT"), ("car_id", "TEXT"), ("price", "INTEGER"), ("timestamp", "TEXT"),
+                    ("phone", "TEXT")],
+        "primary_key": ["order_id"],
+        # the dashboard panels page newest first in (timestamp, key) order
+        "indexes": [["session_id"], ["car_id"], ["phone"], ["timestamp", "order_id"], ["price", "order_id"]],
+        "owned_by": "SELECT {row}.phone AS owner",
+    },
+    "sell_requests": {
+        "columns": [("request_id", "TEXT"), ("owner_name", "TEXT"), ("phone", "TEXT"), ("make", "TEXT"), ("model", "TEXT"),
+                    ("year", "INTEGER"), ("asking_price", "INTEGER"), ("notes", "TEXT"), ("status", "TEXT"), ("timestamp", "TEXT")],
+        "primary_key": ["request_id"],
+        "indexes": [["phone"], ["status"], ["timestamp", "request_id"]],
+        "owned_by": "SELECT {row}.phone AS owner",
+    },
+    "services": {
+        "columns": [("service_id", "TEXT"), ("owner_name", "TEXT"), ("phone", "TEXT"), ("car_id", "TEXT"), ("service_date", "TEXT"),
+                    ("notes", "TEXT"), ("status", "TEXT"), ("timestamp", "TEXT")],
+        "primary_key": ["service_id"],
+        "indexes": [["phone"], ["car_id"], ["status"], ["timestamp", "service_id"]],
+        "owned_by": "SELECT {row}.phone AS owner",
+    },
+    "contacts": {
+        "columns": [("contact_id", "TEXT"), ("name", "TEXT"), ("email", "TEXT"), ("message", "TEXT"), ("timestamp", "TEXT")],
+        "primary_key": ["contact_id"],
+        "indexes": [["timestamp", "contact_id"]],
+    },
+    # carts used to hold each cart as a JSON list; init_db moves them into cart_items
+    "carts": {
+        "columns": [("session_id", "TEXT"), ("items_json", "TEXT"), ("updated_at", "TEXT")],
+        "primary_key": ["session_id"],
+        "indexes": [],
+    },
+    "cart_items": {
+        "columns": [("session_id", "TEXT"), ("car_id", "TEXT"), ("added_at", "TEXT")],
+        "primary_key": ["session_id", "car_id"],
+        "indexes": [["car_id"]],
+    },
+    # a car reserved for one cart until expires_at (see holds.py)
+    "car_holds": {
+        "columns": [("car_id", "TEXT"), ("session_id", "TEXT"), ("expires_at", "TEXT")],
+        "primary_key": ["car_id"],
+        "indexes": [["session_id"], ["expires_at"]],
+    },
+    "customers": {
+        "columns": [("phone", "TEXT"), ("password_hash", "TEXT"), ("name", "TEXT"), ("created_at", "TEXT")],
+        "primary_key": ["phone"],
+        "indexes": [],
+        "owned_by": "SELECT {row}.phone AS owner",
+    },
+    "employee_sessions": {
+        "columns": [("token", "TEXT"), ("username", "TEXT"), ("login_at", "TEXT"), ("expires_at", "TEXT")],
+        "primary_key": ["token"],
+        "indexes": [["username"], ["expires_at"]],
+    },
+    "customer_sessions": {
+        "columns": [("token", "TEXT"), ("phone", "TEXT"), ("login_at", "TEXT"), ("expires_at", "TEXT")],
+        "primary_key": ["token"],
+        "indexes": [["phone"], ["expires_at"]],
+    },
+    "settings": {
+        "columns": [("key", "TEXT"), ("value", "TEXT")],
+        "primary_key": ["key"],
+        "indexes": [],
+        "media": {"columns": ["value"], "where": "{row}.key IN ('hero_video', 'logo_url')"},
+    },
+    # resized copies of a car image, one per size (see derivatives.py)
+    "image_variants": {
+        "columns": [("source_url", "TEXT"), ("size", "TEXT"), ("url", "TEXT"), ("width", "INTEGER"), ("height", "INTEGER"),
+                    ("created_at", "TEXT")],
+        "primary_key": ["source_url", "size"],
+        "indexes": [["url"]],
+    },
+    # which rows use which uploaded file (see media.py); ref is "<table>:<key>"
+    "media_refs": {
+        "columns": [("url", "TEXT"), ("ref", "TEXT")],
+        "primary_key": ["url", "ref"],
+        "indexes": [["ref"]],
+    },
+    # one change counter per table, bumped in the same transaction as every write
+    "table_versions": {
+        "columns": [("table_name", "TEXT"), ("version", "INTEGER")],
+        "primary_key": ["table_name"],
+        "indexes": [],
+    },
+    # one change counter per customer, kept by the "owned_by" triggers; the
+    # row with owner '' counts bulk rewrites, which bypass the triggers
+    "owner_versions": {
+        "columns": [("owner", "TEXT"), ("version", "INTEGER")],
+        "primary_key": ["owner"],
+        "indexes": [],
+    },
+}
+
+# Connection tuning. WAL lets readers keep going while a writer commits,
+# and synchronous=NORMAL is durable enough in WAL mode without an fsync per write.
+CACHE_SIZE_KB = 20000
+MMAP_SIZE = 256 * 1024 * 1024
+BUSY_TIMEOUT_MS = 5000
+
+_local = threading.local()
+_all_connections = []
+_connections_lock = threading.Lock()
+
+def _open_connection(path):
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
 def get_connection():
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-    # Enable row factory if needed, but pandas handles it
+    """
+    Return this thread's connection to DB_FILE, opening it on first use.
+    Connections are kept for the life of the thread, so callers must not close them.
+    """
+    conns = getattr(_local, "connections", None)
+    if conns is None:
+        conns = _local.connections = {}
+    path = str(DB_FILE)
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _open_connection(path)
+        with _connections_lock:
+            _all_connections.append(conn)
     return conn
 
+def close_connections():
+    """Close every pooled connection, e.g. on shutdown."""
+    with _connections_lock:
+        for conn in _all_connections:
+            conn.close()
+        _all_connections.clear()
+    _local.__dict__.clear()
+
 def init_db():
     """
     Initialize the database.
-    If tables don't exist, try to migrate from CSV/JSON files in DATA_DIR.
+    Creates every table in SCHEMA (rebuilding tables that were created without
+    it), then migrates CSV/JSON files from DATA_DIR on first run.
     """
     conn = get_connection()
-    cursor = conn.cursor()
     
     # Check if we need to migrate
     # We can check if 'cars' table exists as a proxy for "db initialized"
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='cars'")
-    if cursor.fetchone():
-        conn.close()
+    fresh = not table_columns("cars", conn)
+
+    with conn:
+        before = _schema_entries(conn)
+        for table_name in SCHEMA:
+            _apply_schema(conn, table_name)
+        # only tables that were created or migrated, or whose indexes or
+        # triggers changed: a bump empties every cache built on the table
+        changed = {table for _, table, _ in _schema_entries(conn) ^ before}
+        if _link_sales(conn):
+            changed.add("sales")
+        if _move_cart_items(conn):
+            changed.update(("carts", "cart_items"))
+        versions = _bump(conn, *(t for t in SCHEMA if t in changed))
+    _advance(versions)
+
+    if not fresh:
         return
 
     print("Initializing database and migrating data...")
@@ -57,80 +242,912 @@ def init_db():
                         row["token"] = token
                         rows.append(row)
                     if rows:
-                        df = pd.DataFrame(rows)
-                        df.to_sql(table_name, conn, index=False, if_exists="replace")
+                        with conn:
+                            _insert_frame(conn, table_name, pd.DataFrame(rows), or_ignore=True)
+                            versions = _bump(conn, table_name)
+                        _advance(versions)
                 except Exception as e:
                     print(f"Failed to migrate {csv_file}: {e}")
             else:
                 # Handle CSVs
                 try:
                     df = pd.read_csv(file_path)
-                    df.to_sql(table_name, conn, index=False, if_exists="replace")
+                    with conn:
+                        _insert_frame(conn, table_name, df, or_ignore=True)
+                        versions = _bump(conn, table_name)
+                    _advance(versions)
                 except Exception as e:
                     print(f"Failed to migrate {csv_file}: {e}")
-    
-    conn.close()
+
+    with conn:
+        changed = [t for t, n in (("sales", _link_sales(conn)), ("cart_items", _move_cart_items(conn))) if n]
+        versions = _bump(conn, *changed, "carts") if changed else {}
+    _advance(versions)
+
+def _schema_entries(conn):
+    """{(name, table it belongs to, SQL)} for everything in the schema."""
+    return set(conn.execute("SELECT name, tbl_name, sql FROM sqlite_master"))
+
+def _link_sales(conn):
+    """
+    Fill in sales.phone for sales recorded before the column existed, from the
+    customer session they were made under while that session still exists.
+    Returns the number of sales linked.
+    """
+    return conn.execute(
+        "UPDATE sales SET phone = customer_sessions.phone FROM customer_sessions "
+        "WHERE sales.phone IS NULL AND customer_sessions.token = sales.session_id"
+    ).rowcount
+
+def _move_cart_items(conn):
+    """
+    Move carts stored as JSON lists in carts.items_json into cart_items, one
+    row per car, and delete the old carts. Returns the number of carts moved.
+    """
+    conn.execute(
+        "INSERT OR IGNORE INTO cart_items (session_id, car_id, added_at) "
+        "SELECT carts.session_id, item.value, carts.updated_at FROM carts, json_each(carts.items_json) AS item "
+        "WHERE json_valid(carts.items_json) AND json_type(carts.items_json) = 'array' AND item.value IS NOT NULL"
+    )
+    return conn.execute("DELETE FROM carts").rowcount
+
+# --- Schema ---
+
+def _create_table_sql(table_name, target=None, extra_columns=()):
+    spec = SCHEMA[table_name]
+    key = spec["primary_key"]
+    cols = [f"{_quote(c)} {t}{' NOT NULL' if c in key else ''}" for c, t in spec["columns"]]
+    cols += [f"{_quote(c)} {t}".rstrip() for c, t in extra_columns]
+    cols.append(f"PRIMARY KEY ({', '.join(_quote(c) for c in key)})")
+    return f"CREATE TABLE IF NOT EXISTS {_quote(target or table_name)} ({', '.join(cols)})"
+
+def _index_column(spec):
+    col, _, collation = spec.partition(" COLLATE ")
+    return _quote(col) + (f" COLLATE {collation}" if collation else "")
+
+def _create_indexes(conn, table_name, rebuilt=False):
+    """
+    Create the indexes and triggers declared for `table_name`. A table rebuild,
+    which replaces the rows wholesale, must pass rebuilt=True.
+    """
+    for cols in SCHEMA[table_name]["indexes"]:
+        name = f"idx_{table_name}_{'_'.join(c.replace(' COLLATE ', '_').lower() for c in cols)}"
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {_quote(name)} ON {_quote(table_name)} ({', '.join(_index_column(c) for c in cols)})")
+    _create_search_index(conn, table_name, rebuilt)
+    _create_owner_triggers(conn, table_name, rebuilt)
+    _create_media_triggers(conn, table_name, rebuilt)
+
+def _create_owner_triggers(conn, table_name, rebuilt=False):
+    """
+    Count changes to `table_name`'s rows per owner, as declared by its
+    "owned_by" SELECT. An update counts for the owners before and after it.
+    """
+    owned_by = SCHEMA[table_name].get("owned_by")
+    if not owned_by:
+        return
+    # the triggers write here, so it has to exist even if init_db hasn't run
+    _apply_schema(conn, "owner_versions")
+    table = _quote(table_name)
+
+    def bump(row):
+        # the WHERE keeps SQLite from reading ON CONFLICT as a join constraint
+        return (f"INSERT INTO owner_versions (owner, version) SELECT owner, 1 FROM ({owned_by.format(row=row)}) "
+                f"WHERE owner IS NOT NULL ON CONFLICT (owner) DO UPDATE SET version = version + 1;")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS {_quote(table_name + '_owner_ai')} AFTER INSERT ON {table} BEGIN {bump('new')} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS {_quote(table_name + '_owner_ad')} AFTER DELETE ON {table} BEGIN {bump('old')} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS {_quote(table_name + '_owner_au')} AFTER UPDATE ON {table} BEGIN "
+                 f"{bump('old')} {bump('new')} END")
+    if rebuilt:
+        # every owner's rows may have changed without a trigger firing
+        conn.execute("INSERT INTO owner_versions (owner, version) VALUES ('', 1) "
+                     "ON CONFLICT (owner) DO UPDATE SET version = version + 1")
+
+def _create_media_triggers(conn, table_name, rebuilt=False):
+    """
+    Keep media_refs listing the uploaded files `table_name`'s rows point to,
+    as declared by its "media" entry. Re-indexes the table's references when
+    the triggers are new or the table was rebuilt.
+    """
+    media = SCHEMA[table_name].get("media")
+    if not media:
+        return
+    _apply_schema(conn, "media_refs")
+    table = _quote(table_name)
+    key = _quote(SCHEMA[table_name]["primary_key"][0])
+    prefix = f"{table_name}:"
+    fresh = not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?", (table_name + "_media_ai",)).fetchone()
+
+    def refs(row, source=""):
+        where = media.get("where", "1").format(row=row)
+        return " UNION ALL ".join(
+            f"SELECT {row}.{_quote(col)} AS url, '{prefix}' || {row}.{key} AS ref {source} "
+            f"WHERE {row}.{_quote(col)} LIKE '/static/%' AND {where}"
+            for col in media["columns"])
+    watched = ", ".join(_quote(c) for c in [*media["columns"], SCHEMA[table_name]["primary_key"][0]])
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS {_quote(table_name + '_media_ai')} AFTER INSERT ON {table} BEGIN "
+                 f"INSERT OR IGNORE INTO media_refs (url, ref) {refs('new')}; END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS {_quote(table_name + '_media_ad')} AFTER DELETE ON {table} BEGIN "
+                 f"DELETE FROM media_refs WHERE ref = '{prefix}' || old.{key}; END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS {_quote(table_name + '_media_au')} AFTER UPDATE OF {watched} ON {table} BEGIN "
+                 f"DELETE FROM media_refs WHERE ref = '{prefix}' || old.{key}; "
+                 f"INSERT OR IGNORE INTO media_refs (url, ref) {refs('new')}; END")
+    if fresh or rebuilt:
+        conn.execute("DELETE FROM media_refs WHERE substr(ref, 1, ?) = ?", (len(prefix), prefix))
+        conn.execute(f"INSERT OR IGNORE INTO media_refs (url, ref) {refs(table, f'FROM {table}')}")
+
+def _search_table(table_name):
+    return f"{table_name}_fts"
+
+def _create_search_index(conn, table_name, rebuild=False):
+    """
+    Create the FTS5 index declared under SCHEMA[table_name]["search"]. It is an
+    external-content table: it stores only the index and reads column values
+    from `table_name` by rowid, and triggers keep it in step with every insert,
+    delete and update of a searched column. Anything that gives rows new rowids
+    (a table rebuild) must pass rebuild=True.
+    """
+    search = SCHEMA[table_name].get("search")
+    if not search:
+        return
+    fts, table = _quote(_search_table(table_name)), _quote(table_name)
+    cols = search["columns"]
+    col_list = ", ".join(_quote(c) for c in cols)
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (_search_table(table_name),)).fetchone():
+        try:
+            conn.execute(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5({col_list}, content={table}, content_rowid='rowid', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+        except sqlite3.OperationalError as e:
+            # SQLite built without FTS5; search_page() reports it
+            print(f"Full-text search disabled for {table_name}: {e}")
+            return
+        weights = ", ".join(str(w) for w in search["weights"])
+        conn.execute(f"INSERT INTO {fts} ({fts}, rank) VALUES ('rank', 'bm25({weights})')")
+        rebuild = True
+    new = ", ".join(f"new.{_quote(c)}" for c in cols)
+    old = ", ".join(f"old.{_quote(c)}" for c in cols)
+    name = _search_table(table_name)
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS {_quote(name + '_ai')} AFTER INSERT ON {table} BEGIN "
+                 f"INSERT INTO {fts} (rowid, {col_list}) VALUES (new.rowid, {new}); END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS {_quote(name + '_ad')} AFTER DELETE ON {table} BEGIN "
+                 f"INSERT INTO {fts} ({fts}, rowid, {col_list}) VALUES ('delete', old.rowid, {old}); END")
+    # only edits to searched columns touch the index, so status changes stay cheap
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS {_quote(name + '_au')} AFTER UPDATE OF {col_list} ON {table} BEGIN "
+                 f"INSERT INTO {fts} ({fts}, rowid, {col_list}) VALUES ('delete', old.rowid, {old}); "
+                 f"INSERT INTO {fts} (rowid, {col_list}) VALUES (new.rowid, {new}); END")
+    if rebuild:
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+def _apply_schema(conn, table_name):
+    """Create `table_name` as declared in SCHEMA, or bring an existing table up to it."""
+    spec = SCHEMA[table_name]
+    info = list(conn.execute(f"PRAGMA table_info({_quote(table_name)})"))
+    if not info:
+        conn.execute(_create_table_sql(table_name))
+    else:
+        declared = dict(spec["columns"])
+        # (cid, name, type, notnull, default, pk)
+        pk = [r[1] for r in sorted(info, key=lambda r: r[5]) if r[5]]
+        if pk != spec["primary_key"]:
+            # Tables written by DataFrame.to_sql have no key, so rebuild them.
+            # Columns we don't declare are carried over as they are.
+            existing = [r[1] for r in info]
+            extra = [(r[1], r[2]) for r in info if r[1] not in declared]
+            tmp = f"_rebuild_{table_name}"
+            conn.execute(f"DROP TABLE IF EXISTS {_quote(tmp)}")
+            conn.execute(_create_table_sql(table_name, target=tmp, extra_columns=extra))
+            cols = ", ".join(_quote(c) for c in existing)
+            conn.execute(f"INSERT OR IGNORE INTO {_quote(tmp)} ({cols}) SELECT {cols} FROM {_quote(table_name)}")
+            conn.execute(f"DROP TABLE {_quote(table_name)}")
+            # triggers on other tables (see "owned_by") name this one, and a
+            # modern RENAME refuses while the name they use doesn't exist
+            conn.execute("PRAGMA legacy_alter_table = ON")
+            try:
+                conn.execute(f"ALTER TABLE {_quote(tmp)} RENAME TO {_quote(table_name)}")
+            finally:
+                conn.execute("PRAGMA legacy_alter_table = OFF")
+            _create_indexes(conn, table_name, rebuilt=True)
+            return
+        else:
+            existing = {r[1] for r in info}
+            for col, col_type in spec["columns"]:
+                if col not in existing:
+                    conn.execute(f"ALTER TABLE {_quote(table_name)} ADD COLUMN {_quote(col)} {col_type}")
+    _create_indexes(conn, table_name)
 
 # Helper to read table safely
 def read_table(table_name, default_cols=None):
     conn = get_connection()
     try:
-        df = pd.read_sql(f"SELECT * FROM {table_name}", conn)
-        conn.close()
-        return df
+        return pd.read_sql(f"SELECT * FROM {table_name}", conn)
     except Exception:
-        conn.close()
         if default_cols:
             return pd.DataFrame(columns=default_cols)
         return pd.DataFrame()
 
+def find_rows(table_name, where, default_cols=None):
+    """Rows of `table_name` matching `where` (column -> value), looked up through the table's key or indexes."""
+    clause, params = _where_clause(where)
+    try:
+        return pd.read_sql(f"SELECT * FROM {_quote(table_name)}{clause}", get_connection(), params=params)
+    except Exception:
+        return pd.DataFrame(columns=default_cols or [])
+
+def get_row(table_name, where):
+    """The first row matching `where` as a dict, or None. Skips pandas for single-row lookups."""
+    clause, params = _where_clause(where)
+    try:
+        cursor = get_connection().execute(f"SELECT * FROM {_quote(table_name)}{clause} LIMIT 1", params)
+    except sqlite3.OperationalError:
+        return None
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip([d[0] for d in cursor.description], row))
+
+def fetch_rows(table_name, columns=None, where=None):
+    """
+    Rows of `table_name` as a list of dicts straight from the cursor, optionally only
+    `columns` and rows matching `where`. Values come back as SQLite stores them, so
+    missing values are None rather than NaN. A missing table gives [].
+    """
+    cols = ", ".join(_quote(c) for c in columns) if columns else "*"
+    clause, params = _where_clause(where)
+    try:
+        cursor = get_connection().execute(f"SELECT {cols} FROM {_quote(table_name)}{clause}", params)
+    except sqlite3.OperationalError:
+        return []
+    names = [d[0] for d in cursor.description]
+    return [dict(zip(names, row)) for row in cursor]
+
+# --- Read cache ---
+# Every table has a change counter in table_versions that each write path in
+# this module bumps inside its own transaction. cached() memoizes anything
+# derived from a table (the whole DataFrame, a list of dicts, rendered HTML)
+# against that counter, so repeated reads of rarely-written tables never reach
+# SQLite.
+#
+# Other processes (uvicorn workers) write to the same file, so before trusting
+# its counters a thread asks its connection for PRAGMA data_version. That only
+# changes when another connection has committed, and only then are the shared
+# counters re-read; tables whose counter moved are invalidated and their
+# on_change() listeners run.
+
+_versions = {}  # (db path, table_name) -> last known counter
+_read_cache = {}  # (db path, table_name, name) -> (version, value)
+_read_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "foreign_changes": 0}
+READ_CACHE_MAX_ENTRIES = 2000
+_listeners = {}  # table_name -> [callback]
+
+def _bump(conn, *table_names):
+    """Increment the counters of `table_names` inside the caller's transaction. Returns {table: new counter}."""
+    sql = ("INSERT INTO table_versions (table_name, version) VALUES (?, 1) "
+           "ON CONFLICT (table_name) DO UPDATE SET version = version + 1 RETURNING version")
+    try:
+        return {t: conn.execute(sql, (t,)).fetchone()[0] for t in table_names}
+    except sqlite3.OperationalError:
+        # a database that init_db hasn't seen yet
+        _apply_schema(conn, "table_versions")
+        return {t: conn.execute(sql, (t,)).fetchone()[0] for t in table_names}
+
+def _advance(versions):
+    """Record counters read from table_versions. Returns the tables that moved forward."""
+    path = str(DB_FILE)
+    moved = []
+    with _read_cache_lock:
+        for table_name, version in versions.items():
+            if version > _versions.get((path, table_name), 0):
+                _versions[(path, table_name)] = version
+                moved.append(table_name)
+    return moved
+
+def poll_changes():
+    """
+    Pick up writes committed by other connections, including other processes.
+    Costs one PRAGMA when nothing has changed. Called by table_version(), so
+    cached() readers never need to call it themselves.
+    """
+    conn = get_connection()
+    data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    seen = _local.__dict__.setdefault("data_versions", {})
+    path = str(DB_FILE)
+    if seen.get(path) == (conn, data_version):
+        return
+    try:
+        counters = dict(conn.execute("SELECT table_name, version FROM table_versions"))
+    except sqlite3.OperationalError:
+        return
+    seen[path] = (conn, data_version)
+    moved = _advance(counters)
+    if not moved:
+        return
+    with _read_cache_lock:
+        _cache_stats["foreign_changes"] += len(moved)
+    for table_name in moved:
+        for callback in _listeners.get(table_name, ()):
+            callback()
+
+def on_change(table_name, callback):
+    """Call callback() when poll_changes() finds `table_name` was written by another connection."""
+    _listeners.setdefault(table_name, []).append(callback)
+
+def table_version(table_name):
+    poll_changes()
+    return _versions.get((str(DB_FILE), table_name), 0)
+
+def touch(*table_names):
+    """
+    Mark `table_names` as changed so cached reads of them are rebuilt here and
+    in every other process. The helpers in this module do this themselves; code
+    writing through get_connection() directly must call it after committing.
+    """
+    conn = get_connection()
+    with conn:
+        versions = _bump(conn, *table_names)
+    _advance(versions)
+
+def cached(table_name, name, build):
+    """
+    Return build(), memoized under `name` until `table_name` is next written.
+    The value is shared between callers, so treat it as read-only.
+    """
+    # read the version before building, so a write that lands meanwhile
+    # leaves the entry stale rather than wrongly current
+    return _memo((str(DB_FILE), table_name, name), table_version(table_name), build)
+
+def owner_version(owner):
+    """
+    A token that changes whenever any row owned by `owner` (see "owned_by" in
+    SCHEMA) is written, by any process. One primary-key read.
+    """
+    try:
+        versions = dict(get_connection().execute(
+            "SELECT owner, version FROM owner_versions WHERE owner IN (?, '')", (owner,)))
+    except sqlite3.OperationalError:
+        return (0, 0)
+    return (versions.get("", 0), versions.get(owner, 0))
+
+def cached_for_owner(owner, name, build):
+    """
+    Return build(), memoized under `name` until a row owned by `owner` is next
+    written. Writes belonging to other owners leave the entry alone.
+    """
+    return _memo((str(DB_FILE), ("owner", owner), name), owner_version(owner), build)
+
+def _memo(key, version, build):
+    hit = _read_cache.get(key)
+    if hit is not None and hit[0] == version:
+        with _read_cache_lock:
+            _cache_stats["hits"] += 1
+        return hit[1]
+    value = build()
+    with _read_cache_lock:
+        _cache_stats["misses"] += 1
+        if len(_read_cache) >= READ_CACHE_MAX_ENTRIES:
+            # keyed by query parameters, entries can pile up; start over rather than track recency
+            _read_cache.clear()
+        _read_cache[key] = (version, value)
+    return value
+
+def cache_stats():
+    with _read_cache_lock:
+        stats = dict(_cache_stats)
+        stats["entries"] = len(_read_cache)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+    return stats
+
 # Helper to write table
 def write_table(table_name, df):
+    """Replace the contents of `table_name` with `df`, keeping its declared schema and indexes."""
     conn = get_connection()
-    df.to_sql(table_name, conn, index=False, if_exists="replace")
-    conn.close()
-
-# Session helpers specific to DB
-def load_session_table(table_name):
-    df = read_table(table_name, default_cols=["token"])
-    if df.empty:
-        return {}
-    # Convert back to dict {token: {data}}
-    # We need to preserve all columns except token as the value dict
-    records = df.to_dict(orient="records")
-    result = {}
-    for r in records:
-        token = r.pop("token")
-        result[token] = r
-    return result
-
-def save_session_table(table_name, data_dict):
-    # Convert dict {token: {data}} to DataFrame
-    rows = []
-    for token, info in data_dict.items():
-        row = info.copy()
-        row["token"] = token
-        rows.append(row)
-    
-    if not rows:
-        # If empty, write an empty table with columns if possible, or just drop table?
-        # Better to write empty DF with columns if we knew them.
-        # For now, if empty, we can just drop the table or write nothing.
-        # But write_table expects a DF.
-        # If we don't know columns, we can't create a valid empty DF easily without schema.
-        # But usually we have at least one session.
-        # If completely empty, let's just do nothing or try to write empty DF if we can infer cols.
-        # Let's just return if empty to avoid errors, but that might leave stale data if we don't drop.
-        # Safest: execute DELETE FROM table
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
-            cursor.execute(f"DELETE FROM {table_name}")
-            conn.commit()
-        except:
-            pass
-        conn.close()
+    with conn:
+        if table_name in SCHEMA:
+            _apply_schema(conn, table_name)
+        _ensure_columns(conn, table_name, list(df.columns))
+        conn.execute(f"DELETE FROM {_quote(table_name)}")
+        _insert_frame(conn, table_name, df)
+        versions = _bump(conn, table_name)
+    _advance(versions)
+
+# --- Row-level helpers ---
+# These run as parameterized SQL against single rows instead of rewriting the
+# whole table, so a write costs the same no matter how big the table is.
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _sql_value(value):
+    # sqlite3 can't bind numpy scalars, and pandas uses NaN for missing values
+    if value is pd.NA:
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+def _where_clause(where):
+    if not where:
+        return "", []
+    clause = " AND ".join(f"{_quote(col)} = ?" for col in where)
+    return f" WHERE {clause}", [_sql_value(v) for v in where.values()]
+
+def table_columns(table_name, conn=None):
+    conn = conn or get_connection()
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({_quote(table_name)})")]
+
+def _ensure_columns(conn, table_name, columns):
+    # Tables created from CSVs only carry the columns the CSV had, so add any
+    # new ones instead of failing the write
+    existing = table_columns(table_name, conn)
+    if not existing and table_name in SCHEMA:
+        _apply_schema(conn, table_name)
+        existing = table_columns(table_name, conn)
+    if not existing:
+        cols = ", ".join(_quote(c) for c in columns)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {_quote(table_name)} ({cols})")
+        return
+    for col in columns:
+        if col not in existing:
+            conn.execute(f"ALTER TABLE {_quote(table_name)} ADD COLUMN {_quote(col)}")
+
+def _insert(conn, table_name, row, or_ignore=False):
+    cols = ", ".join(_quote(c) for c in row)
+    marks = ", ".join("?" for _ in row)
+    verb = "INSERT OR IGNORE" if or_ignore else "INSERT"
+    return conn.execute(
+        f"{verb} INTO {_quote(table_name)} ({cols}) VALUES ({marks})",
+        [_sql_value(v) for v in row.values()],
+    )
+
+def _insert_frame(conn, table_name, df, or_ignore=False):
+    if df.columns.empty:
         return
+    _ensure_columns(conn, table_name, list(df.columns))
+    cols = ", ".join(_quote(c) for c in df.columns)
+    marks = ", ".join("?" for _ in df.columns)
+    verb = "INSERT OR IGNORE" if or_ignore else "INSERT"
+    conn.executemany(
+        f"{verb} INTO {_quote(table_name)} ({cols}) VALUES ({marks})",
+        ([_sql_value(v) for v in row] for row in df.itertuples(index=False, name=None)),
+    )
+
+def insert_row(table_name, row, or_ignore=False):
+    """
+    Insert one row. With or_ignore, a row whose key is already taken is skipped.
+    Returns whether the row was inserted.
+    """
+    conn = get_connection()
+    with conn:
+        _ensure_columns(conn, table_name, list(row))
+        inserted = _insert(conn, table_name, row, or_ignore).rowcount > 0
+        versions = _bump(conn, table_name) if inserted else {}
+    _advance(versions)
+    return inserted
+
+def update_rows(table_name, where, values):
+    """Set `values` on every row matching `where` (column -> value). Returns the number of rows changed."""
+    if not values:
+        return 0
+    conn = get_connection()
+    with conn:
+        _ensure_columns(conn, table_name, list(values))
+        assignments = ", ".join(f"{_quote(c)} = ?" for c in values)
+        clause, params = _where_clause(where)
+        cursor = conn.execute(
+            f"UPDATE {_quote(table_name)} SET {assignments}{clause}",
+            [_sql_value(v) for v in values.values()] + params,
+        )
+        versions = _bump(conn, table_name) if cursor.rowcount else {}
+    _advance(versions)
+    return cursor.rowcount
+
+def replace_media_url(old_url, new_url):
+    """Point every row that uses the uploaded file `old_url` (see "media" in SCHEMA) at `new_url`."""
+    tables = [t for t in SCHEMA if SCHEMA[t].get("media")]
+    with transaction(*tables) as conn:
+        for table_name in tables:
+            media = SCHEMA[table_name]["media"]
+            where = media.get("where", "1").format(row=_quote(table_name))
+            for col in media["columns"]:
+                conn.execute(f"UPDATE {_quote(table_name)} SET {_quote(col)} = ? WHERE {_quote(col)} = ? AND {where}", (new_url, old_url))
+
+def count_rows(table_name, where=None):
+    clause, params = _where_clause(where)
+    try:
+        return get_connection().execute(f"SELECT COUNT(*) FROM {_quote(table_name)}{clause}", params).fetchone()[0]
+    except sqlite3.OperationalError as e:
+        # a table that was never created has no rows; a lock timeout is not "0 rows"
+        if "no such table" in str(e):
+            return 0
+        raise
+
+def count_by(table_name, column):
+    """{value: number of rows} for each distinct value of `column`, counted in SQL."""
+    try:
+        rows = get_connection().execute(
+            f"SELECT {_quote(column)}, COUNT(*) FROM {_quote(table_name)} GROUP BY {_quote(column)}").fetchall()
+    except sqlite3.OperationalError as e:
+        if "no such table" in str(e):
+            return {}
+        raise
+    return dict(rows)
+
+def delete_rows(table_name, where):
+    """Delete every row matching `where`. Returns the number of rows deleted."""
+    conn = get_connection()
+    clause, params = _where_clause(where)
+    try:
+        with conn:
+            cursor = conn.execute(f"DELETE FROM {_quote(table_name)}{clause}", params)
+            versions = _bump(conn, table_name) if cursor.rowcount else {}
+    except sqlite3.OperationalError as e:
+        # table was never created, so there is nothing to delete; anything
+        # else (a lock timeout, say) must not pass for a delete that matched nothing
+        if "no such table" in str(e):
+            return 0
+        raise
+    _advance(versions)
+    return cursor.rowcount
+
+def upsert(table_name, row, key):
+    """Update the row whose `key` column equals row[key], or insert it if there is none."""
+    conn = get_connection()
+    with conn:
+        # take the write lock up front so two upserts can't both miss and insert
+        conn.execute("BEGIN IMMEDIATE")
+        _ensure_columns(conn, table_name, list(row))
+        found = conn.execute(
+            f"SELECT 1 FROM {_quote(table_name)} WHERE {_quote(key)} = ? LIMIT 1",
+            [_sql_value(row[key])],
+        ).fetchone()
+        values = {c: v for c, v in row.items() if c != key}
+        if found is None:
+            _insert(conn, table_name, row)
+        elif values:
+            assignments = ", ".join(f"{_quote(c)} = ?" for c in values)
+            conn.execute(
+                f"UPDATE {_quote(table_name)} SET {assignments} WHERE {_quote(key)} = ?",
+                [_sql_value(v) for v in values.values()] + [_sql_value(row[key])],
+            )
+        versions = _bump(conn, table_name)
+    _advance(versions)
+
+class Rollback(Exception):
+    """Raise inside transaction() to roll it back without propagating an error."""
+
+@contextmanager
+def transaction(*table_names):
+    """
+    Run the block as one write transaction on this thread's connection and yield
+    the connection. The write lock is taken up front (BEGIN IMMEDIATE), so
+    nothing read inside the block can change before the commit. Leaving the block
+    commits and bumps the change counters of `table_names`. If the block raises,
+    everything is rolled back; raising Rollback does that silently.
+    """
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            versions = _bump(conn, *table_names)
+    except Rollback:
+        return
+    _advance(versions)
+
+def delete_expired(table_name, column, cutoff, batch_size=500):
+    """
+    Delete rows whose `column` is NULL or earlier than `cutoff`, `batch_size` rows per
+    transaction so the write lock is never held for long. Returns the number deleted.
+    """
+    conn = get_connection()
+    sql = (f"DELETE FROM {_quote(table_name)} WHERE rowid IN (SELECT rowid FROM {_quote(table_name)} "
+           f"WHERE {_quote(column)} IS NULL OR {_quote(column)} < ? LIMIT ?)")
+    total = 0
+    while True:
+        with conn:
+            deleted = conn.execute(sql, (cutoff, batch_size)).rowcount
+            versions = _bump(conn, table_name) if deleted else {}
+        _advance(versions)
+        total += deleted
+        if deleted < batch_size:
+            return total
+
+def stream_query(sql, params=(), chunk_size=1000):
+    """
+    Run `sql` on a dedicated connection and return (columns, chunks), where chunks
+    yields lists of up to `chunk_size` row tuples straight from the cursor.
+    The connection is closed once chunks is exhausted or closed, and the whole
+    scan reads one consistent snapshot even while writers commit.
+    """
+    conn = _open_connection(str(DB_FILE))
+    try:
+        cursor = conn.execute(sql, params)
+    except Exception:
+        conn.close()
+        raise
+    columns = [d[0] for d in cursor.description]
+
+    def chunks():
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            conn.close()
+    return columns, chunks()
+
+def stream_table(table_name, chunk_size=1000):
+    return stream_query(f"SELECT * FROM {_quote(table_name)}", chunk_size=chunk_size)
+
+# --- Keyset pagination ---
+# Pages are fetched with "WHERE (sort column, key) > last row seen" instead of
+# OFFSET, so page 100 costs the same as page 1 when an index covers the filter
+# and sort. The position is handed to the client as an opaque cursor.
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor(). Raises ValueError for anything it didn't produce."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    # the values are bound into the page query as they are
+    if not isinstance(values, list) or not all(v is None or type(v) in (str, int, float) for v in values):
+        raise ValueError("Invalid cursor")
+    return values
+
+def _after(s, k, descending, sort_value, key_value):
+    """
+    The rows after (sort_value, key_value) in ORDER BY s, k order, s and k being
+    quoted column references, as a list of (WHERE fragment, params) segments to
+    read one after the other. Each segment is a single range on a (sort, key)
+    index; an OR across the NULL boundary would make SQLite scan from the first
+    row instead.
+    """
+    # SQLite sorts NULL first ascending and last descending
+    if not descending:
+        if sort_value is None:
+            return [(f"{s} IS NULL AND {k} > ?", [key_value]), (f"{s} IS NOT NULL", [])]
+        return [(f"({s}, {k}) > (?, ?)", [sort_value, key_value])]
+    if sort_value is None:
+        return [(f"{s} IS NULL AND {k} < ?", [key_value])]
+    return [(f"({s}, {k}) < (?, ?)", [sort_value, key_value]), (f"{s} IS NULL", [])]
+
+def fetch_page(table_name, where=None, nocase=(), ranges=None, order_by=None, descending=False, limit=50, cursor=None,
+               joins="", extra_columns=None, exclude=None):
+    """
+    One page of `table_name` as (rows, next_cursor), rows being dicts and
+    next_cursor None on the last page.
+
+    where: {column: value} equality filters; columns listed in `nocase` match
+        case-insensitively (give them a COLLATE NOCASE index).
+    ranges: {column: (low, high)} inclusive bounds, either of which may be None.
+    exclude: {column: values} skips rows whose column is any of the values.
+    order_by: column to sort by; the primary key breaks ties, and is the sort
+        when order_by is None.
+    cursor: next_cursor from the previous page of the same query.
+    joins: JOIN clauses to add to the query, e.g. for looking up names; filters
+        and sorting still apply to `table_name`'s own columns.
+    extra_columns: {name: SQL expression} selected alongside the row.
+    """
+    key = SCHEMA[table_name]["primary_key"]
+    if len(key) != 1:
+        raise ValueError(f"{table_name} has a composite key and can't be paged")
+    key_col = key[0]
+    sort_col = order_by or key_col
+
+    def column(col):
+        # qualified, so joined tables with the same column names don't clash
+        return f"{_quote(table_name)}.{_quote(col)}"
+
+    conditions, params = [], []
+    for col, value in (where or {}).items():
+        conditions.append(f"{column(col)} = ?" + (" COLLATE NOCASE" if col in nocase else ""))
+        params.append(_sql_value(value))
+    for col, (low, high) in (ranges or {}).items():
+        if low is not None:
+            conditions.append(f"{column(col)} >= ?")
+            params.append(low)
+        if high is not None:
+            conditions.append(f"{column(col)} <= ?")
+            params.append(high)
+    for col, values in (exclude or {}).items():
+        if values:
+            conditions.append(f"{column(col)} NOT IN ({', '.join('?' * len(values))})")
+            params.extend(_sql_value(v) for v in values)
+    segments = [(None, [])]
+    if cursor:
+        position = decode_cursor(cursor)
+        if sort_col == key_col:
+            if len(position) != 1:
+                raise ValueError("Invalid cursor")
+            segments = [(f"{column(key_col)} {'<' if descending else '>'} ?", position)]
+        else:
+            if len(position) != 2:
+                raise ValueError("Invalid cursor")
+            segments = _after(column(sort_col), column(key_col), descending, *position)
+
+    direction = " DESC" if descending else ""
+    order = f"{column(sort_col)}{direction}" + (f", {column(key_col)}{direction}" if sort_col != key_col else "")
+    select = ", ".join([f"{_quote(table_name)}.*"] + [f"{expr} AS {_quote(name)}" for name, expr in (extra_columns or {}).items()])
+    source = f"{_quote(table_name)} {joins}".rstrip()
+    conn = get_connection()
+    rows = []
+    # one extra row tells us whether there is a next page
+    for clause, values in segments:
+        where_sql = " AND ".join(conditions + ([clause] if clause else []))
+        sql = f"SELECT {select} FROM {source}{' WHERE ' + where_sql if where_sql else ''} ORDER BY {order} LIMIT ?"
+        cur = conn.execute(sql, params + values + [limit + 1 - len(rows)])
+        columns = [d[0] for d in cur.description]
+        rows += [dict(zip(columns, r)) for r in cur.fetchall()]
+        if len(rows) > limit:
+            break
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    position = [last[key_col]] if sort_col == key_col else [last[sort_col], last[key_col]]
+    return rows, encode_cursor(position)
 
-    df = pd.DataFrame(rows)
-    write_table(table_name, df)
+def match_expression(text):
+    """
+    Turn free text into an FTS5 query: every word must match, as a prefix, in
+    any searched column. Words are quoted, so FTS5 operators and punctuation in
+    the input are searched for literally rather than interpreted.
+    """
+    words = re.findall(r"\w+", text.lower())
+    return " ".join(f'"{w}"*' for w in words)
+
+def search_page(table_name, text, where=None, limit=50, cursor=None, exclude=None):
+    """
+    One page of rows of `table_name` matching the free-text `text`, best match
+    first, as (rows, next_cursor) like fetch_page(). `where` is {column: value}
+    equality filters on the table itself, and `exclude` is {column: values} as
+    in fetch_page().
+
+    Ranking has to score every match anyway, so the cursor is a plain offset
+    into the ranked list rather than a keyset position.
+    """
+    match = match_expression(text)
+    if not match:
+        raise ValueError("Search text has no words")
+    offset = 0
+    if cursor:
+        position = decode_cursor(cursor)
+        if len(position) != 1 or not isinstance(position[0], int) or position[0] < 0:
+            raise ValueError("Invalid cursor")
+        offset = position[0]
+    fts = _quote(_search_table(table_name))
+    conditions, params = [f"{fts} MATCH ?"], [match]
+    for col, value in (where or {}).items():
+        conditions.append(f"t.{_quote(col)} = ?")
+        params.append(_sql_value(value))
+    for col, values in (exclude or {}).items():
+        if values:
+            conditions.append(f"t.{_quote(col)} NOT IN ({', '.join('?' * len(values))})")
+            params.extend(_sql_value(v) for v in values)
+    sql = (f"SELECT t.* FROM {fts} JOIN {_quote(table_name)} t ON t.rowid = {fts}.rowid "
+           f"WHERE {' AND '.join(conditions)} ORDER BY {fts}.rank, t.rowid LIMIT ? OFFSET ?")
+    try:
+        cur = get_connection().execute(sql, params + [limit + 1, offset])
+    except sqlite3.OperationalError as e:
+        if "no such table" in str(e):
+            raise ValueError(f"Search is not available for {table_name}")
+        raise
+    columns = [d[0] for d in cur.description]
+    rows = [dict(zip(columns, r)) for r in cur.fetchall()]
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], encode_cursor([offset + limit])
+
+# --- Bulk CSV import ---
+
+IMPORT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 20
+
+def _convert(value, col_type):
+    if value == "":
+        return None
+    if col_type == "INTEGER":
+        number = float(value)
+        if not number.is_integer():
+            raise ValueError(f"{value!r} is not a whole number")
+        return int(number)
+    if col_type == "REAL":
+        return float(value)
+    return value
+
+def import_csv(table_name, text, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Replace the contents of `table_name` with the CSV read from the text file `text`.
+
+    Rows are parsed and type-checked against SCHEMA in batches and loaded into a
+    staging table with executemany; the staging rows then replace the live ones.
+    All of it happens in one transaction, so readers keep seeing the old rows
+    until the commit and a failed import leaves them untouched.
+
+    Returns {"loaded": n, "rejected": n, "errors": [first few reasons]}.
+    Raises ValueError if the header is unusable or no row is valid.
+    """
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if not header:
+        raise ValueError("CSV file is empty")
+    if len(set(header)) != len(header):
+        raise ValueError("CSV header has duplicate columns")
+    spec = SCHEMA[table_name]
+    types = dict(spec["columns"])
+    missing = [c for c in spec["primary_key"] if c not in header]
+    if missing:
+        raise ValueError(f"CSV is missing key column(s): {', '.join(missing)}")
+    col_types = [types.get(c, "") for c in header]
+    key_positions = [header.index(c) for c in spec["primary_key"]]
+
+    staging = f"_staging_{table_name}"
+    cols = ", ".join(_quote(c) for c in header)
+    marks = ", ".join("?" for _ in header)
+    # OR IGNORE drops rows whose key repeats an earlier row; they are counted as rejected
+    insert_sql = f"INSERT OR IGNORE INTO {_quote(staging)} ({cols}) VALUES ({marks})"
+
+    report = {"loaded": 0, "rejected": 0, "errors": []}
+
+    def reject(line, reason):
+        report["rejected"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append(f"line {line}: {reason}")
+
+    def flush(batch):
+        inserted = conn.executemany(insert_sql, batch).rowcount
+        report["loaded"] += inserted
+        if inserted < len(batch):
+            report["rejected"] += len(batch) - inserted
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append(f"{len(batch) - inserted} row(s) repeat a key already in the file")
+
+    conn = get_connection()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(f"DROP TABLE IF EXISTS {_quote(staging)}")
+        extra = [(c, "") for c in header if c not in types]
+        conn.execute(_create_table_sql(table_name, target=staging, extra_columns=extra))
+        batch = []
+        for line, raw in enumerate(reader, start=2):
+            if not raw:
+                continue
+            if len(raw) != len(header):
+                reject(line, f"expected {len(header)} fields, got {len(raw)}")
+                continue
+            try:
+                row = [_convert(v, t) for v, t in zip(raw, col_types)]
+            except ValueError as e:
+                reject(line, str(e))
+                continue
+            if any(row[i] is None for i in key_positions):
+                reject(line, "empty key")
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+        if not report["loaded"] and report["rejected"]:
+            raise ValueError(f"No valid rows; {report['rejected']} rejected ({'; '.join(report['errors'][:3])})")
+        # swap the rows rather than the tables: triggers on other tables (see
+        # "owned_by") name this one, so dropping it would break renaming staging
+        # in its place. Its own triggers keep the search index and refs current.
+        _ensure_columns(conn, table_name, header)
+        conn.execute(f"DELETE FROM {_quote(table_name)}")
+        conn.execute(f"INSERT INTO {_quote(table_name)} ({cols}) SELECT {cols} FROM {_quote(staging)}")
+        conn.execute(f"DROP TABLE {_quote(staging)}")
+        versions = _bump(conn, table_name)
+    _advance(versions)
+    return report
@@ -30,8 +30,7 @@ def check_admin():
                 
                 # Update password to be correct
                 print("Updating password...")
-                employees.loc[employees["username"] == "admin", "password_hash"] = calculated_hash
-                db.write_table("employees", employees)
+                db.update_rows("employees", {"username": "admin"}, {"password_hash": calculated_hash})
                 print("Password updated.")
                 
     except Exception as e:
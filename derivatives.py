@@ -0,0 +1,219 @@
+"""
+derivatives.py
+
+Resized copies of car images for the catalog.
+
+Photos are uploaded at full camera resolution, while the inventory grid shows
+them a few hundred pixels wide. Every car image gets one WebP derivative per
+entry in SIZES. They are made off the request path on a process pool, so
+resizing uses every core and never holds the server's GIL. Each derivative is
+named by the hash of its bytes, like an upload (see media.py). Making it again
+after a retry or a crash therefore rewrites the same file, and image_variants
+records which derivative belongs to which image and size.
+
+with_images() adds an "images" map to catalog rows: the derivatives that are
+ready, and the original image for the rest. Catalog pages are cached per
+version of both cars and image_variants, so recording derivatives refreshes
+them without invalidating the other caches of cars.
+"""
+
+import hashlib
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+
+import db
+import media
+
+VARIANTS_TABLE = "image_variants"
+CARS_TABLE = "cars"
+
+# size name -> longest edge in pixels; images are never enlarged
+SIZES = {"thumb": 160, "card": 480, "full": 1280}
+FORMAT = "WEBP"
+SUFFIX = ".webp"
+QUALITY = 80
+
+WORKERS = os.cpu_count() or 1
+# images waiting for a worker; past this, enqueue() declines and backfill() retries later
+MAX_PENDING = 64
+
+SOURCE_DIRECTORY = media.KINDS["car_image"]["directory"]
+SOURCE_PREFIX = f"/{SOURCE_DIRECTORY}/"
+
+_pool = None
+_pending = {}  # source url -> Future
+_lock = threading.Lock()
+
+
+def render(source_path, directory):
+    """
+    Write a derivative of the image at `source_path` into `directory` for each
+    of SIZES and return [(size name, filename, width, height)]. Runs in a
+    worker process.
+    """
+    from PIL import Image, ImageOps
+
+    results = []
+    with Image.open(source_path) as im:
+        # JPEGs can be decoded straight at a fraction of their size
+        largest = max(SIZES.values())
+        im.draft("RGB", (largest, largest))
+        current = ImageOps.exif_transpose(im)
+        if current.mode not in ("RGB", "RGBA"):
+            current = current.convert("RGBA" if current.mode in ("LA", "PA") or "transparency" in current.info else "RGB")
+        # largest first, each one shrunk from the last
+        for name, edge in sorted(SIZES.items(), key=lambda item: -item[1]):
+            current = current.copy()
+            current.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            current.save(buffer, FORMAT, quality=QUALITY, method=4)
+            data = buffer.getvalue()
+            filename = hashlib.sha256(data).hexdigest() + SUFFIX
+            target = Path(directory) / filename
+            if not target.exists():
+                fd, temp_path = tempfile.mkstemp(dir=directory, prefix=media.TEMP_PREFIX)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.chmod(temp_path, media.FILE_MODE)
+                os.replace(temp_path, target)
+            results.append((name, filename, current.width, current.height))
+    return results
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        # spawn rather than fork: the server has threads (sweepers, pooled
+        # connections) whose state a fork would copy mid-use. A spawned worker
+        # imports the main module again, so server.py sets up the database at
+        # startup, not on import.
+        _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _ready(source_url):
+    found = db.get_connection().execute(
+        f"SELECT COUNT(*) FROM {VARIANTS_TABLE} WHERE source_url = ?", (source_url,)).fetchone()[0]
+    return found >= len(SIZES)
+
+
+def enqueue(source_url):
+    """
+    Queue derivatives of the car image at `source_url` unless they exist or
+    are queued already, and return at once. Returns the Future, or None if
+    there is nothing to do or the queue is full.
+    """
+    global _pool
+    if not source_url or not source_url.startswith(SOURCE_PREFIX) or _ready(source_url):
+        return None
+    source_path = source_url.lstrip("/")
+    with _lock:
+        if source_url in _pending:
+            return _pending[source_url]
+        if len(_pending) >= MAX_PENDING:
+            return None
+        try:
+            future = _executor().submit(render, source_path, SOURCE_DIRECTORY)
+        except BrokenProcessPool:
+            # a worker died (say, killed for memory); start a fresh pool
+            _pool = None
+            future = _executor().submit(render, source_path, SOURCE_DIRECTORY)
+        _pending[source_url] = future
+    future.add_done_callback(lambda f: _record(source_url, f))
+    return future
+
+
+def _record(source_url, future):
+    with _lock:
+        _pending.pop(source_url, None)
+    if future.cancelled():
+        return
+    try:
+        results = future.result()
+    except Exception as e:
+        print(f"Image derivatives failed for {source_url}: {e}")
+        return
+    now = datetime.utcnow().isoformat()
+    rows = [(source_url, name, f"/{SOURCE_DIRECTORY}/{filename}", width, height, now) for name, filename, width, height in results]
+    try:
+        # catalog pages are keyed on image_variants too, so only they are rebuilt, not every cache of cars
+        with db.transaction(VARIANTS_TABLE) as conn:
+            conn.executemany(
+                f"INSERT INTO {VARIANTS_TABLE} (source_url, size, url, width, height, created_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (source_url, size) DO UPDATE SET url = excluded.url, width = excluded.width, "
+                "height = excluded.height, created_at = excluded.created_at",
+                rows,
+            )
+    except Exception as e:
+        # the files are there; backfill() records them next time
+        print(f"Recording image derivatives failed for {source_url}: {e}")
+
+
+def with_images(cars):
+    """
+    Add "images": {size name: url} to each car dict, the derivative where it
+    is ready and the car's own image otherwise (None without an image).
+    Returns `cars`.
+    """
+    sources = list({car["image"] for car in cars if car.get("image")})
+    ready = {}
+    if sources:
+        placeholders = ", ".join("?" for _ in sources)
+        for source_url, size, url in db.get_connection().execute(
+                f"SELECT source_url, size, url FROM {VARIANTS_TABLE} WHERE source_url IN ({placeholders})", sources):
+            ready.setdefault(source_url, {})[size] = url
+    for car in cars:
+        image = car.get("image")
+        car["images"] = {size: ready.get(image, {}).get(size, image) for size in SIZES} if image else None
+    return cars
+
+
+# --- Backfill ---
+
+def backfill():
+    """
+    Queue derivatives for every car image that lacks some, waiting for room
+    whenever the queue is full. Returns the number of images queued.
+    """
+    missing = [row[0] for row in db.get_connection().execute(
+        f"SELECT DISTINCT image FROM {CARS_TABLE} WHERE substr(image, 1, ?) = ? "
+        f"AND (SELECT COUNT(*) FROM {VARIANTS_TABLE} WHERE source_url = image) < ?",
+        (len(SOURCE_PREFIX), SOURCE_PREFIX, len(SIZES)))]
+    queued = 0
+    for source_url in missing:
+        if not os.path.isfile(source_url.lstrip("/")):
+            continue
+        while (future := enqueue(source_url)) is None and not _ready(source_url):
+            with _lock:
+                running = list(_pending.values())
+            if not running:
+                break
+            wait(running, return_when=FIRST_COMPLETED)
+        queued += future is not None
+    return queued
+
+
+def start_backfill():
+    """Run backfill() on a daemon thread."""
+    def run():
+        try:
+            backfill()
+        except Exception as e:
+            print(f"Image derivative backfill failed: {e}")
+    threading.Thread(target=run, name="derivative-backfill", daemon=True).start()
+
+
+def shutdown(wait=False):
+    """Stop the workers, dropping queued images. With `wait`, finish and record the running ones first."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
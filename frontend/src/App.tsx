@@ -22,6 +22,7 @@ const App = () => {
   // Auth & Cart State
   const [user, setUser] = useState<UserData | null>(null);
   const [cart, setCart] = useState<CarData[]>([]);
+  const [cartTotal, setCartTotal] = useState(0);
   const [isLoginOpen, setIsLoginOpen] = useState(false);
   const [isCartOpen, setIsCartOpen] = useState(false);
   const [authMode, setAuthMode] = useState<'login' | 'register'>('login');
@@ -54,7 +55,7 @@ const App = () => {
       const res = await fetch(`${API_BASE}/cart`);
       if (res.ok) {
         const data = await res.json();
-        const adaptedCart = data.map((car: any) => ({
+        const adaptedCart = data.items.map((car: any) => ({
           id: car.id,
           name: `${car.make ?? ''} ${car.model ?? ''}`.trim(),
           year: car.year ?? "N/A",
@@ -63,6 +64,7 @@ const App = () => {
           status: car.status
         }));
         setCart(adaptedCart);
+        setCartTotal(data.total);
       }
     } catch (err) {
       console.error("Failed to fetch cart", err);
@@ -117,6 +119,9 @@ const App = () => {
       if (res.ok) {
         fetchCart();
         alert("Added to cart!");
+      } else {
+        // 404: no such car; 409: sold, or reserved in someone else's cart
+        alert((await res.json()).message);
       }
     } catch (err) {
       alert("Failed to add to cart");
@@ -260,6 +265,12 @@ const App = () => {
               </div>
 
               <div className="p-6 border-t bg-gray-50">
+                {cart.length > 0 && (
+                  <div className="flex justify-between font-bold mb-4">
+                    <span>Total</span>
+                    <span>₹{cartTotal.toLocaleString()}</span>
+                  </div>
+                )}
                 <button onClick={checkout} disabled={cart.length === 0} className="w-full bg-green-600 text-white py-4 rounded-xl font-bold hover:bg-green-700 transition disabled:opacity-50 disabled:cursor-not-allowed">
                   Checkout Request
                 </button>
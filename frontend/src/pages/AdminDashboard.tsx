@@ -12,6 +12,9 @@ interface DashboardStats {
     pending_services: number;
 }
 
+// panels of /api/employee/dashboard, each paged with its own cursor
+const DASHBOARD_SECTIONS = ['cars', 'sales', 'sell_requests', 'services', 'contacts'];
+
 const AdminDashboard = () => {
     const navigate = useNavigate();
     const [loading, setLoading] = useState(true);
@@ -25,6 +28,7 @@ const AdminDashboard = () => {
     const [sellRequests, setSellRequests] = useState<any[]>([]);
     const [services, setServices] = useState<any[]>([]);
     const [contacts, setContacts] = useState<any[]>([]);
+    const [cursors, setCursors] = useState<Record<string, string | null>>({});
 
     const [showAddCarForm, setShowAddCarForm] = useState(false);
     const [editingCar, setEditingCar] = useState<any | null>(null);
@@ -65,23 +69,25 @@ const AdminDashboard = () => {
         }
     };
 
+    const showSection = (section: string, items: any[], append: boolean) => {
+        const setters: Record<string, React.Dispatch<React.SetStateAction<any[]>>> = {
+            cars: setCars, sales: setSales, sell_requests: setSellRequests, services: setServices, contacts: setContacts
+        };
+        setters[section](prev => append ? [...prev, ...items] : items);
+    };
+
     const loadDashboardData = async () => {
         try {
-            const [statsRes, carsRes, salesRes, sellReqRes, servicesRes, contactsRes] = await Promise.all([
-                fetch(`${API_BASE}/api/employee/stats`, { credentials: 'include' }),
-                fetch(`${API_BASE}/api/employee/cars`, { credentials: 'include' }),
-                fetch(`${API_BASE}/api/employee/sales`, { credentials: 'include' }),
-                fetch(`${API_BASE}/api/employee/sell-requests`, { credentials: 'include' }),
-                fetch(`${API_BASE}/api/employee/services`, { credentials: 'include' }),
-                fetch(`${API_BASE}/api/employee/contacts`, { credentials: 'include' })
-            ]);
-
-            setStats(await statsRes.json());
-            setCars(await carsRes.json());
-            setSales(await salesRes.json());
-            setSellRequests(await sellReqRes.json());
-            setServices(await servicesRes.json());
-            setContacts(await contactsRes.json());
+            // stats and the first page of every panel in one request
+            const res = await fetch(`${API_BASE}/api/employee/dashboard`, { credentials: 'include' });
+            const data = await res.json();
+            setStats(data.stats);
+            const nextCursors: Record<string, string | null> = {};
+            for (const section of DASHBOARD_SECTIONS) {
+                showSection(section, data[section].items, false);
+                nextCursors[section] = data[section].next_cursor;
+            }
+            setCursors(nextCursors);
         } catch (err) {
             console.error('Failed to load dashboard data:', err);
         } finally {
@@ -89,6 +95,31 @@ const AdminDashboard = () => {
         }
     };
 
+    const loadMore = async (section: string) => {
+        const cursor = cursors[section];
+        if (!cursor) return;
+        try {
+            const params = new URLSearchParams({ cursor });
+            const res = await fetch(`${API_BASE}/api/employee/dashboard/${section}?${params}`, { credentials: 'include' });
+            const data = await res.json();
+            showSection(section, data.items, true);
+            setCursors(prev => ({ ...prev, [section]: data.next_cursor }));
+        } catch (err) {
+            console.error(`Failed to load more ${section}:`, err);
+        }
+    };
+
+    const renderLoadMore = (section: string) => cursors[section] && (
+        <div className="flex justify-center mt-6">
+            <button
+                onClick={() => loadMore(section)}
+                className="px-6 py-2 text-xs tracking-widest uppercase border border-white/20 text-white/70 hover:border-luxury-gold hover:text-luxury-gold transition"
+            >
+                Load more
+            </button>
+        </div>
+    );
+
     const handleLogout = async () => {
         await fetch(`${API_BASE}/employee/logout`, { method: 'POST', credentials: 'include' });
         navigate('/employee-login');
@@ -111,6 +142,8 @@ const AdminDashboard = () => {
             if (res.ok) {
                 setCarForm({ ...carForm, image: data.url });
                 alert('Image uploaded successfully!');
+            } else {
+                alert(`Failed to upload image: ${data.message || res.statusText}`);
             }
         } catch (err) {
             alert('Failed to upload image');
@@ -500,6 +533,7 @@ const AdminDashboard = () => {
                                     </tbody>
                                 </table>
                             </div>
+                            {renderLoadMore('cars')}
                         </div>
                     )}
 
@@ -512,6 +546,7 @@ const AdminDashboard = () => {
                                         <tr className="border-b border-white/10 text-xs text-white/60">
                                             <th className="px-4 py-3 font-normal">Order ID</th>
                                             <th className="px-4 py-3 font-normal">Vehicle</th>
+                                            <th className="px-4 py-3 font-normal">Customer</th>
                                             <th className="px-4 py-3 font-normal">Price</th>
                                             <th className="px-4 py-3 font-normal">Date</th>
                                         </tr>
@@ -521,6 +556,7 @@ const AdminDashboard = () => {
                                             <tr key={sale.order_id} className="hover:bg-white/5">
                                                 <td className="px-4 py-4 text-xs">{sale.order_id.substring(0, 8)}...</td>
                                                 <td className="px-4 py-4 text-white">{sale.car_name}</td>
+                                                <td className="px-4 py-4 text-sm">{sale.customer_name || sale.phone || '—'}</td>
                                                 <td className="px-4 py-4 text-luxury-gold">₹{sale.price?.toLocaleString()}</td>
                                                 <td className="px-4 py-4 text-sm">{new Date(sale.timestamp).toLocaleDateString()}</td>
                                             </tr>
@@ -528,6 +564,7 @@ const AdminDashboard = () => {
                                     </tbody>
                                 </table>
                             </div>
+                            {renderLoadMore('sales')}
                         </div>
                     )}
 
@@ -556,6 +593,54 @@ const AdminDashboard = () => {
                                     </div>
                                 ))}
                             </div>
+                            {renderLoadMore('sell_requests')}
+                        </div>
+                    )}
+
+                    {activeTab === 'services' && (
+                        <div>
+                            <h2 className="text-xl font-serif text-white mb-8">Service Bookings</h2>
+                            <div className="space-y-4">
+                                {services.map(service => (
+                                    <div key={service.service_id} className="p-6 bg-white/5 border border-white/10 flex justify-between items-center">
+                                        <div>
+                                            <div className="text-white mb-1">{service.owner_name} • {service.phone}</div>
+                                            <div className="text-xs text-gray-500">
+                                                {service.car_id || 'No car'} • {service.service_date || 'No date'}{service.notes ? ` • ${service.notes}` : ''}
+                                            </div>
+                                        </div>
+                                        <select
+                                            value={service.status}
+                                            onChange={(e) => handleUpdateStatus('services', service.service_id, e.target.value)}
+                                            className="bg-luxury-black border border-white/10 text-xs text-gray-300 p-1 outline-none"
+                                        >
+                                            <option value="scheduled">Scheduled</option>
+                                            <option value="pending">Pending</option>
+                                            <option value="completed">Completed</option>
+                                            <option value="cancelled">Cancelled</option>
+                                        </select>
+                                    </div>
+                                ))}
+                            </div>
+                            {renderLoadMore('services')}
+                        </div>
+                    )}
+
+                    {activeTab === 'contacts' && (
+                        <div>
+                            <h2 className="text-xl font-serif text-white mb-8">Messages</h2>
+                            <div className="space-y-4">
+                                {contacts.map(contact => (
+                                    <div key={contact.contact_id} className="p-6 bg-white/5 border border-white/10">
+                                        <div className="flex justify-between mb-2">
+                                            <div className="text-white">{contact.name} • <span className="text-gray-400">{contact.email}</span></div>
+                                            <div className="text-xs text-gray-500">{contact.timestamp && new Date(contact.timestamp).toLocaleDateString()}</div>
+                                        </div>
+                                        <p className="text-sm text-gray-300 whitespace-pre-wrap">{contact.message}</p>
+                                    </div>
+                                ))}
+                            </div>
+                            {renderLoadMore('contacts')}
                         </div>
                     )}
 
@@ -607,7 +692,8 @@ const AdminDashboard = () => {
                                                     alert('Logo uploaded successfully!');
                                                     window.location.reload();
                                                 } else {
-                                                    alert('Failed to upload logo');
+                                                    const data = await res.json();
+                                                    alert(`Failed to upload logo: ${data.message || res.statusText}`);
                                                 }
                                             } catch (err) {
                                                 alert('Failed to upload logo');
@@ -1,8 +1,9 @@
 import React, { useState, useEffect } from 'react';
 import { ShoppingCart, X, ArrowRight } from 'lucide-react';
-import type { CarData } from '../types';
+import type { CarData, CarImages } from '../types';
 
 const API_BASE = 'http://localhost:8000/api';
+const PAGE_SIZE = 24;
 
 interface BuyCarProps {
     addToCart: (carId: string) => void;
@@ -20,55 +21,80 @@ interface RawCarData {
     owner?: string;
     type?: string;
     image?: string;
+    images?: CarImages | null;
     description?: string;
     features?: string[];
     status?: string;
     specs?: { hp: number };
 }
 
+const adaptCar = (car: RawCarData) => ({
+    id: car.id,
+    name: `${car.make ?? ''} ${car.model ?? ''}`.trim(),
+    year: car.year ?? "N/A",
+    price: `₹${car.price?.toLocaleString() ?? 0}`,
+    mileage: `${car.mileage?.toLocaleString() ?? 0} km`,
+    fuel: car.fuel ?? "Petrol",
+    transmission: car.transmission ?? "Manual",
+    owner: car.owner ?? "1st Owner",
+    type: car.type ?? "sedan",
+    image: car.image ?? "",
+    images: car.images ?? null,
+    description: car.description ?? "Great condition vehicle.",
+    features: car.features ?? ['AC', 'Power Steering'],
+    status: car.status ?? "available",
+    specs: car.specs ?? { hp: 0 }
+});
+
 const BuyCar: React.FC<BuyCarProps> = ({ addToCart }) => {
     const [selectedBodyStyle, setSelectedBodyStyle] = useState('all');
     const [cars, setCars] = useState<CarData[]>([]);
     const [loading, setLoading] = useState(true);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [selectedCar, setSelectedCar] = useState<CarData | null>(null);
     const [showCarDetails, setShowCarDetails] = useState(false);
 
+    // The server filters and pages the catalog; the next page's cursor comes back in X-Next-Cursor
+    const fetchCars = (cursor: string | null) => {
+        const params = new URLSearchParams({ status: 'available', limit: String(PAGE_SIZE) });
+        if (selectedBodyStyle !== 'all') params.set('type', selectedBodyStyle);
+        if (cursor) params.set('cursor', cursor);
+        return fetch(`${API_BASE}/cars?${params}`)
+            .then(res => Promise.all([res.json(), res.headers.get('X-Next-Cursor')]))
+            .then(([data, next]) => {
+                if (!Array.isArray(data)) data = [];
+                setNextCursor(next);
+                return data.map(adaptCar);
+            });
+    };
+
     useEffect(() => {
-        const fetchCars = () => {
-            setLoading(true);
-            const query = selectedBodyStyle === 'all' ? '' : `?type=${selectedBodyStyle}`;
-            fetch(`${API_BASE}/cars${query}`)
-                .then(res => res.json())
-                .then(data => {
-                    if (!Array.isArray(data)) data = [];
-                    const adaptedCars = data.map((car: RawCarData) => ({
-                        id: car.id,
-                        name: `${car.make ?? ''} ${car.model ?? ''}`.trim(),
-                        year: car.year ?? "N/A",
-                        price: `₹${car.price?.toLocaleString() ?? 0}`,
-                        mileage: `${car.mileage?.toLocaleString() ?? 0} km`,
-                        fuel: car.fuel ?? "Petrol",
-                        transmission: car.transmission ?? "Manual",
-                        owner: car.owner ?? "1st Owner",
-                        type: car.type ?? "sedan",
-                        image: car.image ?? "",
-                        description: car.description ?? "Great condition vehicle.",
-                        features: car.features ?? ['AC', 'Power Steering'],
-                        status: car.status ?? "available",
-                        specs: car.specs ?? { hp: 0 }
-                    }));
-                    setCars(adaptedCars);
-                    setLoading(false);
-                })
-                .catch(err => {
-                    console.error("Failed to fetch cars:", err);
-                    setLoading(false);
-                });
-        };
-
-        fetchCars();
+        setLoading(true);
+        fetchCars(null)
+            .then(page => {
+                setCars(page);
+                setLoading(false);
+            })
+            .catch(err => {
+                console.error("Failed to fetch cars:", err);
+                setLoading(false);
+            });
     }, [selectedBodyStyle]);
 
+    const loadMore = () => {
+        setLoadingMore(true);
+        fetchCars(nextCursor)
+            .then(page => {
+                setCars(prev => [...prev, ...page]);
+                setLoadingMore(false);
+            })
+            .catch(err => {
+                console.error("Failed to fetch cars:", err);
+                setLoadingMore(false);
+            });
+    };
+
     const handleCarClick = (car: CarData) => {
         setSelectedCar(car);
         setShowCarDetails(true);
@@ -123,10 +149,14 @@ const BuyCar: React.FC<BuyCarProps> = ({ addToCart }) => {
                                 <div className="relative h-64 overflow-hidden">
                                     <div className="absolute inset-0 bg-luxury-black/20 group-hover:bg-transparent transition-colors z-10" />
                                     <img
-                                        src={getCarImageUrl(car.image)}
+                                        src={getCarImageUrl(car.images?.card ?? car.image)}
+                                        srcSet={car.images ? `${getCarImageUrl(car.images.thumb)} 160w, ${getCarImageUrl(car.images.card)} 480w, ${getCarImageUrl(car.images.full)} 1280w` : undefined}
+                                        sizes="(min-width: 1024px) 33vw, (min-width: 768px) 50vw, 100vw"
+                                        loading="lazy"
                                         alt={car.name}
                                         className="w-full h-full object-cover transform group-hover:scale-110 transition-transform duration-700"
                                         onError={(e) => {
+                                            e.currentTarget.srcset = '';
                                             e.currentTarget.src = 'https://images.unsplash.com/photo-1494976388531-d1058494cdd8?auto=format&fit=crop&q=80';
                                         }}
                                     />
@@ -172,6 +202,19 @@ const BuyCar: React.FC<BuyCarProps> = ({ addToCart }) => {
                         ))}
                     </div>
                 )}
+
+                {/* Next page */}
+                {!loading && nextCursor && (
+                    <div className="flex justify-center mt-16">
+                        <button
+                            onClick={loadMore}
+                            disabled={loadingMore}
+                            className="px-8 py-3 rounded-full text-sm tracking-widest uppercase border border-luxury-text/20 text-luxury-text hover:border-luxury-gold hover:text-luxury-gold bg-transparent transition-all duration-300 disabled:opacity-50"
+                        >
+                            {loadingMore ? 'Loading...' : 'Load more'}
+                        </button>
+                    </div>
+                )}
             </div>
 
             {/* Car Details Modal */}
@@ -182,7 +225,7 @@ const BuyCar: React.FC<BuyCarProps> = ({ addToCart }) => {
                             {/* Image */}
                             <div className="relative h-64 md:h-auto bg-black">
                                 <img
-                                    src={getCarImageUrl(selectedCar.image)}
+                                    src={getCarImageUrl(selectedCar.images?.full ?? selectedCar.image)}
                                     alt={selectedCar.name}
                                     className="w-full h-full object-cover"
                                     onError={(e) => {
@@ -31,6 +31,9 @@ interface CarData {
     status: string;
 }
 
+// panels of /api/employee/dashboard, each paged with its own cursor
+const DASHBOARD_SECTIONS = ['cars', 'sales', 'sell_requests', 'services', 'contacts'];
+
 const EmployeeDashboard = () => {
     const navigate = useNavigate();
     const [loading, setLoading] = useState(true);
@@ -45,6 +48,7 @@ const EmployeeDashboard = () => {
     const [sellRequests, setSellRequests] = useState<any[]>([]);
     const [services, setServices] = useState<any[]>([]);
     const [contacts, setContacts] = useState<any[]>([]);
+    const [cursors, setCursors] = useState<Record<string, string | null>>({});
 
     // Form states
     const [showAddCarForm, setShowAddCarForm] = useState(false);
@@ -73,28 +77,55 @@ const EmployeeDashboard = () => {
         }
     };
 
+    const showSection = (section: string, items: any[], append: boolean) => {
+        const setters: Record<string, React.Dispatch<React.SetStateAction<any[]>>> = {
+            cars: setCars, sales: setSales, sell_requests: setSellRequests, services: setServices, contacts: setContacts
+        };
+        setters[section](prev => append ? [...prev, ...items] : items);
+    };
+
     const loadDashboardData = async () => {
         try {
-            const [statsRes, carsRes, salesRes, sellReqRes, servicesRes, contactsRes] = await Promise.all([
-                fetch(`${API_BASE}/api/employee/stats`, { credentials: 'include' }),
-                fetch(`${API_BASE}/api/employee/cars`, { credentials: 'include' }),
-                fetch(`${API_BASE}/api/employee/sales`, { credentials: 'include' }),
-                fetch(`${API_BASE}/api/employee/sell-requests`, { credentials: 'include' }),
-                fetch(`${API_BASE}/api/employee/services`, { credentials: 'include' }),
-                fetch(`${API_BASE}/api/employee/contacts`, { credentials: 'include' })
-            ]);
-
-            setStats(await statsRes.json());
-            setCars(await carsRes.json());
-            setSales(await salesRes.json());
-            setSellRequests(await sellReqRes.json());
-            setServices(await servicesRes.json());
-            setContacts(await contactsRes.json());
+            // stats and the first page of every panel in one request
+            const res = await fetch(`${API_BASE}/api/employee/dashboard`, { credentials: 'include' });
+            const data = await res.json();
+            setStats(data.stats);
+            const nextCursors: Record<string, string | null> = {};
+            for (const section of DASHBOARD_SECTIONS) {
+                showSection(section, data[section].items, false);
+                nextCursors[section] = data[section].next_cursor;
+            }
+            setCursors(nextCursors);
         } catch (err) {
             console.error('Failed to load dashboard data:', err);
         }
     };
 
+    const loadMore = async (section: string) => {
+        const cursor = cursors[section];
+        if (!cursor) return;
+        try {
+            const params = new URLSearchParams({ cursor });
+            const res = await fetch(`${API_BASE}/api/employee/dashboard/${section}?${params}`, { credentials: 'include' });
+            const data = await res.json();
+            showSection(section, data.items, true);
+            setCursors(prev => ({ ...prev, [section]: data.next_cursor }));
+        } catch (err) {
+            console.error(`Failed to load more ${section}:`, err);
+        }
+    };
+
+    const renderLoadMore = (section: string) => cursors[section] && (
+        <div className="flex justify-center mt-6">
+            <button
+                onClick={() => loadMore(section)}
+                className="px-6 py-2 text-xs tracking-widest uppercase border border-white/20 text-white/70 hover:border-luxury-gold hover:text-luxury-gold transition"
+            >
+                Load more
+            </button>
+        </div>
+    );
+
     const handleLogout = async () => {
         await fetch(`${API_BASE}/employee/logout`, { method: 'POST', credentials: 'include' });
         navigate('/employee-login');
@@ -380,6 +411,7 @@ const EmployeeDashboard = () => {
                                     </table>
                                 </div>
                             </div>
+                            {renderLoadMore('cars')}
                         </div>
                     )}
 
@@ -393,6 +425,7 @@ const EmployeeDashboard = () => {
                                             <tr>
                                                 <th className="px-6 py-4 text-left text-sm font-serif font-semibold text-white">Order ID</th>
                                                 <th className="px-6 py-4 text-left text-sm font-serif font-semibold text-white">Car</th>
+                                                <th className="px-6 py-4 text-left text-sm font-serif font-semibold text-white">Customer</th>
                                                 <th className="px-6 py-4 text-left text-sm font-serif font-semibold text-white">Price</th>
                                                 <th className="px-6 py-4 text-left text-sm font-serif font-semibold text-white">Date</th>
                                             </tr>
@@ -402,6 +435,7 @@ const EmployeeDashboard = () => {
                                                 <tr key={sale.order_id} className="hover:bg-luxury-gold/5 transition-colors">
                                                     <td className="px-6 py-4 text-sm font-mono text-gray-300">{sale.order_id}</td>
                                                     <td className="px-6 py-4 text-sm text-white font-medium">{sale.car_name}</td>
+                                                    <td className="px-6 py-4 text-sm text-gray-300">{sale.customer_name || sale.phone || '—'}</td>
                                                     <td className="px-6 py-4 text-sm font-semibold text-white">₹{sale.price.toLocaleString()}</td>
                                                     <td className="px-6 py-4 text-sm text-gray-300">{new Date(sale.timestamp).toLocaleDateString()}</td>
                                                 </tr>
@@ -410,6 +444,7 @@ const EmployeeDashboard = () => {
                                     </table>
                                 </div>
                             </div>
+                            {renderLoadMore('sales')}
                         </div>
                     )}
 
@@ -459,6 +494,7 @@ const EmployeeDashboard = () => {
                                     </table>
                                 </div>
                             </div>
+                            {renderLoadMore('sell_requests')}
                         </div>
                     )}
 
@@ -506,6 +542,7 @@ const EmployeeDashboard = () => {
                                     </table>
                                 </div>
                             </div>
+                            {renderLoadMore('services')}
                         </div>
                     )}
 
@@ -528,6 +565,7 @@ const EmployeeDashboard = () => {
                                     </div>
                                 ))}
                             </div>
+                            {renderLoadMore('contacts')}
                         </div>
                     )}
                 </div>
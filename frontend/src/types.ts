@@ -1,3 +1,10 @@
+// resized copies of a car's image, keyed by size (see derivatives.py)
+export interface CarImages {
+    thumb: string;
+    card: string;
+    full: string;
+}
+
 export interface CarData {
     id: string;
     name: string;
@@ -9,6 +16,7 @@ export interface CarData {
     owner: string;
     type: string;
     image: string;
+    images?: CarImages | null;
     description: string;
     features: string[];
     status: string;
@@ -0,0 +1,124 @@
+"""
+holds.py
+
+Time-limited reservations of cars in carts.
+
+Adding a car to a cart holds it for HOLD_SECONDS: nobody else can add it,
+and the public catalog leaves it out, so a car in demand goes to the first
+customer to pick it instead of the first to get through checkout. Each hold
+is one row in car_holds keyed by car, so taking one is a single conditional
+upsert that also settles races between customers.
+
+The catalog asks held_cars() on every request. It answers from an in-memory
+set that is rebuilt only when car_holds is written (by this process or
+another, per db.table_version()) or when the earliest hold runs out. A
+background sweeper deletes expired rows in batches so the table stays small.
+Set HOLD_SECONDS to 0 to turn holds off.
+"""
+
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+import db
+
+HOLDS_TABLE = "car_holds"
+
+HOLD_SECONDS = 15 * 60
+
+SWEEP_INTERVAL = 60
+SWEEP_BATCH = 500
+
+_held = {}  # db path -> (table version, valid until, digest, frozenset of car ids)
+_sweeper_stop = threading.Event()
+
+
+def enabled():
+    return HOLD_SECONDS > 0
+
+
+def hold(car_id, session_id, conn=None):
+    """
+    Hold `car_id` for the cart of `session_id` for HOLD_SECONDS, renewing the
+    hold if the session already has it. Returns False if someone else holds
+    the car. Pass `conn` to take the hold inside the caller's transaction.
+    """
+    if not enabled():
+        return True
+    now = datetime.utcnow()
+    sql = (f"INSERT INTO {HOLDS_TABLE} (car_id, session_id, expires_at) VALUES (?, ?, ?) "
+           "ON CONFLICT (car_id) DO UPDATE SET session_id = excluded.session_id, expires_at = excluded.expires_at "
+           f"WHERE {HOLDS_TABLE}.session_id = excluded.session_id OR {HOLDS_TABLE}.expires_at < ?")
+    params = (car_id, session_id, (now + timedelta(seconds=HOLD_SECONDS)).isoformat(), now.isoformat())
+    if conn is not None:
+        return conn.execute(sql, params).rowcount > 0
+    with db.transaction(HOLDS_TABLE) as conn:
+        if conn.execute(sql, params).rowcount:
+            return True
+        # nothing changed, so don't invalidate anyone's cached catalog
+        raise db.Rollback()
+    return False
+
+
+def release(session_id, car_id=None, conn=None):
+    """
+    Drop the hold `session_id` has on `car_id`, or all of its holds. Pass
+    `conn` to do it inside the caller's transaction.
+    """
+    where = {"session_id": session_id}
+    if car_id is not None:
+        where["car_id"] = car_id
+    if conn is None:
+        db.delete_rows(HOLDS_TABLE, where)
+        return
+    conn.execute(f"DELETE FROM {HOLDS_TABLE} WHERE " + " AND ".join(f"{col} = ?" for col in where), list(where.values()))
+
+
+def held_cars():
+    """
+    (digest, ids): the frozenset of car ids currently held, and a short digest
+    of it, the same in every process, for use in cache keys and ETags.
+    """
+    if not enabled():
+        return "", frozenset()
+    path = str(db.DB_FILE)
+    # read the version first, as in db.cached()
+    version = db.table_version(HOLDS_TABLE)
+    now = datetime.utcnow().isoformat()
+    current = _held.get(path)
+    if current is not None and current[0] == version and now < current[1]:
+        return current[2], current[3]
+    rows = db.get_connection().execute(
+        f"SELECT car_id, expires_at FROM {HOLDS_TABLE} WHERE expires_at >= ?", (now,)).fetchall()
+    ids = frozenset(car_id for car_id, _ in rows)
+    # the set shrinks by itself when the earliest hold runs out
+    valid_until = min((expires_at for _, expires_at in rows), default="9999")
+    digest = hashlib.sha1("\n".join(sorted(ids)).encode()).hexdigest()[:12] if ids else ""
+    _held[path] = (version, valid_until, digest, ids)
+    return digest, ids
+
+
+# --- Expiry ---
+
+def sweep_expired():
+    """Delete expired holds, SWEEP_BATCH per transaction. Returns the number deleted."""
+    return db.delete_expired(HOLDS_TABLE, "expires_at", datetime.utcnow().isoformat(), SWEEP_BATCH)
+
+
+def _sweep_loop():
+    while not _sweeper_stop.wait(SWEEP_INTERVAL):
+        try:
+            sweep_expired()
+        except Exception as e:
+            print(f"Hold sweep failed: {e}")
+
+
+def start_sweeper():
+    """Sweep once now, then every SWEEP_INTERVAL seconds on a daemon thread."""
+    _sweeper_stop.clear()
+    sweep_expired()
+    threading.Thread(target=_sweep_loop, name="hold-sweeper", daemon=True).start()
+
+
+def stop_sweeper():
+    _sweeper_stop.set()
@@ -0,0 +1,136 @@
+"""
+inventory.py
+
+Columnar index of the available cars, for the buy page's multi-filter search
+with live facet counts ("Diesel (124)", "SUV (87)").
+
+The index is a set of NumPy arrays, one entry per available car: small integer
+codes for the categorical columns and int64 arrays for the numeric ones. A
+query turns each filter into a boolean mask and combines them, so filtering
+and counting cost a few vectorized passes instead of a DataFrame per request.
+
+The index is built from one scan of the cars table and cached with db.cached(),
+so it is rebuilt the first time it is used after any write to the table, in
+this process or another one.
+"""
+
+import numpy as np
+
+import db
+
+CARS_TABLE = "cars"
+
+# Matched case-insensitively; the label shown is the first spelling seen
+CATEGORICAL = ("make", "fuel", "type", "transmission")
+NUMERIC = ("price", "year", "mileage")
+
+# Bucket edges for the numeric histograms; the last bucket is open-ended
+HISTOGRAM_EDGES = {
+    "price": [0, 300000, 500000, 800000, 1200000, 2000000],
+    "mileage": [0, 10000, 30000, 60000, 100000],
+}
+
+
+def build_index():
+    """Read every available car into columnar arrays."""
+    columns = ("id",) + CATEGORICAL + NUMERIC
+    rows = db.get_connection().execute(
+        # case-insensitive, like add_cart_item and checkout_cart, so "Available" counts too
+        f"SELECT {', '.join(columns)} FROM {CARS_TABLE} WHERE lower(status) = 'available' ORDER BY id"
+    ).fetchall()
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    data = dict(zip(columns, values))
+
+    count = len(rows)
+    index = {"ids": np.array(data["id"], dtype=object), "codes": {}, "labels": {}, "numbers": {}, "present": {},
+             "positions": {car_id: i for i, car_id in enumerate(data["id"])}}
+    for col in CATEGORICAL:
+        # code values in order of first appearance, then renumber so labels come out sorted
+        codes_by_key, labels = {}, []
+        first_codes = np.empty(count, dtype=np.int32)
+        for i, raw in enumerate(data[col]):
+            key = str(raw).strip().lower() if raw is not None else ""
+            code = codes_by_key.get(key)
+            if code is None:
+                code = codes_by_key[key] = len(labels)
+                labels.append(str(raw).strip() if raw is not None else "")
+            first_codes[i] = code
+        order = sorted(range(len(labels)), key=lambda c: labels[c].lower())
+        renumber = np.empty(len(labels), dtype=np.int32)
+        renumber[order] = np.arange(len(labels), dtype=np.int32)
+        index["codes"][col] = renumber[first_codes]
+        index["labels"][col] = [labels[c] for c in order]
+    for col in NUMERIC:
+        # None becomes NaN in a float array
+        numbers = np.array(data[col], dtype=np.float64)
+        index["present"][col] = ~np.isnan(numbers)
+        index["numbers"][col] = np.nan_to_num(numbers).astype(np.int64)
+    return index
+
+
+def get_index():
+    return db.cached(CARS_TABLE, "inventory_index", build_index)
+
+
+def _category_mask(index, col, wanted):
+    # codes of the labels asked for; a value nobody has matches nothing
+    keys = [label.strip().lower() for label in index["labels"][col]]
+    codes = [keys.index(w.strip().lower()) for w in wanted if w.strip().lower() in keys]
+    return np.isin(index["codes"][col], codes)
+
+
+def _histogram(index, col, mask):
+    values = index["numbers"][col][mask & index["present"][col]]
+    if col == "year":
+        years, counts = np.unique(values, return_counts=True)
+        return [{"value": int(y), "count": int(n)} for y, n in zip(years, counts)]
+    edges = HISTOGRAM_EDGES[col]
+    counts = np.bincount(np.searchsorted(edges, values, side="right") - 1, minlength=len(edges))
+    return [{"min": lo, "max": hi, "count": int(n)} for lo, hi, n in zip(edges, edges[1:] + [None], counts)]
+
+
+def query(categories=None, ranges=None, limit=500, exclude=()):
+    """
+    Filter the available cars.
+
+    categories: {column: [values]}; a car matches if its value is any of them.
+    ranges: {column: (low, high)} inclusive, either end None.
+    exclude: ids of cars to leave out entirely, e.g. ones held in carts.
+
+    Returns {"total", "ids" (first `limit`, by id), "facets", "histograms"}.
+    Each facet or histogram counts the cars matching every filter except the
+    one on its own column, so it shows what choosing another value would give.
+    """
+    index = get_index()
+    count = len(index["ids"])
+    masks = {}
+    for col, wanted in (categories or {}).items():
+        if wanted:
+            masks[col] = _category_mask(index, col, wanted)
+    for col, (low, high) in (ranges or {}).items():
+        mask = np.ones(count, dtype=bool)
+        if low is not None:
+            mask &= index["present"][col] & (index["numbers"][col] >= low)
+        if high is not None:
+            mask &= index["present"][col] & (index["numbers"][col] <= high)
+        masks[col] = mask
+
+    base = np.ones(count, dtype=bool)
+    positions = [index["positions"][car_id] for car_id in exclude if car_id in index["positions"]]
+    base[positions] = False
+
+    def all_except(skip):
+        mask = base.copy()
+        for col, m in masks.items():
+            if col != skip:
+                mask &= m
+        return mask
+
+    matched = all_except(None)
+    facets = {}
+    for col in CATEGORICAL:
+        counts = np.bincount(index["codes"][col][all_except(col)], minlength=len(index["labels"][col]))
+        facets[col] = [{"value": label, "count": int(n)} for label, n in zip(index["labels"][col], counts) if label and n]
+    histograms = {col: _histogram(index, col, all_except(col)) for col in NUMERIC}
+    ids = index["ids"][matched]
+    return {"total": int(len(ids)), "ids": ids[:limit].tolist(), "facets": facets, "histograms": histograms}
@@ -0,0 +1,367 @@
+"""
+media.py
+
+Uploads of car images, the hero video and the logo.
+
+The upload handlers read the multipart body straight off the request stream
+instead of letting FastAPI spool it to a temp file first, so limits apply
+while the bytes arrive. An upload over its size limit, or one whose name,
+declared type or leading bytes don't match an allowed type, is refused
+mid-stream. Nothing past that point is read or written. Accepted data goes
+to a hidden temp file next to its destination, written from the threadpool
+so the event loop never waits on the disk, and is renamed into place once
+complete. A reader therefore sees either the old file or the whole new one.
+
+Files are named by the SHA-256 of their content, so uploading the same file
+twice stores it once, and a URL always means the same bytes. The rows that
+use a file are indexed in media_refs by triggers (see "media" in db.SCHEMA).
+collect_garbage() deletes uploads no row points to, after a grace period
+that covers a file uploaded but not yet saved to its car.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+from starlette.formparsers import multipart, parse_options_header
+
+import db
+
+MB = 1024 * 1024
+
+# extension -> (content type, offset of the signature, signature); None skips the byte check
+IMAGE_TYPES = {
+    ".jpg": ("image/jpeg", 0, b"\xff\xd8\xff"),
+    ".jpeg": ("image/jpeg", 0, b"\xff\xd8\xff"),
+    ".png": ("image/png", 0, b"\x89PNG\r\n\x1a\n"),
+    ".gif": ("image/gif", 0, b"GIF8"),
+    ".webp": ("image/webp", 8, b"WEBP"),
+    ".avif": ("image/avif", 4, b"ftyp"),
+}
+VIDEO_TYPES = {
+    ".mp4": ("video/mp4", 4, b"ftyp"),
+    ".mov": ("video/quicktime", 4, b"ftyp"),
+    ".webm": ("video/webm", 0, b"\x1a\x45\xdf\xa3"),
+}
+LOGO_TYPES = {**IMAGE_TYPES, ".svg": ("image/svg+xml", 0, None)}
+
+# kind -> where uploads go and what is accepted
+KINDS = {
+    "car_image": {"directory": "static/car_images", "types": IMAGE_TYPES, "max_bytes": 10 * MB},
+    "hero_video": {"directory": "static/videos", "types": VIDEO_TYPES, "max_bytes": 200 * MB},
+    "logo": {"directory": "static/logos", "types": LOGO_TYPES, "max_bytes": 5 * MB},
+}
+
+# names given by upload handlers: the content hash, or before that a uuid
+# (hero_ for videos) or a fixed logo.<ext>; other files are left alone
+CONTENT_NAME = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+LEGACY_NAME = re.compile(r"^((hero_)?[0-9a-f]{32}|logo)\.[A-Za-z0-9]+$")
+TEMP_PREFIX = ".upload-"
+
+# mkstemp creates files only their owner can read; published files get the
+# mode a plain open() would give them, so another server or user can serve them
+_umask = os.umask(0)
+os.umask(_umask)
+FILE_MODE = 0o666 & ~_umask
+# suffixes of the precompressed copies static_files.py keeps next to a file
+VARIANT_SUFFIXES = (".gz", ".br")
+
+# an unreferenced upload younger than this is kept: it may be about to be saved
+GC_GRACE_SECONDS = 24 * 60 * 60
+
+FILE_FIELD = "file"
+# allowance for the multipart boundaries and part headers around the file
+FORM_OVERHEAD = 64 * 1024
+# bytes gathered before each trip to the threadpool to write them
+WRITE_SIZE = 256 * 1024
+SNIFF_SIZE = 16
+
+
+class MediaError(Exception):
+    """An upload that was refused; status_code is the HTTP status to answer with."""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _check_type(kind, filename, content_type):
+    ext = Path(filename or "").suffix.lower()
+    allowed = KINDS[kind]["types"]
+    if ext not in allowed:
+        raise MediaError(415, f"Unsupported file type '{ext or filename}'. Allowed: {', '.join(sorted(allowed))}")
+    # browsers send the real type; tools like curl fall back to octet-stream
+    if content_type not in ("", "application/octet-stream", allowed[ext][0]):
+        raise MediaError(415, f"File type {content_type} does not match '{ext}'")
+    return ext
+
+
+def _check_signature(kind, ext, head):
+    _, offset, signature = KINDS[kind]["types"][ext]
+    if signature is not None and head[offset:offset + len(signature)] != signature:
+        raise MediaError(415, f"File content is not a valid '{ext}' file")
+
+
+class _Upload:
+    """The state of one upload while its form is parsed: the file part, written to a temp file."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.limit = KINDS[kind]["max_bytes"]
+        self.header_name = b""
+        self.header_value = b""
+        self.headers = {}
+        self.in_file = False
+        self.found = False
+        self.ext = None
+        self.size = 0
+        self.head = b""
+        self.pending = []
+        self.pending_size = 0
+
+    # python-multipart callbacks; they only collect, the caller does the I/O
+
+    def on_part_begin(self):
+        self.headers = {}
+        self.in_file = False
+
+    def on_header_field(self, data, start, end):
+        self.header_name += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self.header_value += data[start:end]
+
+    def on_header_end(self):
+        self.headers[self.header_name.lower()] = self.header_value
+        self.header_name = self.header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        if options.get(b"name", b"").decode("latin-1") != FILE_FIELD or b"filename" not in options:
+            return
+        if self.found:
+            raise MediaError(400, "Only one file can be uploaded at a time")
+        content_type, _ = parse_options_header(self.headers.get(b"content-type", b""))
+        self.ext = _check_type(self.kind, options[b"filename"].decode("utf-8", "replace"), content_type.decode("latin-1").lower())
+        self.found = self.in_file = True
+
+    def on_part_data(self, data, start, end):
+        if not self.in_file:
+            return
+        self.size += end - start
+        if self.size > self.limit:
+            raise MediaError(413, f"File is larger than the {self.limit // MB} MB limit")
+        chunk = data[start:end]
+        if len(self.head) < SNIFF_SIZE:
+            self.head += chunk[:SNIFF_SIZE - len(self.head)]
+            if len(self.head) == SNIFF_SIZE:
+                _check_signature(self.kind, self.ext, self.head)
+        self.pending.append(chunk)
+        self.pending_size += len(chunk)
+
+    def on_part_end(self):
+        if self.in_file:
+            self.in_file = False
+            _check_signature(self.kind, self.ext, self.head)
+
+    def take_pending(self):
+        data = b"".join(self.pending)
+        self.pending = []
+        self.pending_size = 0
+        return data
+
+
+def _feed(parser, chunk):
+    # python-multipart reports a malformed body as a ValueError
+    try:
+        if chunk is None:
+            parser.finalize()
+        else:
+            parser.write(chunk)
+    except ValueError as e:
+        raise MediaError(400, f"Malformed multipart upload: {e}")
+
+
+def _write_file(temp_path, data, digest):
+    # hashlib drops the GIL for large buffers, so hashing here keeps it off the event loop too
+    digest.update(data)
+    with open(temp_path, "ab") as f:
+        f.write(data)
+
+
+def _finish_file(temp_path, final_path):
+    """Move the temp file to `final_path`, or drop it if that content is already stored."""
+    if final_path.exists():
+        os.remove(temp_path)
+        # restart the GC grace period: the upload is about to be referenced again
+        os.utime(final_path)
+        return
+    with open(temp_path, "ab") as f:
+        f.flush()
+        os.fsync(f.fileno())
+    os.chmod(temp_path, FILE_MODE)
+    os.replace(temp_path, final_path)
+
+
+def _new_temp_file(directory):
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=TEMP_PREFIX)
+    os.close(fd)
+    return temp_path
+
+
+async def save_upload(request, kind):
+    """
+    Stream the multipart field "file" of `request` into the folder for `kind`
+    and return (url, filename), the file being named by its content hash.
+    Raises MediaError for a malformed form, a
+    missing file, or a file over the size limit or of a type not allowed.
+    """
+    spec = KINDS[kind]
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > spec["max_bytes"] + FORM_OVERHEAD:
+        # refuse before reading a byte of the body
+        raise MediaError(413, f"File is larger than the {spec['max_bytes'] // MB} MB limit")
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise MediaError(400, "Expected a multipart/form-data upload")
+
+    upload = _Upload(kind)
+    parser = multipart.MultipartParser(params[b"boundary"], {
+        name: getattr(upload, name) for name in (
+            "on_part_begin", "on_header_field", "on_header_value", "on_header_end",
+            "on_headers_finished", "on_part_data", "on_part_end")
+    })
+    directory = Path(spec["directory"])
+    digest = hashlib.sha256()
+    temp_path = await run_in_threadpool(_new_temp_file, directory)
+    try:
+        async for chunk in request.stream():
+            _feed(parser, chunk)
+            if upload.pending_size >= WRITE_SIZE:
+                await run_in_threadpool(_write_file, temp_path, upload.take_pending(), digest)
+        _feed(parser, None)
+        if not upload.found or upload.in_file:
+            raise MediaError(400, f"No complete file in the '{FILE_FIELD}' field")
+        await run_in_threadpool(_write_file, temp_path, upload.take_pending(), digest)
+        filename = f"{digest.hexdigest()}{upload.ext}"
+        await run_in_threadpool(_finish_file, temp_path, directory / filename)
+    except BaseException:
+        # also on a dropped connection; unlinking is quick enough to do inline
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return f"/{directory.as_posix()}/{filename}", filename
+
+
+# --- Garbage collection ---
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _url(path):
+    return "/" + path.as_posix()
+
+
+def collect_garbage(dry_run=True, grace_seconds=GC_GRACE_SECONDS):
+    """
+    Reclaim uploads that nothing references. First, referenced files still
+    under an old uuid or logo.<ext> name get their content-hash name and the
+    rows using them are pointed at it. Then every upload that no row in
+    media_refs points to, and every abandoned temp file, is deleted once it is
+    older than `grace_seconds`, along with its precompressed copies. Resized
+    copies of a referenced image count as referenced.
+
+    With dry_run nothing is changed. Returns a report of what was (or would
+    be) renamed and deleted, and the bytes reclaimed. Files sharing an inode
+    are counted once, and only if no kept name still uses it.
+    """
+    # resized copies (see derivatives.py) live as long as their image
+    referenced = {row[0] for row in db.get_connection().execute(
+        "SELECT url FROM media_refs UNION SELECT url FROM image_variants WHERE source_url IN (SELECT url FROM media_refs)")}
+    cutoff = time.time() - grace_seconds
+    renamed, doomed, kept_inodes, planned = [], [], set(), {}
+    for spec in KINDS.values():
+        directory = Path(spec["directory"])
+        if not directory.is_dir():
+            continue
+        for path in sorted(directory.iterdir()):
+            if not path.is_file() or path.suffix in VARIANT_SUFFIXES:
+                continue
+            name, url, st = path.name, _url(path), path.stat()
+            if url in referenced and LEGACY_NAME.match(name):
+                target = directory / f"{_file_digest(path)}{path.suffix.lower()}"
+                if target not in planned:
+                    # the content lives on under the new name, as a link to this file unless it exists
+                    target_st = target.stat() if target.exists() else st
+                    planned[target] = (target_st.st_dev, target_st.st_ino)
+                kept_inodes.add(planned[target])
+                renamed.append((path, target))
+                doomed.append((path, st))
+            elif url in referenced or not (CONTENT_NAME.match(name) or LEGACY_NAME.match(name) or name.startswith(TEMP_PREFIX)):
+                kept_inodes.add((st.st_dev, st.st_ino))
+            elif st.st_mtime < cutoff:
+                doomed.append((path, st))
+            else:
+                kept_inodes.add((st.st_dev, st.st_ino))
+        # precompressed copies (see static_files.py) go with their file
+        doomed_paths = {path for path, _ in doomed}
+        for path in sorted(directory.iterdir()):
+            if path.is_file() and path.suffix in VARIANT_SUFFIXES and (path.with_suffix("") in doomed_paths or not path.with_suffix("").exists()):
+                doomed.append((path, path.stat()))
+
+    report = {"dry_run": dry_run, "renamed": [], "deleted": [], "reclaimed_bytes": 0}
+    for path, target in renamed:
+        if not dry_run:
+            if not target.exists():
+                # a second name for the same inode, so the old URL works until the rows are repointed
+                try:
+                    os.link(path, target)
+                except OSError:
+                    shutil.copy2(path, target)
+            db.replace_media_url(_url(path), _url(target))
+        report["renamed"].append({"from": _url(path), "to": _url(target)})
+    counted = set()
+    for path, st in doomed:
+        if not dry_run:
+            try:
+                # skip a file an upload has just reused (_finish_file touches it)
+                if path.stat().st_mtime != st.st_mtime and path.stat().st_mtime >= cutoff:
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+        inode = (st.st_dev, st.st_ino)
+        freed = 0 if inode in kept_inodes or inode in counted else st.st_size
+        counted.add(inode)
+        report["deleted"].append({"url": _url(path), "bytes": st.st_size})
+        report["reclaimed_bytes"] += freed
+    if not dry_run and report["deleted"]:
+        gone = [item["url"] for item in report["deleted"]]
+        with db.transaction("image_variants") as conn:
+            conn.executemany("DELETE FROM image_variants WHERE url = ? OR source_url = ?", [(url, url) for url in gone])
+    return report
+
+
+if __name__ == "__main__":
+    # python media.py [--apply]: report (or do) a garbage collection against sbmotz.db
+    db.init_db()
+    result = collect_garbage(dry_run="--apply" not in sys.argv[1:])
+    for entry in result["renamed"]:
+        print(f"rename  {entry['from']} -> {entry['to']}")
+    for entry in result["deleted"]:
+        print(f"delete  {entry['url']} ({entry['bytes']} bytes)")
+    print(f"{'Would reclaim' if result['dry_run'] else 'Reclaimed'} {result['reclaimed_bytes']} bytes")
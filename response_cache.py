@@ -0,0 +1,99 @@
+"""
+response_cache.py
+
+JSON bodies for list endpoints, serialized once per table version.
+
+Turning a few thousand rows into dicts and running them through the JSON
+encoder is most of what a list endpoint costs. Here the finished bytes are
+kept until one of the tables they were built from is written (per
+db.table_version(), so writes from other worker processes count too) and are
+served as a raw Response, skipping FastAPI's encoding entirely.
+"""
+
+import json
+import math
+import threading
+import time
+
+from fastapi.responses import Response
+
+import db
+
+MAX_ENTRIES = 500
+
+_entries = {}  # (db path, key) -> (versions, body, extra, serialize_ms)
+_lock = threading.Lock()
+_stats = {"serializations": 0, "hits": 0, "serialize_ms": 0.0, "saved_ms": 0.0, "bytes_served": 0}
+
+
+def _clean(value):
+    # pandas hands back NaN for missing values and NumPy scalars for numbers;
+    # JSON has neither, so turn them into None and plain Python numbers
+    if isinstance(value, dict):
+        return {k: _clean(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(v) for v in value]
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def serialize(payload):
+    """Encode `payload` the way FastAPI's JSONResponse would, with NaN and NumPy values cleaned up."""
+    return json.dumps(_clean(payload), ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def cached_json(tables, key, build):
+    """
+    Return (body, extra) where build() returns (payload, extra). The payload is
+    serialized once and reused until any of `tables` (a name or a tuple of
+    names) changes; `extra` (e.g. a next-page cursor) is kept alongside it.
+    """
+    if isinstance(tables, str):
+        tables = (tables,)
+    cache_key = (str(db.DB_FILE), key)
+    # versions are read before building, as in db.cached()
+    versions = tuple(db.table_version(t) for t in tables)
+    hit = _entries.get(cache_key)
+    if hit is not None and hit[0] == versions:
+        with _lock:
+            _stats["hits"] += 1
+            _stats["saved_ms"] += hit[3]
+            _stats["bytes_served"] += len(hit[1])
+        return hit[1], hit[2]
+
+    payload, extra = build()
+    start = time.perf_counter()
+    body = serialize(payload)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    with _lock:
+        _stats["serializations"] += 1
+        _stats["serialize_ms"] += elapsed_ms
+        _stats["bytes_served"] += len(body)
+        if len(_entries) >= MAX_ENTRIES:
+            _entries.clear()
+        _entries[cache_key] = (versions, body, extra, elapsed_ms)
+    return body, extra
+
+
+def json_response(tables, key, build, headers=None):
+    """A raw JSON Response of build()'s return value, serialized once per version of `tables`."""
+    body, _ = cached_json(tables, key, lambda: (build(), None))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def stats():
+    with _lock:
+        result = dict(_stats)
+        result["entries"] = len(_entries)
+    result["serialize_ms"] = round(result["serialize_ms"], 3)
+    result["saved_ms"] = round(result["saved_ms"], 3)
+    return result
@@ -21,20 +21,29 @@ Then open http://127.0.0.1:8000
 """
 
 from fastapi import FastAPI, Request, Form, Response, Cookie, HTTPException, UploadFile, File, Body
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, FileResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import pandas as pd
 from pathlib import Path
 import uuid
 import hashlib
-import json
 from datetime import datetime
 from typing import Optional
 import io
+import csv
+import html
+import zlib
 import db
-import shutil
-from fastapi.staticfiles import StaticFiles
+import derivatives
+import holds
+import inventory
+import media
+import response_cache
+import sessions
+import static_files
+import templates
+from starlette.concurrency import run_in_threadpool
 
 app = FastAPI()
 
@@ -44,15 +53,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Mount static files
-Path("static/car_images").mkdir(parents=True, exist_ok=True)
-Path("static/videos").mkdir(parents=True, exist_ok=True)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Mount static files: byte ranges, caching headers and precompressed variants (see static_files.py)
+for kind in media.KINDS.values():
+    Path(kind["directory"]).mkdir(parents=True, exist_ok=True)
+app.mount("/static", static_files.StaticFiles("static"), name="static")
 
-# Initialize DB
-db.init_db()
+@app.on_event("startup")
+def start_background_jobs():
+    init_data()
+    sessions.start_sweeper()
+    holds.start_sweeper()
+    static_files.precompress_tree("static")
+    derivatives.start_backfill()
+
+
+@app.on_event("shutdown")
+def close_db():
+    sessions.stop_sweeper()
+    holds.stop_sweeper()
+    derivatives.shutdown()
+    db.close_connections()
 
 # Table names
 CARS_TABLE = "cars"
@@ -61,13 +84,28 @@ SALES_TABLE = "sales"
 SELL_REQUESTS_TABLE = "sell_requests"
 SERVICES_TABLE = "services"
 CONTACTS_TABLE = "contacts"
-CARTS_TABLE = "carts"
+CART_ITEMS_TABLE = "cart_items"
 CUSTOMERS_TABLE = "customers"
 SETTINGS_TABLE = "settings"
 
+# catalog JSON carries each car's resized images, so it goes stale when either table is written
+CATALOG_TABLES = (CARS_TABLE, derivatives.VARIANTS_TABLE)
+
 EMP_SESSIONS_TABLE = "employee_sessions"
 CUSTOMER_SESSIONS_TABLE = "customer_sessions"
 
+# Tables an admin can download, upload or edit as CSV
+CSV_TABLES = {
+    "cars.csv": CARS_TABLE,
+    "sales.csv": SALES_TABLE,
+    "employees.csv": EMPLOYEES_TABLE,
+    "customers.csv": CUSTOMERS_TABLE,
+    "services.csv": SERVICES_TABLE,
+    "contacts.csv": CONTACTS_TABLE,
+    "sell_requests.csv": SELL_REQUESTS_TABLE,
+    "cart_items.csv": CART_ITEMS_TABLE,
+}
+
 # Helper: read/write using db module
 def read_table(table_name, default_cols=None):
     return db.read_table(table_name, default_cols)
@@ -75,30 +113,64 @@ def read_table(table_name, default_cols=None):
 def write_table(table_name, df):
     db.write_table(table_name, df)
 
-# Initialize some tables with defaults if missing/empty
-if read_table(CARS_TABLE).empty:
-    sample = pd.DataFrame([
-        {"id": "car-1", "make": "Toyota", "model": "Corolla", "year": 2019, "price": 800000, "mileage": 35000, "status": "available"},
-        {"id": "car-2", "make": "Honda", "model": "City", "year": 2018, "price": 700000, "mileage": 42000, "status": "available"},
-        {"id": "car-3", "make": "Hyundai", "model": "Creta", "year": 2020, "price": 1200000, "mileage": 22000, "status": "available"},
-    ])
-    write_table(CARS_TABLE, sample)
-
-# Ensure employees table and admin exists
-if read_table(EMPLOYEES_TABLE).empty:
-    # store username and sha256(password)
-    default_pw = hashlib.sha256("admin123".encode()).hexdigest()
-    emp = pd.DataFrame([{"username": "admin", "password_hash": default_pw, "name": "Administrator"}])
-    write_table(EMPLOYEES_TABLE, emp)
-
-# Ensure other tables exist (by reading with defaults, db.read_table handles creation/empty return)
-read_table(CUSTOMERS_TABLE, default_cols=["phone", "password_hash", "name", "created_at"]) 
-read_table(SALES_TABLE, default_cols=["order_id", "session_id", "car_id", "price", "timestamp"]) 
-read_table(SELL_REQUESTS_TABLE, default_cols=["request_id", "owner_name", "phone", "make", "model", "year", "asking_price", "notes", "status", "timestamp"]) 
-read_table(SERVICES_TABLE, default_cols=["service_id", "owner_name", "phone", "car_id", "service_date", "notes", "status", "timestamp"]) 
-read_table(CONTACTS_TABLE, default_cols=["contact_id", "name", "email", "message", "timestamp"]) 
-read_table(CARTS_TABLE, default_cols=["session_id", "items_json", "updated_at"]) 
-read_table(SETTINGS_TABLE, default_cols=["key", "value"]) 
+def get_settings():
+    """All settings as {key: value}, cached until the settings table changes."""
+    return db.cached(SETTINGS_TABLE, "values", lambda: {r["key"]: r["value"] for r in db.read_table(SETTINGS_TABLE).to_dict(orient="records")})
+
+# Conditional GET for public read endpoints. The ETag is the version of the
+# table the response comes from plus a hash of the path and query, so checking it
+# needs no query and no serialization. Take it before building the body: if a
+# write lands meanwhile the tag is older than the body, which only costs the
+# client one extra download. `variant` covers anything else the body depends on.
+def table_etag(request: Request, tables, variant=""):
+    """An ETag for this URL that changes when any of `tables` (a name or a tuple of names) is written."""
+    if isinstance(tables, str):
+        tables = (tables,)
+    versions = "-".join(f"{t}-{db.table_version(t)}" for t in tables)
+    query = hashlib.sha1(f"{request.url.path}?{request.url.query}".encode()).hexdigest()[:16]
+    return f'"{versions}-{variant + "-" if variant else ""}{query}"'
+
+def not_modified(request: Request, etag):
+    """A 304 response if the client's If-None-Match already names `etag`, else None."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    # If-None-Match uses weak comparison, so a W/ prefix still matches
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+def tagged(response, etag):
+    """Attach `etag` to a successful response; no-cache makes browsers revalidate with it."""
+    if not isinstance(response, Response):
+        response = JSONResponse(content=response)
+    if response.status_code == 200:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def init_data():
+    """
+    Initialize the DB, and some tables with defaults if missing/empty. Runs at
+    startup rather than on import: image workers (see derivatives.py) import
+    this module again when the server is run as a script.
+    """
+    db.init_db()
+    if read_table(CARS_TABLE).empty:
+        sample = pd.DataFrame([
+            {"id": "car-1", "make": "Toyota", "model": "Corolla", "year": 2019, "price": 800000, "mileage": 35000, "status": "available"},
+            {"id": "car-2", "make": "Honda", "model": "City", "year": 2018, "price": 700000, "mileage": 42000, "status": "available"},
+            {"id": "car-3", "make": "Hyundai", "model": "Creta", "year": 2020, "price": 1200000, "mileage": 22000, "status": "available"},
+        ])
+        write_table(CARS_TABLE, sample)
+
+    # Ensure employees table and admin exists
+    if read_table(EMPLOYEES_TABLE).empty:
+        # store username and sha256(password)
+        default_pw = hashlib.sha256("admin123".encode()).hexdigest()
+        emp = pd.DataFrame([{"username": "admin", "password_hash": default_pw, "name": "Administrator"}])
+        write_table(EMPLOYEES_TABLE, emp)
 
 
 # Utility: cookie names
@@ -113,66 +185,102 @@ def hash_pw(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
 
 
-# Employee session helpers
-def load_emp_sessions():
-    return db.load_session_table(EMP_SESSIONS_TABLE)
-
+EMP_SESSION_MAX_AGE = sessions.SESSION_LIFETIMES[EMP_SESSIONS_TABLE]
+CUSTOMER_SESSION_MAX_AGE = sessions.SESSION_LIFETIMES[CUSTOMER_SESSIONS_TABLE]
 
-def save_emp_sessions(d):
-    db.save_session_table(EMP_SESSIONS_TABLE, d)
 
+# Employee session helpers
+def create_emp_session(username: str, lifetime: Optional[int] = None) -> str:
+    return sessions.create_session(EMP_SESSIONS_TABLE, lifetime=lifetime, username=username)
 
-# Customer session helpers
-def load_customer_sessions():
-    return db.load_session_table(CUSTOMER_SESSIONS_TABLE)
 
+def _renew_cookie(request: Request, cookie_name: str):
+    # picked up by refresh_session_cookies once the response is built
+    token = request.cookies.get(cookie_name)
 
-def save_customer_sessions(d):
-    db.save_session_table(CUSTOMER_SESSIONS_TABLE, d)
+    def renew(lifetime):
+        request.state.renewed_cookies = getattr(request.state, "renewed_cookies", []) + [(cookie_name, token, lifetime)]
+    return renew
 
 
 # employee_required returns the username string or raises
 def employee_required(request: Request):
-    token = request.cookies.get(EMP_SESSION_COOKIE)
-    if not token:
+    session = sessions.get_session(EMP_SESSIONS_TABLE, request.cookies.get(EMP_SESSION_COOKIE), _renew_cookie(request, EMP_SESSION_COOKIE))
+    if session is None:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    d = load_emp_sessions()
-    if token not in d:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    return d[token]["username"]
+    return session["username"]
 
 
 # customer_required returns a dict {"token":..., "phone":...}
 def customer_required(request: Request):
-    token = request.cookies.get(CUSTOMER_SESSION_COOKIE)
-    if not token:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    d = load_customer_sessions()
-    if token not in d:
+    session = sessions.get_session(CUSTOMER_SESSIONS_TABLE, request.cookies.get(CUSTOMER_SESSION_COOKIE), _renew_cookie(request, CUSTOMER_SESSION_COOKIE))
+    if session is None:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    return {"token": token, "phone": d[token]["phone"]}
+    return {"token": session["token"], "phone": session["phone"]}
 
 
 # helper to create customer session token and set cookie
 def create_customer_session(response: Response, phone: str):
-    token = str(uuid.uuid4())
-    d = load_customer_sessions()
-    d[token] = {"phone": phone, "login_at": datetime.utcnow().isoformat()}
-    save_customer_sessions(d)
-    response.set_cookie(CUSTOMER_SESSION_COOKIE, token, max_age=60 * 60 * 24 * 30)
+    token = sessions.create_session(CUSTOMER_SESSIONS_TABLE, phone=phone)
+    response.set_cookie(CUSTOMER_SESSION_COOKIE, token, max_age=CUSTOMER_SESSION_MAX_AGE)
     return token
 
 
+@app.middleware("http")
+async def refresh_session_cookies(request: Request, call_next):
+    """Extend the cookie of any session that was renewed while handling the request."""
+    response = await call_next(request)
+    for cookie_name, token, lifetime in getattr(request.state, "renewed_cookies", []):
+        response.set_cookie(cookie_name, token, max_age=lifetime, path="/")
+    return response
+
+
 # --- HTML rendering helpers (very small, inline templates) ---
 
-def layout(title: str, body_html: str):
+def layout_parts(title: str):
+    """The page markup before and after the body, for pages that stream their body."""
     nav = f"""
     <nav>
       <a href="/">Home</a> | <a href="/cars">Buy Car</a> | <a href="/sell">Sell Car</a> | <a href="/service">Car Service</a> | <a href="/contact">Contact</a> | <a href="/cart">Cart</a> | <a href="/employee/login">Employee Login</a> | <a href="/customer/login">Customer Login</a>
     </nav>
     <hr>
     """
-    return f"<html><head><title>{title}</title></head><body><h1>{title}</h1>{nav}{body_html}</body></html>"
+    return f"<html><head><title>{title}</title></head><body><h1>{title}</h1>{nav}", "</body></html>"
+
+
+def layout(title: str, body_html: str):
+    head, tail = layout_parts(title)
+    return f"{head}{body_html}{tail}"
+
+
+def csv_chunks(columns, chunks):
+    """Encode a header and row chunks from db.stream_query as CSV text, one string per chunk."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def import_report_html(csv_name: str, report: dict) -> str:
+    body = f"<p>{csv_name}: loaded {report['loaded']} rows, rejected {report['rejected']}.</p>"
+    if report["errors"]:
+        body += "<ul>" + "".join(f"<li>{html.escape(e)}</li>" for e in report["errors"]) + "</ul>"
+    return body + "<p><a href='/employee/dashboard'>Back to dashboard</a></p>"
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
 
 
 # --- Routes ---
@@ -193,23 +301,88 @@ def home():
     return HTMLResponse(layout("Home", body))
 
 
+CARS_HTML_PAGE_SIZE = 50
+
+CAR_HEADERS = ["ID", "Make", "Model", "Year", "Price", "Mileage", "Status", "Action"]
+CAR_ROW = templates.Template("<tr><td>{id}</td><td>{make}</td><td>{model}</td><td>{year:.0f}</td><td>₹{price:.0f}</td><td>{mileage:.0f}</td><td>{status}</td><td></td></tr>")
+# render as table with Add-to-cart button for available cars
+AVAILABLE_CAR_ROW = templates.Template(
+    "<tr><td>{id}</td><td>{make}</td><td>{model}</td><td>{year:.0f}</td><td>₹{price:.0f}</td><td>{mileage:.0f}</td><td>{status}</td>"
+    "<td><form method='post' action='/cart/add' style='display:inline'><input type='hidden' name='car_id' value='{id}'><button type='submit'>Add to cart</button></form></td></tr>")
+
+
 @app.get("/cars", response_class=HTMLResponse)
-def list_cars(request: Request):
-    cars = read_table(CARS_TABLE)
-    if cars.empty:
-        body = "<p>No cars available.</p>"
-    else:
-        # render as table with Add-to-cart button for available cars
-        rows = []
-        rows.append("<table border='1' cellpadding='5'><tr><th>ID</th><th>Make</th><th>Model</th><th>Year</th><th>Price</th><th>Mileage</th><th>Status</th><th>Action</th></tr>")
-        for _, r in cars.iterrows():
-            action = ""
-            if str(r.get("status", "available")).lower() == "available":
-                action = f"<form method='post' action='/cart/add' style='display:inline'><input type='hidden' name='car_id' value='{r.id}'><button type='submit'>Add to cart</button></form>"
-            rows.append(f"<tr><td>{r.id}</td><td>{r.make}</td><td>{r.model}</td><td>{int(r.year) if not pd.isna(r.year) else ''}</td><td>₹{int(r.price)}</td><td>{int(r.mileage)}</td><td>{r.status}</td><td>{action}</td></tr>")
-        rows.append("</table>")
-        body = ''.join(rows)
-    return HTMLResponse(layout("Buy Cars", body))
+def list_cars(request: Request, cursor: str = None):
+    head, tail = layout_parts("Buy Cars")
+
+    def page():
+        yield head
+        try:
+            # a page only changes when an employee edits the table, so render it once per change
+            yield db.cached(CARS_TABLE, ("list_cars_html", cursor), lambda: render_cars_page(cursor))
+        except ValueError:
+            yield "<p>That page link is no longer valid. <a href='/cars'>Back to the first page</a></p>"
+        yield tail
+    return StreamingResponse(page(), media_type="text/html")
+
+
+def render_cars_page(cursor=None):
+    rows, next_cursor = db.fetch_page(CARS_TABLE, limit=CARS_HTML_PAGE_SIZE, cursor=cursor)
+    body = "".join(templates.table(CAR_HEADERS, rows, lambda r: AVAILABLE_CAR_ROW if str(r["status"]).lower() == "available" else CAR_ROW,
+                                   empty="<p>No cars available.</p>"))
+    return body + templates.pager("/cars", {}, cursor, next_cursor)
+
+
+def add_cart_item(session_id, car_id):
+    """
+    Put a car in the cart and hold it there (see holds.py); adding it again
+    renews the hold. Returns "added", or, leaving the cart alone, "not_found",
+    "unavailable" (not for sale) or "held" (in another customer's cart).
+    """
+    result = "added"
+    with db.transaction(CART_ITEMS_TABLE, holds.HOLDS_TABLE) as conn:
+        car = conn.execute("SELECT lower(status) = 'available' FROM cars WHERE id = ?", (car_id,)).fetchone()
+        if car is None or not car[0]:
+            result = "not_found" if car is None else "unavailable"
+            raise db.Rollback()
+        if not holds.hold(car_id, session_id, conn):
+            result = "held"
+            raise db.Rollback()
+        conn.execute("INSERT OR IGNORE INTO cart_items (session_id, car_id, added_at) VALUES (?, ?, ?)",
+                     (session_id, car_id, datetime.utcnow().isoformat()))
+    return result
+
+
+def remove_cart_items(session_id, car_id=None):
+    """Take one car, or every car, out of the cart and release their holds."""
+    where = {"session_id": session_id}
+    if car_id is not None:
+        where["car_id"] = car_id
+    db.delete_rows(CART_ITEMS_TABLE, where)
+    holds.release(session_id, car_id)
+
+
+def cart_contents(session_id):
+    """
+    The cart in the order cars were added, as (items, total) from one join.
+    Each item is (car_id, car row as a dict plus held_until, the expiry of
+    this cart's hold on it if any, or None if the car is gone); total is the
+    sum of the prices of the cars that still exist.
+    """
+    holds_table = holds.HOLDS_TABLE
+    cursor = db.get_connection().execute(
+        f"SELECT {CART_ITEMS_TABLE}.car_id, SUM({CARS_TABLE}.price) OVER (), {holds_table}.expires_at, {CARS_TABLE}.* "
+        f"FROM {CART_ITEMS_TABLE} LEFT JOIN {CARS_TABLE} ON {CARS_TABLE}.id = {CART_ITEMS_TABLE}.car_id "
+        f"LEFT JOIN {holds_table} ON {holds_table}.car_id = {CART_ITEMS_TABLE}.car_id AND {holds_table}.session_id = {CART_ITEMS_TABLE}.session_id "
+        f"WHERE {CART_ITEMS_TABLE}.session_id = ? ORDER BY {CART_ITEMS_TABLE}.added_at, {CART_ITEMS_TABLE}.car_id",
+        (session_id,),
+    )
+    columns = [d[0] for d in cursor.description][3:]
+    rows = cursor.fetchall()
+    # the window sum is the same on every row; cars.id is NULL for a car that's gone
+    total = (rows[0][1] or 0) if rows else 0
+    items = [(row[0], {**dict(zip(columns, row[3:])), "held_until": row[2]} if row[3] is not None else None) for row in rows]
+    return items, total
 
 
 # Customer cart/add/checkout require customer login
@@ -223,22 +396,13 @@ def add_to_cart(request: Request, car_id: str = Form(...)):
     resp = RedirectResponse(url="/cart", status_code=303)
     session_id = cust["token"]
 
-    # check car exists and available
-    cars = read_table(CARS_TABLE)
-    if car_id not in cars["id"].astype(str).tolist():
-        return HTMLResponse(layout("Error", f"<p>Car id {car_id} not found.</p>"))
-
-    carts = read_table(CARTS_TABLE)
-    found = carts[carts["session_id"] == session_id]
-    if not found.empty:
-        items = json.loads(found.iloc[0]["items_json"]) if found.iloc[0]["items_json"] else []
-        items.append(car_id)
-        carts.loc[carts["session_id"] == session_id, "items_json"] = json.dumps(items)
-        carts.loc[carts["session_id"] == session_id, "updated_at"] = datetime.utcnow().isoformat()
-    else:
-        new = {"session_id": session_id, "items_json": json.dumps([car_id]), "updated_at": datetime.utcnow().isoformat()}
-        carts = pd.concat([carts, pd.DataFrame([new])], ignore_index=True)
-    write_table(CARTS_TABLE, carts)
+    result = add_cart_item(session_id, car_id)
+    if result == "not_found":
+        return HTMLResponse(layout("Error", f"<p>Car id {html.escape(car_id)} not found.</p>"), status_code=404)
+    if result == "unavailable":
+        return HTMLResponse(layout("Error", "<p>That car is no longer for sale.</p>"), status_code=409)
+    if result == "held":
+        return HTMLResponse(layout("Error", "<p>That car is reserved in another customer's cart. Try again later.</p>"), status_code=409)
     return resp
 
 
@@ -249,20 +413,14 @@ def view_cart(request: Request):
     except HTTPException:
         return RedirectResponse(url="/customer/login")
     session_id = cust["token"]
-    carts = read_table(CARTS_TABLE)
-    sel = carts[carts["session_id"] == session_id]
-    if sel.empty:
+    items, total = cart_contents(session_id)
+    if not items:
         body = "<p>Your cart is empty.</p>"
         return HTMLResponse(layout("Cart", body))
-    items = json.loads(sel.iloc[0]["items_json"]) if sel.iloc[0]["items_json"] else []
-    cars = read_table(CARS_TABLE).set_index("id")
     lines = []
-    total = 0
-    for cid in items:
-        if cid in cars.index:
-            c = cars.loc[cid]
-            lines.append(f"<li>{c.make} {c.model} ({int(c.year)}) - ₹{int(c.price)}</li>")
-            total += int(c.price)
+    for cid, c in items:
+        if c is not None:
+            lines.append(f"<li>{c['make']} {c['model']} ({c['year'] or ''}) - ₹{c['price'] or 0}</li>")
         else:
             lines.append(f"<li>Unknown car id {cid}</li>")
     body = f"<ul>{''.join(lines)}</ul><p><strong>Total:</strong> ₹{total}</p>"
@@ -292,12 +450,55 @@ def clear_cart(request: Request):
         return RedirectResponse(url="/customer/login", status_code=303)
     resp = RedirectResponse(url="/cart", status_code=303)
     session_id = cust["token"]
-    carts = read_table(CARTS_TABLE)
-    carts = carts[carts["session_id"] != session_id]
-    write_table(CARTS_TABLE, carts)
+    remove_cart_items(session_id)
     return resp
 
 
+def checkout_cart(session_id, phone=None):
+    """
+    Sell every car in the cart in one transaction: each car is flipped from
+    available to sold only if it is still available, a sales row is written
+    for it (recording the buyer's phone), and the cart and its holds are
+    cleared. If any car can't be sold nothing is written. Returns (ok, results)
+    with one {"car_id", "result"} per item, result being "sold", "held" (in
+    another customer's cart), "unavailable" or "not_found", or "available" for
+    a car that would have sold had the checkout gone through. results is empty
+    if the cart is.
+    """
+    results = []
+    with db.transaction(CARS_TABLE, SALES_TABLE, CART_ITEMS_TABLE, holds.HOLDS_TABLE) as conn:
+        items = [r[0] for r in conn.execute(
+            "SELECT car_id FROM cart_items WHERE session_id = ? ORDER BY added_at, car_id", (session_id,))]
+        for cid in items:
+            # our hold may have run out; take it back unless someone else has
+            if not holds.hold(cid, session_id, conn):
+                results.append({"car_id": cid, "result": "held"})
+                continue
+            sold = conn.execute(
+                "UPDATE cars SET status = 'sold' WHERE id = ? AND lower(status) = 'available' RETURNING price",
+                (cid,),
+            ).fetchone()
+            if sold is None:
+                exists = conn.execute("SELECT 1 FROM cars WHERE id = ?", (cid,)).fetchone()
+                results.append({"car_id": cid, "result": "unavailable" if exists else "not_found"})
+                continue
+            conn.execute(
+                "INSERT INTO sales (order_id, session_id, car_id, price, timestamp, phone) VALUES (?, ?, ?, ?, ?, ?)",
+                (str(uuid.uuid4()), session_id, cid, int(sold[0] or 0), datetime.utcnow().isoformat(), phone),
+            )
+            results.append({"car_id": cid, "result": "sold"})
+        ok = bool(results) and all(r["result"] == "sold" for r in results)
+        if not ok:
+            # someone else bought a car first, or the cart is empty: undo the rows above
+            for r in results:
+                if r["result"] == "sold":
+                    r["result"] = "available"
+            raise db.Rollback()
+        conn.execute("DELETE FROM cart_items WHERE session_id = ?", (session_id,))
+        holds.release(session_id, conn=conn)
+    return ok, results
+
+
 @app.post("/cart/checkout")
 def checkout(request: Request):
     try:
@@ -306,27 +507,12 @@ def checkout(request: Request):
         return RedirectResponse(url="/customer/login", status_code=303)
     resp = RedirectResponse(url="/cart", status_code=303)
     session_id = cust["token"]
-    carts = read_table(CARTS_TABLE)
-    sel = carts[carts["session_id"] == session_id]
-    if sel.empty:
+    ok, results = checkout_cart(session_id, cust["phone"])
+    if not results:
         return HTMLResponse(layout("Error", "<p>Your cart is empty.</p>"))
-    items = json.loads(sel.iloc[0]["items_json"]) if sel.iloc[0]["items_json"] else []
-    cars = read_table(CARS_TABLE)
-    sales = read_table(SALES_TABLE)
-    for cid in items:
-        car_row = cars[cars["id"] == cid]
-        if car_row.empty:
-            continue
-        price = int(car_row.iloc[0]["price"])
-        order = {"order_id": str(uuid.uuid4()), "session_id": session_id, "car_id": cid, "price": price, "timestamp": datetime.utcnow().isoformat()}
-        sales = pd.concat([sales, pd.DataFrame([order])], ignore_index=True)
-        # mark car as sold
-        cars.loc[cars["id"] == cid, "status"] = "sold"
-    write_table(SALES_TABLE, sales)
-    write_table(CARS_TABLE, cars)
-    # clear cart
-    carts = carts[carts["session_id"] != session_id]
-    write_table(CARTS_TABLE, carts)
+    if not ok:
+        missing = "".join(f"<li>{html.escape(str(r['car_id']))}</li>" for r in results if r["result"] not in ("sold", "available"))
+        return HTMLResponse(layout("Error", f"<p>These cars are no longer available, so nothing was bought:</p><ul>{missing}</ul><p><a href='/cart'>Back to cart</a></p>"), status_code=409)
     return resp
 
 
@@ -359,10 +545,8 @@ def sell_car(request: Request, owner_name: str = Form(...), phone: str = Form(..
     if phone != cust["phone"]:
         # for demo: disallow mismatch
         return HTMLResponse(layout("Error", "<p>Phone number must match logged-in customer.</p>"))
-    reqs = read_table(SELL_REQUESTS_TABLE)
     req = {"request_id": str(uuid.uuid4()), "owner_name": owner_name, "phone": phone, "make": make, "model": model, "year": year, "asking_price": asking_price, "notes": notes or "", "status": "pending", "timestamp": datetime.utcnow().isoformat()}
-    reqs = pd.concat([reqs, pd.DataFrame([req])], ignore_index=True)
-    write_table(SELL_REQUESTS_TABLE, reqs)
+    db.insert_row(SELL_REQUESTS_TABLE, req)
     return HTMLResponse(layout("Sell Submitted", f"<p>Thank you, {owner_name}. Your sell request is submitted and pending approval.</p>"))
 
 
@@ -383,10 +567,8 @@ def service_form():
 
 @app.post("/service")
 def book_service(owner_name: str = Form(...), phone: str = Form(...), car_id: Optional[str] = Form(None), service_date: Optional[str] = Form(None), notes: Optional[str] = Form(None)):
-    services = read_table(SERVICES_TABLE)
     entry = {"service_id": str(uuid.uuid4()), "owner_name": owner_name, "phone": phone, "car_id": car_id or "", "service_date": service_date or "", "notes": notes or "", "status": "scheduled", "timestamp": datetime.utcnow().isoformat()}
-    services = pd.concat([services, pd.DataFrame([entry])], ignore_index=True)
-    write_table(SERVICES_TABLE, services)
+    db.insert_row(SERVICES_TABLE, entry)
     return HTMLResponse(layout("Service Booked", f"<p>Thanks {owner_name}, your service is booked.</p>"))
 
 
@@ -405,10 +587,8 @@ def contact_form():
 
 @app.post("/contact")
 def submit_contact(name: str = Form(...), email: str = Form(...), message: str = Form(...)):
-    contacts = read_table(CONTACTS_TABLE)
     entry = {"contact_id": str(uuid.uuid4()), "name": name, "email": email, "message": message, "timestamp": datetime.utcnow().isoformat()}
-    contacts = pd.concat([contacts, pd.DataFrame([entry])], ignore_index=True)
-    write_table(CONTACTS_TABLE, contacts)
+    db.insert_row(CONTACTS_TABLE, entry)
     return HTMLResponse(layout("Thanks", "<p>Your message was received. We'll get back to you soon.</p>"))
 
 
@@ -427,128 +607,137 @@ def employee_login_form():
 
 @app.post("/employee/login")
 def employee_login(response: Response, username: str = Form(...), password: str = Form(...)):
-    employees = read_table(EMPLOYEES_TABLE)
-    found = employees[employees["username"] == username]
+    found = db.find_rows(EMPLOYEES_TABLE, {"username": username})
     if found.empty:
         return HTMLResponse(layout("Login Failed", "<p>Invalid credentials.</p>"))
     expected = found.iloc[0]["password_hash"]
     if hash_pw(password) != expected:
         return HTMLResponse(layout("Login Failed", "<p>Invalid credentials.</p>"))
     # set employee session cookie (simple)
-    token = str(uuid.uuid4())
+    token = create_emp_session(username)
     response = RedirectResponse(url="/employee/dashboard", status_code=303)
-    response.set_cookie(EMP_SESSION_COOKIE, token, max_age=60 * 60 * 8)
-    d = load_emp_sessions()
-    d[token] = {"username": username, "login_at": datetime.utcnow().isoformat()}
-    save_emp_sessions(d)
+    response.set_cookie(EMP_SESSION_COOKIE, token, max_age=EMP_SESSION_MAX_AGE)
     return response
 
 
+EMPLOYEE_ROW = templates.Template("<tr><td>{username}</td><td>{name}</td><td><form method='get' action='/employee/edit_employee' style='display:inline'><input type='hidden' name='username' value='{username}'><button type='submit'>Edit</button></form></td></tr>")
+
+# Tabs for Sell Requests, Services, Sales, Contacts and Cars table with edit buttons, keyed
+# by their panel in DASHBOARD_SECTIONS, which they are read and paged like
+DASHBOARD_TABS = {
+    "sell_requests": {
+        "label": "Sell Requests", "heading": "Sell Requests",
+        "headers": ["ID", "Owner", "Make", "Model", "Year", "Asking", "Status", "Action"],
+        "row": templates.Template("<tr><td>{request_id}</td><td>{owner_name}</td><td>{make}</td><td>{model}</td><td>{year}</td><td>₹{asking_price}</td><td>{status}</td><td><form method='get' action='/employee/edit_sell_request' style='display:inline'><input type='hidden' name='request_id' value='{request_id}'><button type='submit'>Edit</button></form> <form method='post' action='/employee/approve_sell' style='display:inline'><input type='hidden' name='request_id' value='{request_id}'><button type='submit'>Approve</button></form></td></tr>"),
+        "empty": "<p>No sell requests.</p>",
+    },
+    "services": {
+        "label": "Services", "heading": "Services",
+        "headers": ["ID", "Owner", "Phone", "Car ID", "Date", "Status", "Action"],
+        "row": templates.Template("<tr><td>{service_id}</td><td>{owner_name}</td><td>{phone}</td><td>{car_id}</td><td>{service_date}</td><td>{status}</td><td><form method='get' action='/employee/edit_service' style='display:inline'><input type='hidden' name='service_id' value='{service_id}'><button type='submit'>Edit</button></form></td></tr>",
+                                  defaults={"car_id": "N/A", "service_date": "N/A"}),
+        "empty": "<p>No services.</p>",
+    },
+    "sales": {
+        "label": "Sales / Orders", "heading": "Sales / Orders",
+        "headers": ["Order ID", "Session", "Car ID", "Price", "Timestamp", "Action"],
+        "row": templates.Template("<tr><td>{order_id}</td><td>{session_id}</td><td>{car_id}</td><td>₹{price}</td><td>{timestamp}</td><td><form method='get' action='/employee/edit_sale' style='display:inline'><input type='hidden' name='order_id' value='{order_id}'><button type='submit'>Edit</button></form> <form method='post' action='/employee/delete_order' style='display:inline'><input type='hidden' name='order_id' value='{order_id}'><button type='submit'>Delete</button></form></td></tr>"),
+        "empty": "<p>No orders.</p>",
+    },
+    "contacts": {
+        "label": "Contacts", "heading": "Contacts",
+        "headers": ["ID", "Name", "Email", "Message", "Action"],
+        "row": templates.Template("<tr><td>{contact_id}</td><td>{name}</td><td>{email}</td><td>{message}</td><td><form method='get' action='/employee/edit_contact' style='display:inline'><input type='hidden' name='contact_id' value='{contact_id}'><button type='submit'>Edit</button></form></td></tr>"),
+        "empty": "<p>No contacts.</p>",
+    },
+    "cars": {
+        "label": "Cars", "heading": "Cars in inventory",
+        "headers": ["ID", "Make", "Model", "Year", "Price", "Mileage", "Status", "Action"],
+        "row": templates.Template("<tr><td>{id}</td><td>{make}</td><td>{model}</td><td>{year}</td><td>₹{price:.0f}</td><td>{mileage}</td><td>{status}</td><td><form method='get' action='/employee/edit_car' style='display:inline'><input type='hidden' name='car_id' value='{id}'><button type='submit'>Edit</button></form> <form method='post' action='/employee/delete_car' style='display:inline'><input type='hidden' name='car_id' value='{id}'><button type='submit'>Delete</button></form></td></tr>"),
+        "empty": "<p>No cars.</p>",
+    },
+}
+
+
 @app.get("/employee/dashboard", response_class=HTMLResponse)
-def employee_dashboard(request: Request):
+def employee_dashboard(request: Request, tab: str = "sell_requests", cursor: str = None):
+    """
+    Streamed as it renders, so the page starts painting before the tabs are
+    read. Each tab shows a page of its panel of /api/employee/dashboard;
+    `cursor` pages through the tab named by `tab`, the one shown on load.
+    """
     try:
         username = employee_required(request)
     except HTTPException:
         return RedirectResponse(url="/employee/login")
-    # show sell requests, services, sales, contacts
-    reqs = read_table(SELL_REQUESTS_TABLE)
-    services = read_table(SERVICES_TABLE)
-    sales = read_table(SALES_TABLE)
-    contacts = read_table(CONTACTS_TABLE)
-    cars = read_table(CARS_TABLE)
-    employees = read_table(EMPLOYEES_TABLE)
-    body = "<h2>Welcome, {}</h2>".format(username)
-    # Admin-only: add/remove employees
-    if username == "admin":
-        body += "<h3>Manage Employees (Admin)</h3>"
-        body += "<form method='post' action='/employee/add_employee'>Username:<br><input name='new_username' required><br>Password:<br><input name='new_password' type='password' required><br>Name:<br><input name='new_name'><br><button type='submit'>Add Employee</button></form>"
-        body += "<form method='post' action='/employee/remove_employee' style='margin-top:10px'>Username to remove:<br><input name='rm_username' required><br><button type='submit'>Remove Employee</button></form>"
-        body += "<h4>Existing employees:</h4>"
-        # render employees as table with update buttons
-        rows = [f"<tr><td>{r.username}</td><td>{r.name}</td><td><form method='get' action='/employee/edit_employee' style='display:inline'><input type='hidden' name='username' value='{r.username}'><button type='submit'>Edit</button></form></td></tr>" for _, r in employees.iterrows()]
-        body += "<table border='1' cellpadding='5'><tr><th>Username</th><th>Name</th><th>Action</th></tr>" + ''.join(rows) + "</table>"
-        # Admin can add orders directly
-        body += "<h3>Manage Orders (Admin)</h3>"
-        body += "<form method='post' action='/employee/add_order'>Session ID (customer token):<br><input name='session_id' required><br>Car ID:<br><input name='car_id' required><br>Price:<br><input name='price' type='number' required><br><button type='submit'>Add Order</button></form>"
-        # CSV management
-        body += "<h3>Data Management (Admin)</h3>"
-        body += "<form method='get' action='/employee/download_csv'>Select Table to download (as CSV):<br><select name='csv_name'><option value='cars.csv'>cars.csv</option><option value='sales.csv'>sales.csv</option><option value='employees.csv'>employees.csv</option><option value='customers.csv'>customers.csv</option><option value='services.csv'>services.csv</option><option value='contacts.csv'>contacts.csv</option><option value='sell_requests.csv'>sell_requests.csv</option><option value='carts.csv'>carts.csv</option></select><br><button type='submit'>Download</button></form>"
-        body += "<form method='post' action='/employee/upload_csv' enctype='multipart/form-data' style='margin-top:10px'>Replace Table (upload CSV):<br><select name='csv_name'><option value='cars.csv'>cars.csv</option><option value='sales.csv'>sales.csv</option><option value='employees.csv'>employees.csv</option><option value='customers.csv'>customers.csv</option><option value='services.csv'>services.csv</option><option value='contacts.csv'>contacts.csv</option><option value='sell_requests.csv'>sell_requests.csv</option><option value='carts.csv'>carts.csv</option></select><br><input type='file' name='file'><br><button type='submit'>Upload & Replace</button></form>"
-        # Inline CSV editor link
-        body += "<h4>Edit Data Inline:</h4><p><a href='/employee/edit_csv'>Open Data editor</a></p>"
-
-    # Create tabs for Sell Requests, Services, Sales, Contacts and Cars table with edit buttons
-    body += """
+    if tab not in DASHBOARD_TABS:
+        tab = "sell_requests"
+    head, tail = layout_parts("Employee Dashboard")
+
+    def page():
+        yield head
+        yield "<h2>Welcome, {}</h2>".format(html.escape(username))
+        # Admin-only: add/remove employees
+        if username == "admin":
+            yield from admin_sections()
+        buttons = "".join(f"""
+      <button class='tablinks' onclick="showTab('{name}')">{spec['label']}</button>""" for name, spec in DASHBOARD_TABS.items())
+        yield f"""
     <style>
-      .tab { display:none }
-      .tablinks { margin-right:10px }
-      .tabactive { font-weight:bold }
+      .tab {{ display:none }}
+      .tablinks {{ margin-right:10px }}
+      .tabactive {{ font-weight:bold }}
     </style>
-    <div>
-      <button class='tablinks' onclick="showTab('sell')">Sell Requests</button>
-      <button class='tablinks' onclick="showTab('services')">Services</button>
-      <button class='tablinks' onclick="showTab('sales')">Sales / Orders</button>
-      <button class='tablinks' onclick="showTab('contacts')">Contacts</button>
-      <button class='tablinks' onclick="showTab('cars')">Cars</button>
+    <div>{buttons}
     </div>
     <script>
-      function showTab(name){
+      function showTab(name){{
         document.querySelectorAll('.tab').forEach(t=>t.style.display='none');
         document.getElementById(name).style.display='block';
-      }
-      // open first tab by default
-      window.addEventListener('load', function(){ showTab('sell'); });
+      }}
     </script>
     """
-    # Sell requests tab
-    body += "<div id='sell' class='tab'>"
-    body += "<h3>Sell Requests</h3>"
-    if reqs.empty:
-        body += "<p>No sell requests.</p>"
-    else:
-        rows = []
-        for _, r in reqs.iterrows():
-            rows.append(f"<tr><td>{r.request_id}</td><td>{r.owner_name}</td><td>{r.make}</td><td>{r.model}</td><td>{r.year}</td><td>₹{r.asking_price}</td><td>{r.status}</td><td><form method='get' action='/employee/edit_sell_request' style='display:inline'><input type='hidden' name='request_id' value='{r.request_id}'><button type='submit'>Edit</button></form> <form method='post' action='/employee/approve_sell' style='display:inline'><input type='hidden' name='request_id' value='{r.request_id}'><button type='submit'>Approve</button></form></td></tr>")
-        body += "<table border='1' cellpadding='5'><tr><th>ID</th><th>Owner</th><th>Make</th><th>Model</th><th>Year</th><th>Asking</th><th>Status</th><th>Action</th></tr>" + ''.join(rows) + "</table>"
-    body += "</div>"
-    # Services tab
-    body += "<div id='services' class='tab'>"
-    body += "<h3>Services</h3>"
-    if services.empty:
-        body += "<p>No services.</p>"
-    else:
-        rows = [f"<tr><td>{r.service_id}</td><td>{r.owner_name}</td><td>{r.phone}</td><td>{r.car_id or 'N/A'}</td><td>{r.service_date or 'N/A'}</td><td>{r.status}</td><td><form method='get' action='/employee/edit_service' style='display:inline'><input type='hidden' name='service_id' value='{r.service_id}'><button type='submit'>Edit</button></form></td></tr>" for _, r in services.iterrows()]
-        body += "<table border='1' cellpadding='5'><tr><th>ID</th><th>Owner</th><th>Phone</th><th>Car ID</th><th>Date</th><th>Status</th><th>Action</th></tr>" + ''.join(rows) + "</table>"
-    body += "</div>"
-    # Sales tab
-    body += "<div id='sales' class='tab'>"
-    body += "<h3>Sales / Orders</h3>"
-    if sales.empty:
-        body += "<p>No orders.</p>"
-    else:
-        rows = [f"<tr><td>{r.order_id}</td><td>{r.session_id}</td><td>{r.car_id}</td><td>₹{r.price}</td><td>{r.timestamp}</td><td><form method='get' action='/employee/edit_sale' style='display:inline'><input type='hidden' name='order_id' value='{r.order_id}'><button type='submit'>Edit</button></form> <form method='post' action='/employee/delete_order' style='display:inline'><input type='hidden' name='order_id' value='{r.order_id}'><button type='submit'>Delete</button></form></td></tr>" for _, r in sales.iterrows()]
-        body += "<table border='1' cellpadding='5'><tr><th>Order ID</th><th>Session</th><th>Car ID</th><th>Price</th><th>Timestamp</th><th>Action</th></tr>" + ''.join(rows) + "</table>"
-    body += "</div>"
-    # Contacts tab
-    body += "<div id='contacts' class='tab'>"
-    body += "<h3>Contacts</h3>"
-    if contacts.empty:
-        body += "<p>No contacts.</p>"
-    else:
-        rows = [f"<tr><td>{r.contact_id}</td><td>{r.name}</td><td>{r.email}</td><td>{r.message}</td><td><form method='get' action='/employee/edit_contact' style='display:inline'><input type='hidden' name='contact_id' value='{r.contact_id}'><button type='submit'>Edit</button></form></td></tr>" for _, r in contacts.iterrows()]
-        body += "<table border='1' cellpadding='5'><tr><th>ID</th><th>Name</th><th>Email</th><th>Message</th><th>Action</th></tr>" + ''.join(rows) + "</table>"
-    body += "</div>"
-    # Cars tab
-    body += "<div id='cars' class='tab'>"
-    body += "<h3>Cars in inventory</h3>"
-    if cars.empty:
-        body += "<p>No cars.</p>"
-    else:
-        rows = [f"<tr><td>{r.id}</td><td>{r.make}</td><td>{r.model}</td><td>{r.year}</td><td>₹{int(r.price)}</td><td>{r.mileage}</td><td>{r.status}</td><td><form method='get' action='/employee/edit_car' style='display:inline'><input type='hidden' name='car_id' value='{r.id}'><button type='submit'>Edit</button></form> <form method='post' action='/employee/delete_car' style='display:inline'><input type='hidden' name='car_id' value='{r.id}'><button type='submit'>Delete</button></form></td></tr>" for _, r in cars.iterrows()]
-        body += "<table border='1' cellpadding='5'><tr><th>ID</th><th>Make</th><th>Model</th><th>Year</th><th>Price</th><th>Mileage</th><th>Status</th><th>Action</th></tr>" + ''.join(rows) + "</table>"
-    body += "</div>"
-
-    return HTMLResponse(layout("Employee Dashboard", body))
+        for name, spec in DASHBOARD_TABS.items():
+            # the open tab is visible from its first byte rather than once the page has loaded
+            shown = " style='display:block'" if name == tab else ""
+            yield f"<div id='{name}' class='tab'{shown}><h3>{spec['heading']}</h3>"
+            yield from dashboard_tab(name, spec, cursor if name == tab else None)
+            yield "</div>"
+        yield tail
+    return StreamingResponse(page(), media_type="text/html")
+
+
+def admin_sections():
+    """The admin's part of the dashboard, as chunks."""
+    body = "<h3>Manage Employees (Admin)</h3>"
+    body += "<form method='post' action='/employee/add_employee'>Username:<br><input name='new_username' required><br>Password:<br><input name='new_password' type='password' required><br>Name:<br><input name='new_name'><br><button type='submit'>Add Employee</button></form>"
+    body += "<form method='post' action='/employee/remove_employee' style='margin-top:10px'>Username to remove:<br><input name='rm_username' required><br><button type='submit'>Remove Employee</button></form>"
+    body += "<h4>Existing employees:</h4>"
+    yield body
+    # render employees as table with update buttons, straight from the cursor
+    columns, chunks = db.stream_query(f"SELECT username, name FROM {EMPLOYEES_TABLE} ORDER BY username")
+    yield from templates.table(["Username", "Name", "Action"], (dict(zip(columns, r)) for rows in chunks for r in rows), EMPLOYEE_ROW, empty="")
+    # Admin can add orders directly
+    body = "<h3>Manage Orders (Admin)</h3>"
+    body += "<form method='post' action='/employee/add_order'>Session ID (customer token):<br><input name='session_id' required><br>Car ID:<br><input name='car_id' required><br>Price:<br><input name='price' type='number' required><br><button type='submit'>Add Order</button></form>"
+    # CSV management
+    body += "<h3>Data Management (Admin)</h3>"
+    body += "<form method='get' action='/employee/download_csv'>Select Table to download (as CSV):<br><select name='csv_name'><option value='cars.csv'>cars.csv</option><option value='sales.csv'>sales.csv</option><option value='employees.csv'>employees.csv</option><option value='customers.csv'>customers.csv</option><option value='services.csv'>services.csv</option><option value='contacts.csv'>contacts.csv</option><option value='sell_requests.csv'>sell_requests.csv</option><option value='cart_items.csv'>cart_items.csv</option></select><br><button type='submit'>Download</button></form>"
+    body += "<form method='post' action='/employee/upload_csv' enctype='multipart/form-data' style='margin-top:10px'>Replace Table (upload CSV):<br><select name='csv_name'><option value='cars.csv'>cars.csv</option><option value='sales.csv'>sales.csv</option><option value='employees.csv'>employees.csv</option><option value='customers.csv'>customers.csv</option><option value='services.csv'>services.csv</option><option value='contacts.csv'>contacts.csv</option><option value='sell_requests.csv'>sell_requests.csv</option><option value='cart_items.csv'>cart_items.csv</option></select><br><input type='file' name='file'><br><button type='submit'>Upload & Replace</button></form>"
+    # Inline CSV editor link
+    body += "<h4>Edit Data Inline:</h4><p><a href='/employee/edit_csv'>Open Data editor</a></p>"
+    yield body
+
+
+def dashboard_tab(name, spec, cursor):
+    """One page of a dashboard tab (see DASHBOARD_TABS), as chunks."""
+    try:
+        section = dashboard_section(name, DASHBOARD_PAGE_SIZE, cursor)
+    except ValueError:
+        yield f"<p>That page link is no longer valid. <a href='/employee/dashboard?tab={name}'>Back to the first page</a></p>"
+        return
+    yield from templates.table(spec["headers"], section["items"], spec["row"], spec["empty"])
+    yield templates.pager("/employee/dashboard", {"tab": name}, cursor, section["next_cursor"])
 
 
 @app.post("/employee/add_employee")
@@ -559,12 +748,10 @@ def add_employee(request: Request, new_username: str = Form(...), new_password:
         return RedirectResponse(url="/employee/login")
     if username != "admin":
         return HTMLResponse(layout("Forbidden", "<p>Only admin can add employees.</p>"))
-    employees = read_table(EMPLOYEES_TABLE)
-    if new_username in employees["username"].astype(str).tolist():
+    if db.count_rows(EMPLOYEES_TABLE, {"username": new_username}):
         return HTMLResponse(layout("Error", "<p>Username already exists.</p>"))
     new = {"username": new_username, "password_hash": hash_pw(new_password), "name": new_name or ""}
-    employees = pd.concat([employees, pd.DataFrame([new])], ignore_index=True)
-    write_table(EMPLOYEES_TABLE, employees)
+    db.insert_row(EMPLOYEES_TABLE, new)
     return RedirectResponse(url="/employee/dashboard", status_code=303)
 
 
@@ -576,9 +763,7 @@ def remove_employee(request: Request, rm_username: str = Form(...)):
         return RedirectResponse(url="/employee/login")
     if username != "admin":
         return HTMLResponse(layout("Forbidden", "<p>Only admin can remove employees.</p>"))
-    employees = read_table(EMPLOYEES_TABLE)
-    employees = employees[employees["username"] != rm_username]
-    write_table(EMPLOYEES_TABLE, employees)
+    db.delete_rows(EMPLOYEES_TABLE, {"username": rm_username})
     return RedirectResponse(url="/employee/dashboard", status_code=303)
 
 
@@ -588,9 +773,7 @@ def delete_order(request: Request, order_id: str = Form(...)):
         _ = employee_required(request)
     except HTTPException:
         return RedirectResponse(url="/employee/login")
-    sales = read_table(SALES_TABLE)
-    sales = sales[sales["order_id"] != order_id]
-    write_table(SALES_TABLE, sales)
+    db.delete_rows(SALES_TABLE, {"order_id": order_id})
     return RedirectResponse(url="/employee/dashboard", status_code=303)
 
 
@@ -600,9 +783,7 @@ def delete_car(request: Request, car_id: str = Form(...)):
         _ = employee_required(request)
     except HTTPException:
         return RedirectResponse(url="/employee/login")
-    cars = read_table(CARS_TABLE)
-    cars = cars[cars["id"] != car_id]
-    write_table(CARS_TABLE, cars)
+    db.delete_rows(CARS_TABLE, {"id": car_id})
     return RedirectResponse(url="/employee/dashboard", status_code=303)
 
 
@@ -614,45 +795,36 @@ def add_order(request: Request, session_id: str = Form(...), car_id: str = Form(
         return RedirectResponse(url="/employee/login")
     # only admin or employees allowed (admin included)
     # check car exists
-    cars = read_table(CARS_TABLE)
-    if car_id not in cars["id"].astype(str).tolist():
+    if not db.count_rows(CARS_TABLE, {"id": car_id}):
         return HTMLResponse(layout("Error", "<p>Car id not found.</p>"))
-    sales = read_table(SALES_TABLE)
-    order = {"order_id": str(uuid.uuid4()), "session_id": session_id, "car_id": car_id, "price": int(price), "timestamp": datetime.utcnow().isoformat()}
-    sales = pd.concat([sales, pd.DataFrame([order])], ignore_index=True)
+    # link the order to the customer if the session is theirs
+    session = db.get_row(CUSTOMER_SESSIONS_TABLE, {"token": session_id})
+    order = {"order_id": str(uuid.uuid4()), "session_id": session_id, "car_id": car_id, "price": int(price), "timestamp": datetime.utcnow().isoformat(),
+             "phone": session["phone"] if session else None}
+    db.insert_row(SALES_TABLE, order)
     # optionally mark car sold
-    cars.loc[cars["id"] == car_id, "status"] = "sold"
-    write_table(SALES_TABLE, sales)
-    write_table(CARS_TABLE, cars)
+    db.update_rows(CARS_TABLE, {"id": car_id}, {"status": "sold"})
     return RedirectResponse(url="/employee/dashboard", status_code=303)
 
 
 @app.get("/employee/download_csv")
-def download_csv(request: Request, csv_name: str):
+def download_csv(request: Request, csv_name: str, gzip: bool = False):
     try:
         username = employee_required(request)
     except HTTPException:
         return RedirectResponse(url="/employee/login")
     if username != "admin":
         return HTMLResponse(layout("Forbidden", "<p>Only admin can download CSVs.</p>"))
-    # map name to path
-    allowed = {
-        "cars.csv": CARS_TABLE,
-        "sales.csv": SALES_TABLE,
-        "employees.csv": EMPLOYEES_TABLE,
-        "customers.csv": CUSTOMERS_TABLE,
-        "services.csv": SERVICES_TABLE,
-        "contacts.csv": CONTACTS_TABLE,
-        "sell_requests.csv": SELL_REQUESTS_TABLE,
-        "carts.csv": CARTS_TABLE,
-    }
-    if csv_name not in allowed:
+    if csv_name not in CSV_TABLES:
         return HTMLResponse(layout("Error", "<p>Invalid csv name.</p>"))
-    table_name = allowed[csv_name]
-    df = read_table(table_name)
-    stream = io.StringIO()
-    df.to_csv(stream, index=False)
-    response = Response(content=stream.getvalue(), media_type="text/csv")
+    # stream rows from the cursor in chunks instead of building the whole file in memory
+    columns, chunks = db.stream_table(CSV_TABLES[csv_name])
+    body = csv_chunks(columns, chunks)
+    if gzip:
+        response = StreamingResponse(gzip_chunks(body), media_type="application/gzip")
+        csv_name += ".gz"
+    else:
+        response = StreamingResponse(body, media_type="text/csv")
     response.headers["Content-Disposition"] = f"attachment; filename={csv_name}"
     return response
 
@@ -665,27 +837,14 @@ def upload_csv(request: Request, csv_name: str = Form(...), file: UploadFile = F
         return RedirectResponse(url="/employee/login")
     if username != "admin":
         return HTMLResponse(layout("Forbidden", "<p>Only admin can upload CSVs.</p>"))
-    allowed = {
-        "cars.csv": CARS_TABLE,
-        "sales.csv": SALES_TABLE,
-        "employees.csv": EMPLOYEES_TABLE,
-        "customers.csv": CUSTOMERS_TABLE,
-        "services.csv": SERVICES_TABLE,
-        "contacts.csv": CONTACTS_TABLE,
-        "sell_requests.csv": SELL_REQUESTS_TABLE,
-        "carts.csv": CARTS_TABLE,
-    }
-    if csv_name not in allowed:
+    if csv_name not in CSV_TABLES:
         return HTMLResponse(layout("Error", "<p>Invalid csv name.</p>"))
-    table_name = allowed[csv_name]
-    # read uploaded bytes and write to table (replace)
-    content = file.file.read()
+    # parse the upload in batches straight from the spooled file and swap it in (replace)
     try:
-        df = pd.read_csv(io.BytesIO(content))
-        write_table(table_name, df)
+        report = db.import_csv(CSV_TABLES[csv_name], io.TextIOWrapper(file.file, encoding="utf-8-sig", newline=""))
     except Exception as e:
-        return HTMLResponse(layout("Error", f"<p>Failed to write file: {e}</p>"))
-    return RedirectResponse(url="/employee/dashboard", status_code=303)
+        return HTMLResponse(layout("Error", f"<p>Failed to write file: {html.escape(str(e))}</p>"))
+    return HTMLResponse(layout("Import Finished", import_report_html(csv_name, report)))
 
 
 @app.post("/employee/approve_sell")
@@ -694,19 +853,15 @@ def approve_sell(request: Request, request_id: str = Form(...)):
         _ = employee_required(request)
     except HTTPException:
         return RedirectResponse(url="/employee/login")
-    reqs = read_table(SELL_REQUESTS_TABLE)
-    sel = reqs[reqs["request_id"] == request_id]
+    sel = db.find_rows(SELL_REQUESTS_TABLE, {"request_id": request_id})
     if sel.empty:
         return HTMLResponse(layout("Error", "<p>Sell request not found.</p>"))
     row = sel.iloc[0]
     # add to cars
-    cars = read_table(CARS_TABLE)
     new_car = {"id": f"car-{str(uuid.uuid4())[:8]}", "make": row.make, "model": row.model, "year": row.year, "price": row.asking_price, "mileage": 0, "status": "available"}
-    cars = pd.concat([cars, pd.DataFrame([new_car])], ignore_index=True)
-    write_table(CARS_TABLE, cars)
+    db.insert_row(CARS_TABLE, new_car)
     # mark request approved
-    reqs.loc[reqs["request_id"] == request_id, "status"] = "approved"
-    write_table(SELL_REQUESTS_TABLE, reqs)
+    db.update_rows(SELL_REQUESTS_TABLE, {"request_id": request_id}, {"status": "approved"})
     return RedirectResponse(url="/employee/dashboard", status_code=303)
 
 
@@ -726,12 +881,10 @@ def customer_register_form():
 
 @app.post("/customer/register")
 def customer_register(response: Response, name: str = Form(...), phone: str = Form(...), password: str = Form(...)):
-    customers = read_table(CUSTOMERS_TABLE)
-    if phone in customers["phone"].astype(str).tolist():
+    if db.count_rows(CUSTOMERS_TABLE, {"phone": phone}):
         return HTMLResponse(layout("Error", "<p>Phone already registered. Please login.</p>"))
     new = {"phone": phone, "password_hash": hash_pw(password), "name": name, "created_at": datetime.utcnow().isoformat()}
-    customers = pd.concat([customers, pd.DataFrame([new])], ignore_index=True)
-    write_table(CUSTOMERS_TABLE, customers)
+    db.insert_row(CUSTOMERS_TABLE, new)
     # create session and redirect
     resp = RedirectResponse(url="/", status_code=303)
     create_customer_session(resp, phone)
@@ -753,8 +906,7 @@ def customer_login_form():
 
 @app.post("/customer/login")
 def customer_login(response: Response, phone: str = Form(...), password: str = Form(...)):
-    customers = read_table(CUSTOMERS_TABLE)
-    found = customers[customers["phone"] == phone]
+    found = db.find_rows(CUSTOMERS_TABLE, {"phone": phone})
     if found.empty:
         return HTMLResponse(layout("Login Failed", "<p>Invalid credentials.</p>"))
     expected = found.iloc[0]["password_hash"]
@@ -768,11 +920,7 @@ def customer_login(response: Response, phone: str = Form(...), password: str = F
 @app.get("/customer/logout")
 def customer_logout(request: Request):
     token = request.cookies.get(CUSTOMER_SESSION_COOKIE)
-    if token:
-        d = load_customer_sessions()
-        if token in d:
-            del d[token]
-            save_customer_sessions(d)
+    sessions.delete_session(CUSTOMER_SESSIONS_TABLE, token)
     resp = RedirectResponse(url="/", status_code=303)
     resp.delete_cookie(CUSTOMER_SESSION_COOKIE)
     return resp
@@ -787,41 +935,31 @@ def edit_csv_get(request: Request, csv_name: Optional[str] = None):
         return RedirectResponse(url="/employee/login")
     if username != "admin":
         return HTMLResponse(layout("Forbidden", "<p>Only admin can edit CSVs inline.</p>"))
-    allowed = {
-        "cars.csv": CARS_TABLE,
-        "sales.csv": SALES_TABLE,
-        "employees.csv": EMPLOYEES_TABLE,
-        "customers.csv": CUSTOMERS_TABLE,
-        "services.csv": SERVICES_TABLE,
-        "contacts.csv": CONTACTS_TABLE,
-        "sell_requests.csv": SELL_REQUESTS_TABLE,
-        "carts.csv": CARTS_TABLE,
-    }
     # selector
-    options = "".join([f"<option value='{n}' {'selected' if n==csv_name else ''}>{n}</option>" for n in allowed.keys()])
+    options = "".join([f"<option value='{n}' {'selected' if n==csv_name else ''}>{n}</option>" for n in CSV_TABLES.keys()])
     if csv_name is None:
         csv_name = 'cars.csv'
-    if csv_name not in allowed:
+    if csv_name not in CSV_TABLES:
         return HTMLResponse(layout("Error", "<p>Invalid csv name.</p>"))
-    table_name = allowed[csv_name]
-    content = ''
-    try:
-        df = read_table(table_name)
-        stream = io.StringIO()
-        df.to_csv(stream, index=False)
-        content = stream.getvalue()
-    except Exception:
-        content = ''
-    body = f"""
+    columns, chunks = db.stream_table(CSV_TABLES[csv_name])
+    head, tail = layout_parts("Edit CSV")
+
+    def page():
+        yield head
+        yield f"""
     <form method='get' action='/employee/edit_csv'>Select Table (CSV view): <select name='csv_name'>{options}</select> <button type='submit'>Open</button></form>
     <hr>
     <form method='post' action='/employee/edit_csv'>
       <input type='hidden' name='csv_name' value='{csv_name}'>
-      <textarea name='csv_content' rows='30' cols='120'>{content}</textarea><br>
+      <textarea name='csv_text' rows='30' cols='120'>"""
+        for chunk in csv_chunks(columns, chunks):
+            yield html.escape(chunk, quote=False)
+        yield """</textarea><br>
       <button type='submit'>Save Changes</button>
     </form>
     """
-    return HTMLResponse(layout("Edit CSV", body))
+        yield tail
+    return StreamingResponse(page(), media_type="text/html")
 
 # --- JSON API Endpoints ---
 
@@ -846,28 +984,102 @@ class ContactRequestModel(BaseModel):
     email: str
     message: str
 
+CARS_PAGE_SIZE = 24
+CARS_MAX_PAGE_SIZE = 100
+CAR_SORTS = ("price", "year", "mileage")
+
 @app.get("/api/cars")
-def api_list_cars(type: str = None):
-    cars = read_table(CARS_TABLE)
-    if cars.empty:
-        return []
-    
-    # Filter by type if provided and not 'all'
-    if type and type.lower() != 'all':
-        # Ensure 'type' column exists before filtering
-        if 'type' in cars.columns:
-            cars = cars[cars['type'].str.lower() == type.lower()]
-        else:
-            # If type column missing, maybe return empty or all? 
-            # For now, let's assume we return all if column missing to avoid breaking
-            pass
+def api_list_cars(request: Request, type: str = None, make: str = None, model: str = None, fuel: str = None, transmission: str = None,
+                  status: str = None, min_price: int = None, max_price: int = None, min_year: int = None, max_year: int = None,
+                  min_mileage: int = None, max_mileage: int = None, sort: str = None, limit: int = CARS_PAGE_SIZE, cursor: str = None):
+    """
+    One page of the catalog. Text filters match case-insensitively, ranges are
+    inclusive, and sort is one of price, year or mileage, prefixed with '-' for
+    descending. The cursor for the next page comes back in the X-Next-Cursor
+    header, which is absent on the last page. Cars held in someone's cart are
+    left out. Each car's "images" holds its resized copies (see derivatives.py).
+    """
+    held_tag, held = holds.held_cars()
+    etag = table_etag(request, CATALOG_TABLES, held_tag)
+    cached_response = not_modified(request, etag)
+    if cached_response:
+        return cached_response
+    # 'all' is what the frontend sends for no type filter
+    where = {"type": type if type and type.lower() != 'all' else None, "make": make, "model": model,
+             "fuel": fuel, "transmission": transmission, "status": status}
+    where = {col: value for col, value in where.items() if value}
+    ranges = {"price": (min_price, max_price), "year": (min_year, max_year), "mileage": (min_mileage, max_mileage)}
+    ranges = {col: bounds for col, bounds in ranges.items() if bounds != (None, None)}
+    descending = bool(sort) and sort.startswith("-")
+    order_by = sort.lstrip("-") if sort else None
+    if order_by is not None and order_by not in CAR_SORTS:
+        return JSONResponse(status_code=400, content={"message": f"sort must be one of {', '.join(CAR_SORTS)}, optionally prefixed with '-'"})
+    limit = max(1, min(limit, CARS_MAX_PAGE_SIZE))
+
+    def fetch():
+        rows, next_cursor = db.fetch_page(CARS_TABLE, where=where, nocase=("type", "make", "model", "fuel", "transmission"),
+                                          ranges=ranges, order_by=order_by, descending=descending, limit=limit, cursor=cursor,
+                                          exclude={"id": held})
+        return derivatives.with_images(rows), next_cursor
+
+    # pages are cached as JSON bytes per query until the cars or their images, or the set of held cars, change
+    query = (tuple(sorted(where.items())), tuple(sorted(ranges.items())), sort, limit, cursor, held_tag)
+    try:
+        body, next_cursor = response_cache.cached_json(CATALOG_TABLES, ("page", query), fetch)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return tagged(Response(content=body, media_type="application/json", headers=headers), etag)
+
+@app.get("/api/cars/facets")
+def api_car_facets(request: Request, make: str = None, fuel: str = None, type: str = None, transmission: str = None,
+                   min_price: int = None, max_price: int = None, min_year: int = None, max_year: int = None,
+                   min_mileage: int = None, max_mileage: int = None, limit: int = 500):
+    """
+    Ids of the available cars matching the filters, with facet counts for make,
+    fuel, type and transmission and histograms for price, year and mileage.
+    Categorical filters take several values separated by commas (fuel=Diesel,CNG).
+    Cars held in someone's cart are left out.
+    """
+    held_tag, held = holds.held_cars()
+    etag = table_etag(request, CARS_TABLE, held_tag)
+    cached_response = not_modified(request, etag)
+    if cached_response:
+        return cached_response
+    categories = {"make": make, "fuel": fuel, "type": type, "transmission": transmission}
+    categories = {col: [v for v in value.split(",") if v.strip()] for col, value in categories.items() if value}
+    ranges = {"price": (min_price, max_price), "year": (min_year, max_year), "mileage": (min_mileage, max_mileage)}
+    return tagged(inventory.query(categories, ranges, limit=max(0, min(limit, 5000)), exclude=held), etag)
+
+@app.get("/api/cars/search")
+def api_search_cars(request: Request, q: str = "", status: str = None, limit: int = CARS_PAGE_SIZE, cursor: str = None):
+    """
+    Free-text search over make, model, type, fuel, transmission and description,
+    best match first. Every word has to match, and matches as a prefix, so
+    "whi cret" finds a white Creta. Pages like /api/cars, via X-Next-Cursor, and
+    likewise leaves out held cars.
+    """
+    held_tag, held = holds.held_cars()
+    etag = table_etag(request, CATALOG_TABLES, held_tag)
+    cached_response = not_modified(request, etag)
+    if cached_response:
+        return cached_response
+    limit = max(1, min(limit, CARS_MAX_PAGE_SIZE))
+    where = {"status": status} if status else {}
+
+    def search():
+        rows, next_cursor = db.search_page(CARS_TABLE, q, where=where, limit=limit, cursor=cursor, exclude={"id": held})
+        return derivatives.with_images(rows), next_cursor
 
-    # Convert to list of dicts
-    return cars.to_dict(orient="records")
+    try:
+        body, next_cursor = response_cache.cached_json(CATALOG_TABLES, ("search", db.match_expression(q), status, limit, cursor, held_tag), search)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return tagged(Response(content=body, media_type="application/json", headers=headers), etag)
 
 @app.post("/api/sell")
 def api_sell_car(req: SellRequestModel):
-    reqs = read_table(SELL_REQUESTS_TABLE)
     new_req = {
         "request_id": str(uuid.uuid4()),
         "owner_name": req.owner_name,
@@ -880,8 +1092,7 @@ def api_sell_car(req: SellRequestModel):
         "status": "pending",
         "timestamp": datetime.utcnow().isoformat()
     }
-    reqs = pd.concat([reqs, pd.DataFrame([new_req])], ignore_index=True)
-    write_table(SELL_REQUESTS_TABLE, reqs)
+    db.insert_row(SELL_REQUESTS_TABLE, new_req)
     return {"message": "Sell request submitted successfully", "request_id": new_req["request_id"]}
 
 class CustomerRegisterModel(BaseModel):
@@ -898,8 +1109,7 @@ class CartAddModel(BaseModel):
 
 @app.post("/api/register")
 def api_register(response: Response, req: CustomerRegisterModel):
-    customers = read_table(CUSTOMERS_TABLE)
-    if req.phone in customers["phone"].astype(str).tolist():
+    if db.count_rows(CUSTOMERS_TABLE, {"phone": req.phone}):
         return JSONResponse(status_code=400, content={"message": "Phone number already registered"})
     
     new_cust = {
@@ -908,8 +1118,7 @@ def api_register(response: Response, req: CustomerRegisterModel):
         "name": req.name,
         "created_at": datetime.utcnow().isoformat()
     }
-    customers = pd.concat([customers, pd.DataFrame([new_cust])], ignore_index=True)
-    write_table(CUSTOMERS_TABLE, customers)
+    db.insert_row(CUSTOMERS_TABLE, new_cust)
     
     # Auto-login
     create_customer_session(response, req.phone)
@@ -917,8 +1126,7 @@ def api_register(response: Response, req: CustomerRegisterModel):
 
 @app.post("/api/login")
 def api_login(response: Response, req: CustomerLoginModel):
-    customers = read_table(CUSTOMERS_TABLE)
-    found = customers[customers["phone"] == req.phone]
+    found = db.find_rows(CUSTOMERS_TABLE, {"phone": req.phone})
     if found.empty:
         return JSONResponse(status_code=401, content={"message": "Invalid credentials"})
     
@@ -930,10 +1138,51 @@ def api_login(response: Response, req: CustomerLoginModel):
     return {"message": "Login successful", "user": {"name": found.iloc[0]["name"], "phone": req.phone}}
 
 @app.post("/api/logout")
-def api_logout(response: Response):
+def api_logout(request: Request, response: Response):
+    sessions.delete_session(CUSTOMER_SESSIONS_TABLE, request.cookies.get(CUSTOMER_SESSION_COOKIE))
     response.delete_cookie(CUSTOMER_SESSION_COOKIE)
     return {"message": "Logged out"}
 
+def build_profile(phone):
+    """
+    Everything on a customer's profile page, or None if there is no such
+    customer. Every query is an indexed lookup by phone, so the cost depends on
+    the customer's own rows, not on the size of the tables.
+    """
+    customer = db.get_row(CUSTOMERS_TABLE, {"phone": phone})
+    if customer is None:
+        return None
+    
+    # Orders with their cars' details, in one join; orders of deleted cars are left out
+    orders = [{
+        "order_id": order_id,
+        "car_id": car_id,
+        "car_name": f"{make or ''} {model or ''}".strip(),
+        "year": year or 0,
+        "price": price or 0,
+        "timestamp": timestamp
+    } for order_id, car_id, make, model, year, price, timestamp in db.get_connection().execute(
+        f"SELECT {SALES_TABLE}.order_id, {SALES_TABLE}.car_id, {CARS_TABLE}.make, {CARS_TABLE}.model, {CARS_TABLE}.year, "
+        f"{SALES_TABLE}.price, {SALES_TABLE}.timestamp FROM {SALES_TABLE} JOIN {CARS_TABLE} ON {CARS_TABLE}.id = {SALES_TABLE}.car_id "
+        f"WHERE {SALES_TABLE}.phone = ?", (phone,))]
+    
+    sell_requests = db.fetch_rows(SELL_REQUESTS_TABLE, ["request_id", "make", "model", "year", "asking_price", "status", "timestamp"], {"phone": phone})
+    for req in sell_requests:
+        req["year"] = req["year"] or 0
+        req["asking_price"] = req["asking_price"] or 0
+    
+    services = db.fetch_rows(SERVICES_TABLE, ["service_id", "car_id", "service_date", "notes", "status", "timestamp"], {"phone": phone})
+    for svc in services:
+        for col in ("car_id", "service_date", "notes"):
+            svc[col] = svc[col] or ""
+    
+    return {
+        "user": {"name": customer["name"], "phone": phone, "created_at": customer.get("created_at") or ""},
+        "orders": orders,
+        "sell_requests": sell_requests,
+        "services": services
+    }
+
 @app.get("/api/profile")
 def api_get_profile(request: Request):
     """Get customer profile with orders, sell requests, and services"""
@@ -942,114 +1191,34 @@ def api_get_profile(request: Request):
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
     
+    # kept until one of this customer's own rows changes
     phone = cust["phone"]
-    session_id = cust["token"]
-    
-    # Get customer info
-    customers = read_table(CUSTOMERS_TABLE)
-    customer_data = customers[customers["phone"] == phone]
-    if customer_data.empty:
+    profile = db.cached_for_owner(phone, "profile", lambda: build_profile(phone))
+    if profile is None:
         return JSONResponse(status_code=404, content={"message": "Customer not found"})
-    
-    customer_info = {
-        "name": customer_data.iloc[0]["name"],
-        "phone": phone,
-        "created_at": customer_data.iloc[0].get("created_at", "")
-    }
-    
-    # Get orders (sales linked by session_id)
-    sales = read_table(SALES_TABLE)
-    customer_sales = sales[sales["session_id"] == session_id]
-    orders = []
-    if not customer_sales.empty:
-        cars = read_table(CARS_TABLE)
-        for _, sale in customer_sales.iterrows():
-            car_data = cars[cars["id"] == sale["car_id"]]
-            if not car_data.empty:
-                car = car_data.iloc[0]
-                orders.append({
-                    "order_id": sale["order_id"],
-                    "car_id": sale["car_id"],
-                    "car_name": f"{car.get('make', '')} {car.get('model', '')}".strip(),
-                    "year": int(car.get("year", 0)) if not pd.isna(car.get("year")) else 0,
-                    "price": int(sale["price"]),
-                    "timestamp": sale["timestamp"]
-                })
-    
-    # Get sell requests (linked by phone)
-    sell_requests = read_table(SELL_REQUESTS_TABLE)
-    customer_sell_requests = sell_requests[sell_requests["phone"] == phone]
-    sell_reqs = []
-    if not customer_sell_requests.empty:
-        for _, req in customer_sell_requests.iterrows():
-            sell_reqs.append({
-                "request_id": req["request_id"],
-                "make": req["make"],
-                "model": req["model"],
-                "year": int(req["year"]) if not pd.isna(req.get("year")) else 0,
-                "asking_price": int(req["asking_price"]),
-                "status": req["status"],
-                "timestamp": req["timestamp"]
-            })
-    
-    # Get service bookings (linked by phone)
-    services = read_table(SERVICES_TABLE)
-    customer_services = services[services["phone"] == phone]
-    service_bookings = []
-    if not customer_services.empty:
-        for _, svc in customer_services.iterrows():
-            service_bookings.append({
-                "service_id": svc["service_id"],
-                "car_id": svc.get("car_id", ""),
-                "service_date": svc.get("service_date", ""),
-                "notes": svc.get("notes", ""),
-                "status": svc["status"],
-                "timestamp": svc["timestamp"]
-            })
-    
-    return {
-        "user": customer_info,
-        "orders": orders,
-        "sell_requests": sell_reqs,
-        "services": service_bookings
-    }
+    return profile
 
 @app.get("/api/user")
 def api_get_user(request: Request):
     try:
         cust = customer_required(request)
-        customers = read_table(CUSTOMERS_TABLE)
-        found = customers[customers["phone"] == cust["phone"]]
-        if found.empty:
+        customer = db.get_row(CUSTOMERS_TABLE, {"phone": cust["phone"]})
+        if customer is None:
              raise HTTPException(status_code=401)
-        return {"name": found.iloc[0]["name"], "phone": cust["phone"]}
+        return {"name": customer["name"], "phone": cust["phone"]}
     except:
         return JSONResponse(status_code=401, content={"message": "Not logged in"})
 
 @app.get("/api/cart")
 def api_get_cart(request: Request):
+    """The cars in the cart, in the order they were added, and their total price."""
     try:
         cust = customer_required(request)
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Login required"})
     
-    session_id = cust["token"]
-    carts = read_table(CARTS_TABLE)
-    sel = carts[carts["session_id"] == session_id]
-    
-    if sel.empty:
-        return []
-        
-    items = json.loads(sel.iloc[0]["items_json"]) if sel.iloc[0]["items_json"] else []
-    cars = read_table(CARS_TABLE)
-    
-    cart_items = []
-    for cid in items:
-        car = cars[cars["id"] == cid]
-        if not car.empty:
-            cart_items.append(car.iloc[0].to_dict())
-            
-    return cart_items
+    items, total = cart_contents(cust["token"])
+    return {"items": [car for _, car in items if car is not None], "total": total}
 
 @app.post("/api/cart/add")
 def api_add_to_cart(request: Request, req: CartAddModel):
@@ -1058,21 +1227,13 @@ def api_add_to_cart(request: Request, req: CartAddModel):
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Login required"})
         
-    session_id = cust["token"]
-    carts = read_table(CARTS_TABLE)
-    found = carts[carts["session_id"] == session_id]
-    
-    if not found.empty:
-        items = json.loads(found.iloc[0]["items_json"]) if found.iloc[0]["items_json"] else []
-        if req.car_id not in items:
-            items.append(req.car_id)
-        carts.loc[carts["session_id"] == session_id, "items_json"] = json.dumps(items)
-        carts.loc[carts["session_id"] == session_id, "updated_at"] = datetime.utcnow().isoformat()
-    else:
-        new = {"session_id": session_id, "items_json": json.dumps([req.car_id]), "updated_at": datetime.utcnow().isoformat()}
-        carts = pd.concat([carts, pd.DataFrame([new])], ignore_index=True)
-        
-    write_table(CARTS_TABLE, carts)
+    result = add_cart_item(cust["token"], req.car_id)
+    if result == "not_found":
+        return JSONResponse(status_code=404, content={"message": "Car not found"})
+    if result == "unavailable":
+        return JSONResponse(status_code=409, content={"message": "This car is no longer for sale."})
+    if result == "held":
+        return JSONResponse(status_code=409, content={"message": "This car is reserved in another customer's cart. Try again later."})
     return {"message": "Added to cart"}
 
 @app.post("/api/cart/remove")
@@ -1082,17 +1243,7 @@ def api_remove_from_cart(request: Request, req: CartAddModel):
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Login required"})
         
-    session_id = cust["token"]
-    carts = read_table(CARTS_TABLE)
-    found = carts[carts["session_id"] == session_id]
-    
-    if not found.empty:
-        items = json.loads(found.iloc[0]["items_json"]) if found.iloc[0]["items_json"] else []
-        if req.car_id in items:
-            items.remove(req.car_id)
-        carts.loc[carts["session_id"] == session_id, "items_json"] = json.dumps(items)
-        write_table(CARTS_TABLE, carts)
-        
+    remove_cart_items(cust["token"], req.car_id)
     return {"message": "Removed from cart"}
 
 @app.post("/api/cart/checkout")
@@ -1103,42 +1254,22 @@ def api_checkout(request: Request):
         return JSONResponse(status_code=401, content={"message": "Login required"})
         
     session_id = cust["token"]
-    carts = read_table(CARTS_TABLE)
-    sel = carts[carts["session_id"] == session_id]
+    ok, results = checkout_cart(session_id, cust["phone"])
     
-    if sel.empty:
+    if not results:
         return JSONResponse(status_code=400, content={"message": "Cart is empty"})
-        
-    items = json.loads(sel.iloc[0]["items_json"]) if sel.iloc[0]["items_json"] else []
-    if not items:
-        return JSONResponse(status_code=400, content={"message": "Cart is empty"})
-
-    cars = read_table(CARS_TABLE)
-    sales = read_table(SALES_TABLE)
-    
-    for cid in items:
-        car_row = cars[cars["id"] == cid]
-        if car_row.empty:
-            continue
-        price = int(car_row.iloc[0]["price"])
-        order = {"order_id": str(uuid.uuid4()), "session_id": session_id, "car_id": cid, "price": price, "timestamp": datetime.utcnow().isoformat()}
-        sales = pd.concat([sales, pd.DataFrame([order])], ignore_index=True)
-        # mark car as sold
-        cars.loc[cars["id"] == cid, "status"] = "sold"
-        
-    write_table(SALES_TABLE, sales)
-    write_table(CARS_TABLE, cars)
-    
-    # clear cart
-    carts = carts[carts["session_id"] != session_id]
-    write_table(CARTS_TABLE, carts)
+    if not ok:
+        unavailable = [r["car_id"] for r in results if r["result"] not in ("sold", "available")]
+        return JSONResponse(status_code=409, content={
+            "message": f"Some cars are no longer available: {', '.join(unavailable)}. Nothing was purchased.",
+            "items": results,
+        })
     
-    return {"message": "Checkout successful! Our team will contact you shortly."}
+    return {"message": "Checkout successful! Our team will contact you shortly.", "items": results}
 
 
 @app.post("/api/service")
 def api_book_service(req: ServiceRequestModel):
-    services = read_table(SERVICES_TABLE)
     entry = {
         "service_id": str(uuid.uuid4()),
         "owner_name": req.owner_name,
@@ -1149,13 +1280,11 @@ def api_book_service(req: ServiceRequestModel):
         "status": "scheduled",
         "timestamp": datetime.utcnow().isoformat()
     }
-    services = pd.concat([services, pd.DataFrame([entry])], ignore_index=True)
-    write_table(SERVICES_TABLE, services)
+    db.insert_row(SERVICES_TABLE, entry)
     return {"status": "success", "message": "Service booked"}
 
 @app.post("/api/contact")
 def api_contact(req: ContactRequestModel):
-    contacts = read_table(CONTACTS_TABLE)
     entry = {
         "contact_id": str(uuid.uuid4()),
         "name": req.name,
@@ -1163,8 +1292,7 @@ def api_contact(req: ContactRequestModel):
         "message": req.message,
         "timestamp": datetime.utcnow().isoformat()
     }
-    contacts = pd.concat([contacts, pd.DataFrame([entry])], ignore_index=True)
-    write_table(CONTACTS_TABLE, contacts)
+    db.insert_row(CONTACTS_TABLE, entry)
     return {"status": "success", "message": "Message received"}
 
 # Employee Login JSON API
@@ -1192,8 +1320,7 @@ async def api_employee_login(request: Request, response: Response):
         if not username or not password:
             return JSONResponse(status_code=400, content={"message": "Username and password required"})
         
-        employees = read_table(EMPLOYEES_TABLE)
-        found = employees[employees["username"] == username]
+        found = db.find_rows(EMPLOYEES_TABLE, {"username": username})
         if found.empty:
             print(f"User '{username}' not found")
             return JSONResponse(status_code=401, content={"message": "Invalid credentials"})
@@ -1208,14 +1335,11 @@ async def api_employee_login(request: Request, response: Response):
             return JSONResponse(status_code=401, content={"message": "Invalid credentials"})
         
         # Create session
-        token = str(uuid.uuid4())
-        d = load_emp_sessions()
-        d[token] = {"username": username, "login_at": datetime.utcnow().isoformat()}
-        save_emp_sessions(d)
+        token = create_emp_session(username)
         response.set_cookie(
             key=EMP_SESSION_COOKIE, 
             value=token, 
-            max_age=60 * 60 * 24, 
+            max_age=EMP_SESSION_MAX_AGE, 
             path="/"
         )
         
@@ -1224,14 +1348,6 @@ async def api_employee_login(request: Request, response: Response):
         print(f"Login error: {e}")
         return JSONResponse(status_code=500, content={"message": "Server error"})
 
-# Serve static files for car images
-from fastapi.staticfiles import StaticFiles
-import os
-
-# Create static directory if it doesn't exist
-os.makedirs("static/car_images", exist_ok=True)
-app.mount("/static", StaticFiles(directory="static"), name="static")
-
 
 @app.post("/employee/edit_csv")
 def edit_csv_post(request: Request, csv_name: str = Form(...), csv_text: str = Form(...)):
@@ -1241,25 +1357,13 @@ def edit_csv_post(request: Request, csv_name: str = Form(...), csv_text: str = F
         return RedirectResponse(url="/employee/login")
     if username != "admin":
         return HTMLResponse(layout("Forbidden", "<p>Only admin can edit CSVs inline.</p>"))
-    allowed = {
-        "cars.csv": CARS_TABLE,
-        "sales.csv": SALES_TABLE,
-        "employees.csv": EMPLOYEES_TABLE,
-        "customers.csv": CUSTOMERS_TABLE,
-        "services.csv": SERVICES_TABLE,
-        "contacts.csv": CONTACTS_TABLE,
-        "sell_requests.csv": SELL_REQUESTS_TABLE,
-        "carts.csv": CARTS_TABLE,
-    }
-    if csv_name not in allowed:
+    if csv_name not in CSV_TABLES:
         return HTMLResponse(layout("Error", "<p>Invalid csv name.</p>"))
-    table_name = allowed[csv_name]
     try:
-        df = pd.read_csv(io.StringIO(csv_text))
-        write_table(table_name, df)
+        report = db.import_csv(CSV_TABLES[csv_name], io.StringIO(csv_text, newline=""))
     except Exception as e:
-        return HTMLResponse(layout("Error", f"<p>Failed to save CSV: {e}</p>"))
-    return RedirectResponse(url="/employee/dashboard", status_code=303)
+        return HTMLResponse(layout("Error", f"<p>Failed to save CSV: {html.escape(str(e))}</p>"))
+    return HTMLResponse(layout("Import Finished", import_report_html(csv_name, report)))
 
 
 # NEW: Edit endpoints for cars, sell requests, services, sales, contacts, employees
@@ -1271,8 +1375,7 @@ def edit_car_get(request: Request, car_id: str):
         return RedirectResponse(url="/employee/login")
     if username != "admin":
         return HTMLResponse(layout("Forbidden", "<p>Only admin can edit cars.</p>"))
-    cars = read_table(CARS_TABLE)
-    sel = cars[cars["id"] == car_id]
+    sel = db.find_rows(CARS_TABLE, {"id": car_id})
     if sel.empty:
         return HTMLResponse(layout("Error", "<p>Car not found.</p>"))
     c = sel.iloc[0]
@@ -1299,14 +1402,7 @@ def edit_car_post(request: Request, car_id: str = Form(...), make: str = Form(..
         return RedirectResponse(url="/employee/login")
     if username != "admin":
         return HTMLResponse(layout("Forbidden", "<p>Only admin can edit cars.</p>"))
-    cars = read_table(CARS_TABLE)
-    cars.loc[cars["id"] == car_id, "make"] = make
-    cars.loc[cars["id"] == car_id, "model"] = model
-    cars.loc[cars["id"] == car_id, "year"] = year
-    cars.loc[cars["id"] == car_id, "price"] = price
-    cars.loc[cars["id"] == car_id, "mileage"] = mileage
-    cars.loc[cars["id"] == car_id, "status"] = status
-    write_table(CARS_TABLE, cars)
+    db.update_rows(CARS_TABLE, {"id": car_id}, {"make": make, "model": model, "year": year, "price": price, "mileage": mileage, "status": status})
     return RedirectResponse(url="/employee/dashboard", status_code=303)
 
 
@@ -1318,8 +1414,7 @@ def edit_employee_get(request: Request, username: str):
         return RedirectResponse(url="/employee/login")
     if uname != "admin":
         return HTMLResponse(layout("Forbidden", "<p>Only admin can edit employees.</p>"))
-    employees = read_table(EMPLOYEES_TABLE)
-    sel = employees[employees["username"] == username]
+    sel = db.find_rows(EMPLOYEES_TABLE, {"username": username})
     if sel.empty:
         return HTMLResponse(layout("Error", "<p>Employee not found.</p>"))
     e = sel.iloc[0]
@@ -1342,12 +1437,12 @@ def edit_employee_post(request: Request, username: str = Form(...), name: Option
         return RedirectResponse(url="/employee/login")
     if uname != "admin":
         return HTMLResponse(layout("Forbidden", "<p>Only admin can edit employees.</p>"))
-    employees = read_table(EMPLOYEES_TABLE)
+    values = {}
     if name is not None:
-        employees.loc[employees["username"] == username, "name"] = name
+        values["name"] = name
     if password:
-        employees.loc[employees["username"] == username, "password_hash"] = hash_pw(password)
-    write_table(EMPLOYEES_TABLE, employees)
+        values["password_hash"] = hash_pw(password)
+    db.update_rows(EMPLOYEES_TABLE, {"username": username}, values)
     return RedirectResponse(url="/employee/dashboard", status_code=303)
 
 
@@ -1371,21 +1466,12 @@ def edit_contact_stub():
 
 
 
-from fastapi import UploadFile, File
-import shutil
-from pathlib import Path
-
-# Create static directory for car images
-STATIC_DIR = Path("static/car_images")
-STATIC_DIR.mkdir(parents=True, exist_ok=True)
-
 @app.get("/api/employee/check")
 def check_employee_session(request: Request):
     """Check if employee is logged in"""
     try:
         username = employee_required(request)
-        employees = read_table(EMPLOYEES_TABLE)
-        emp_data = employees[employees["username"] == username]
+        emp_data = db.find_rows(EMPLOYEES_TABLE, {"username": username})
         if emp_data.empty:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         return {
@@ -1396,6 +1482,19 @@ def check_employee_session(request: Request):
     except HTTPException:
         return JSONResponse(status_code=401, content={"authenticated": False})
 
+def dashboard_stats():
+    """Dashboard counters, counted in SQL rather than by loading the tables."""
+    cars = db.count_by(CARS_TABLE, "status")
+    sell_requests = db.count_by(SELL_REQUESTS_TABLE, "status")
+    services = db.count_by(SERVICES_TABLE, "status")
+    return {
+        "total_cars": sum(cars.values()),
+        "available_cars": cars.get("available", 0),
+        "total_sales": db.count_rows(SALES_TABLE),
+        "pending_sell_requests": sell_requests.get("pending", 0),
+        "pending_services": services.get("pending", 0)
+    }
+
 @app.get("/api/employee/stats")
 def get_dashboard_stats(request: Request):
     """Get dashboard statistics"""
@@ -1404,18 +1503,73 @@ def get_dashboard_stats(request: Request):
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
     
-    cars = read_table(CARS_TABLE)
-    sales = read_table(SALES_TABLE)
-    sell_requests = read_table(SELL_REQUESTS_TABLE)
-    services = read_table(SERVICES_TABLE)
+    return dashboard_stats()
+
+DASHBOARD_PAGE_SIZE = 50
+# panel -> (table, sort column, newest first); the primary key breaks ties
+DASHBOARD_SECTIONS = {
+    "cars": (CARS_TABLE, None, False),
+    "sales": (SALES_TABLE, "timestamp", True),
+    "sell_requests": (SELL_REQUESTS_TABLE, "timestamp", True),
+    "services": (SERVICES_TABLE, "timestamp", True),
+    "contacts": (CONTACTS_TABLE, "timestamp", True),
+}
+
+def dashboard_section(section, limit, cursor=None):
+    """One page of a dashboard panel as {"items", "next_cursor"}."""
+    table_name, order_by, descending = DASHBOARD_SECTIONS[section]
+    if section == "sales":
+        rows, next_cursor = sales_page(order_by, descending, limit, cursor)
+    else:
+        rows, next_cursor = db.fetch_page(table_name, order_by=order_by, descending=descending, limit=limit, cursor=cursor)
+    return {"items": rows, "next_cursor": next_cursor}
+
+def dashboard_tables(section=None):
+    # sales pages carry car and customer names, so they also depend on those tables
+    if section == "sales":
+        return SALES_LIST_TABLES
+    if section:
+        return (DASHBOARD_SECTIONS[section][0],)
+    return tuple(table_name for table_name, _, _ in DASHBOARD_SECTIONS.values()) + (CUSTOMERS_TABLE,)
+
+@app.get("/api/employee/dashboard")
+def get_dashboard(request: Request, limit: int = DASHBOARD_PAGE_SIZE):
+    """
+    Everything the dashboard shows on load, in one response: the stats and the
+    first page of each panel. Further pages of a panel come from
+    /api/employee/dashboard/{section} with that panel's next_cursor.
+    """
+    try:
+        employee_required(request)
+    except HTTPException:
+        return JSONResponse(status_code=401, content={"message": "Unauthorized"})
     
-    return {
-        "total_cars": len(cars),
-        "available_cars": len(cars[cars["status"] == "available"]) if "status" in cars.columns else len(cars),
-        "total_sales": len(sales),
-        "pending_sell_requests": len(sell_requests[sell_requests["status"] == "pending"]) if not sell_requests.empty else 0,
-        "pending_services": len(services[services["status"] == "pending"]) if not services.empty else 0
-    }
+    limit = max(1, min(limit, CARS_MAX_PAGE_SIZE))
+
+    def build():
+        bundle = {"stats": dashboard_stats()}
+        for section in DASHBOARD_SECTIONS:
+            bundle[section] = dashboard_section(section, limit)
+        return bundle
+
+    return response_cache.json_response(dashboard_tables(), ("dashboard", limit), build)
+
+@app.get("/api/employee/dashboard/{section}")
+def get_dashboard_section(request: Request, section: str, limit: int = DASHBOARD_PAGE_SIZE, cursor: str = None):
+    """The next page of one dashboard panel."""
+    try:
+        employee_required(request)
+    except HTTPException:
+        return JSONResponse(status_code=401, content={"message": "Unauthorized"})
+    
+    if section not in DASHBOARD_SECTIONS:
+        return JSONResponse(status_code=404, content={"message": "Unknown dashboard section"})
+    limit = max(1, min(limit, CARS_MAX_PAGE_SIZE))
+    try:
+        return response_cache.json_response(dashboard_tables(section), ("dashboard", section, limit, cursor),
+                                            lambda: dashboard_section(section, limit, cursor))
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
 
 @app.get("/api/employee/cars")
 def get_all_cars_employee(request: Request):
@@ -1425,10 +1579,7 @@ def get_all_cars_employee(request: Request):
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
     
-    cars = read_table(CARS_TABLE)
-    if cars.empty:
-        return []
-    return cars.to_dict(orient="records")
+    return response_cache.json_response(CARS_TABLE, "employee_cars", lambda: db.fetch_rows(CARS_TABLE))
 
 @app.post("/api/employee/cars")
 def add_car_employee(request: Request, car_data: dict = Body(...)):
@@ -1438,7 +1589,6 @@ def add_car_employee(request: Request, car_data: dict = Body(...)):
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
     
-    cars = read_table(CARS_TABLE)
     new_car = {
         "id": f"car-{uuid.uuid4().hex[:8]}",
         "make": car_data.get("make", ""),
@@ -1454,8 +1604,7 @@ def add_car_employee(request: Request, car_data: dict = Body(...)):
         "description": car_data.get("description", ""),
         "status": car_data.get("status", "available")
     }
-    cars = pd.concat([cars, pd.DataFrame([new_car])], ignore_index=True)
-    write_table(CARS_TABLE, cars)
+    db.insert_row(CARS_TABLE, new_car)
     return {"message": "Car added successfully", "car": new_car}
 
 @app.put("/api/employee/cars/{car_id}")
@@ -1466,17 +1615,11 @@ def update_car_employee(request: Request, car_id: str, car_data: dict = Body(...
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
     
-    cars = read_table(CARS_TABLE)
-    car_idx = cars[cars["id"] == car_id].index
-    if car_idx.empty:
+    if not db.count_rows(CARS_TABLE, {"id": car_id}):
         return JSONResponse(status_code=404, content={"message": "Car not found"})
     
-    idx = car_idx[0]
-    for key, value in car_data.items():
-        if key in cars.columns:
-            cars.at[idx, key] = value
-    
-    write_table(CARS_TABLE, cars)
+    columns = db.table_columns(CARS_TABLE)
+    db.update_rows(CARS_TABLE, {"id": car_id}, {key: value for key, value in car_data.items() if key in columns and key != "id"})
     return {"message": "Car updated successfully"}
 
 @app.delete("/api/employee/cars/{car_id}")
@@ -1487,62 +1630,49 @@ def delete_car_employee(request: Request, car_id: str):
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
     
-    cars = read_table(CARS_TABLE)
-    cars = cars[cars["id"] != car_id]
-    write_table(CARS_TABLE, cars)
+    db.delete_rows(CARS_TABLE, {"id": car_id})
     return {"message": "Car deleted successfully"}
 
-@app.post("/api/employee/upload-image")
-async def upload_car_image(request: Request, file: UploadFile = File(...)):
-    """Upload car image"""
-    try:
-        employee_required(request)
-    except HTTPException:
-        return JSONResponse(status_code=401, content={"message": "Unauthorized"})
-    
-    # Generate unique filename
-    file_ext = Path(file.filename).suffix
-    filename = f"{uuid.uuid4().hex}{file_ext}"
-    file_path = STATIC_DIR / filename
-    
-    # Save file
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Return URL
-    return {"url": f"/static/car_images/{filename}", "filename": filename}
+SALES_SORTS = ("timestamp", "price")
+SALES_LIST_TABLES = (SALES_TABLE, CARS_TABLE, CUSTOMERS_TABLE)
+# each sale with its car and buyer, looked up by primary key in the same query
+SALES_JOINS = (f"LEFT JOIN {CARS_TABLE} ON {CARS_TABLE}.id = {SALES_TABLE}.car_id "
+               f"LEFT JOIN {CUSTOMERS_TABLE} ON {CUSTOMERS_TABLE}.phone = {SALES_TABLE}.phone")
+SALES_EXTRA_COLUMNS = {
+    "car_name": f"COALESCE({CARS_TABLE}.make || ' ' || {CARS_TABLE}.model, 'Unknown')",
+    "car_year": f"{CARS_TABLE}.year",
+    "customer_name": f"{CUSTOMERS_TABLE}.name",
+}
+
+def sales_page(order_by="timestamp", descending=True, limit=CARS_PAGE_SIZE, cursor=None):
+    """One page of sales with car_name, car_year and customer_name, as (rows, next_cursor)."""
+    return db.fetch_page(SALES_TABLE, order_by=order_by, descending=descending, limit=limit, cursor=cursor,
+                         joins=SALES_JOINS, extra_columns=SALES_EXTRA_COLUMNS)
 
 @app.get("/api/employee/sales")
-def get_all_sales_employee(request: Request):
-    """Get all sales"""
+def get_all_sales_employee(request: Request, sort: str = "-timestamp", limit: int = DASHBOARD_PAGE_SIZE, cursor: str = None):
+    """
+    One page of sales, newest first by default. sort is timestamp or price,
+    prefixed with '-' for descending. The cursor for the next page comes back
+    in the X-Next-Cursor header, which is absent on the last page.
+    """
     try:
         employee_required(request)
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
     
-    sales = read_table(SALES_TABLE)
-    if sales.empty:
-        return []
-    
-    # Join with cars to get car details
-    cars = read_table(CARS_TABLE)
-    customers = read_table(CUSTOMERS_TABLE)
-    
-    result = []
-    for _, sale in sales.iterrows():
-        car_data = cars[cars["id"] == sale["car_id"]]
-        car_name = f"{car_data.iloc[0]['make']} {car_data.iloc[0]['model']}" if not car_data.empty else "Unknown"
-        
-        result.append({
-            "order_id": sale["order_id"],
-            "car_id": sale["car_id"],
-            "car_name": car_name,
-            "price": int(sale["price"]),
-            "timestamp": sale["timestamp"],
-            "session_id": sale.get("session_id", "")
-        })
-    
-    return result
+    descending = sort.startswith("-")
+    order_by = sort.lstrip("-")
+    if order_by not in SALES_SORTS:
+        return JSONResponse(status_code=400, content={"message": f"sort must be one of {', '.join(SALES_SORTS)}, optionally prefixed with '-'"})
+    limit = max(1, min(limit, CARS_MAX_PAGE_SIZE))
+    try:
+        body, next_cursor = response_cache.cached_json(SALES_LIST_TABLES, ("sales", sort, limit, cursor),
+                                                       lambda: sales_page(order_by, descending, limit, cursor))
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.get("/api/employee/sell-requests")
 def get_all_sell_requests_employee(request: Request):
@@ -1552,10 +1682,7 @@ def get_all_sell_requests_employee(request: Request):
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
     
-    sell_requests = read_table(SELL_REQUESTS_TABLE)
-    if sell_requests.empty:
-        return []
-    return sell_requests.to_dict(orient="records")
+    return response_cache.json_response(SELL_REQUESTS_TABLE, "employee_sell_requests", lambda: db.fetch_rows(SELL_REQUESTS_TABLE))
 
 @app.put("/api/employee/sell-requests/{request_id}/status")
 def update_sell_request_status(request: Request, request_id: str, status_data: dict = Body(...)):
@@ -1565,14 +1692,9 @@ def update_sell_request_status(request: Request, request_id: str, status_data: d
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
     
-    sell_requests = read_table(SELL_REQUESTS_TABLE)
-    req_idx = sell_requests[sell_requests["request_id"] == request_id].index
-    if req_idx.empty:
+    if not db.update_rows(SELL_REQUESTS_TABLE, {"request_id": request_id}, {"status": status_data.get("status", "pending")}):
         return JSONResponse(status_code=404, content={"message": "Request not found"})
     
-    idx = req_idx[0]
-    sell_requests.at[idx, "status"] = status_data.get("status", "pending")
-    write_table(SELL_REQUESTS_TABLE, sell_requests)
     return {"message": "Status updated successfully"}
 
 @app.get("/api/employee/services")
@@ -1583,10 +1705,7 @@ def get_all_services_employee(request: Request):
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
     
-    services = read_table(SERVICES_TABLE)
-    if services.empty:
-        return []
-    return services.to_dict(orient="records")
+    return response_cache.json_response(SERVICES_TABLE, "employee_services", lambda: db.fetch_rows(SERVICES_TABLE))
 
 @app.put("/api/employee/services/{service_id}/status")
 def update_service_status(request: Request, service_id: str, status_data: dict = Body(...)):
@@ -1596,14 +1715,9 @@ def update_service_status(request: Request, service_id: str, status_data: dict =
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
     
-    services = read_table(SERVICES_TABLE)
-    svc_idx = services[services["service_id"] == service_id].index
-    if svc_idx.empty:
+    if not db.update_rows(SERVICES_TABLE, {"service_id": service_id}, {"status": status_data.get("status", "pending")}):
         return JSONResponse(status_code=404, content={"message": "Service not found"})
     
-    idx = svc_idx[0]
-    services.at[idx, "status"] = status_data.get("status", "pending")
-    write_table(SERVICES_TABLE, services)
     return {"message": "Status updated successfully"}
 
 @app.get("/api/employee/contacts")
@@ -1614,10 +1728,7 @@ def get_all_contacts_employee(request: Request):
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
     
-    contacts = read_table(CONTACTS_TABLE)
-    if contacts.empty:
-        return []
-    return contacts.to_dict(orient="records")
+    return response_cache.json_response(CONTACTS_TABLE, "employee_contacts", lambda: db.fetch_rows(CONTACTS_TABLE))
 
 @app.get("/api/employee/employees")
 def get_all_employees(request: Request):
@@ -1630,12 +1741,18 @@ def get_all_employees(request: Request):
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
     
-    employees = read_table(EMPLOYEES_TABLE)
-    if employees.empty:
-        return []
     # Don't return password hashes
-    result = employees[["username", "name"]].to_dict(orient="records")
-    return result
+    return response_cache.json_response(EMPLOYEES_TABLE, "employees", lambda: db.fetch_rows(EMPLOYEES_TABLE, ["username", "name"]))
+
+@app.get("/api/employee/metrics")
+def get_metrics(request: Request):
+    """Storage metrics for monitoring table growth"""
+    try:
+        employee_required(request)
+    except HTTPException:
+        return JSONResponse(status_code=401, content={"message": "Unauthorized"})
+    
+    return {"sessions": sessions.session_counts(), "cache": db.cache_stats(), "json": response_cache.stats()}
 
 class LoginRequest(BaseModel):
     username: str
@@ -1644,8 +1761,7 @@ class LoginRequest(BaseModel):
 @app.post("/api/employee/login")
 def api_employee_login(response: Response, creds: LoginRequest):
     """JSON login for frontend"""
-    employees = read_table(EMPLOYEES_TABLE)
-    found = employees[employees["username"] == creds.username]
+    found = db.find_rows(EMPLOYEES_TABLE, {"username": creds.username})
     if found.empty:
         return JSONResponse(status_code=401, content={"message": "Invalid credentials"})
     expected = found.iloc[0]["password_hash"]
@@ -1653,76 +1769,54 @@ def api_employee_login(response: Response, creds: LoginRequest):
         return JSONResponse(status_code=401, content={"message": "Invalid credentials"})
     
     # set cookie
-    token = str(uuid.uuid4())
+    token = create_emp_session(creds.username)
     content = {"message": "Login successful"}
     resp = JSONResponse(content=content)
-    resp.set_cookie(EMP_SESSION_COOKIE, token, max_age=60 * 60 * 8)
-    
-    d = load_emp_sessions()
-    d[token] = {"username": creds.username, "login_at": datetime.utcnow().isoformat()}
-    save_emp_sessions(d)
+    resp.set_cookie(EMP_SESSION_COOKIE, token, max_age=EMP_SESSION_MAX_AGE)
     return resp
 
+def media_error(e: media.MediaError):
+    return JSONResponse(status_code=e.status_code, content={"message": str(e)})
+
+# The upload handlers read the body themselves (see media.py) rather than
+# taking an UploadFile, which FastAPI would spool in full before the handler runs
+
 @app.post("/api/employee/upload-image")
-async def upload_car_image(request: Request, file: UploadFile = File(...)):
+async def upload_car_image(request: Request):
     """Upload car image"""
     try:
-        employee_required(request)
+        # the session lookup is a database read, so not on the event loop
+        await run_in_threadpool(employee_required, request)
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
-    
-    # Generate unique filename
-    file_ext = Path(file.filename).suffix
-    filename = f"{uuid.uuid4().hex}{file_ext}"
-    file_path = Path("static/car_images") / filename
-    
-    # Save file
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Return URL
-    return {"url": f"/static/car_images/{filename}", "filename": filename}
+    try:
+        url, filename = await media.save_upload(request, "car_image")
+    except media.MediaError as e:
+        return media_error(e)
+    # resized copies are made in the background; the catalog shows the original until then
+    await run_in_threadpool(derivatives.enqueue, url)
+    return {"url": url, "filename": filename}
 
 @app.post("/api/employee/upload-video")
-async def upload_hero_video(request: Request, file: UploadFile = File(...)):
+async def upload_hero_video(request: Request):
     """Upload hero video for home page"""
     try:
-        employee_required(request)
+        await run_in_threadpool(employee_required, request)
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
-    
-    # Generate unique filename
-    file_ext = Path(file.filename).suffix
-    filename = f"hero_{uuid.uuid4().hex}{file_ext}"
-    file_path = Path("static/videos") / filename
-    
-    # Save file
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Store video URL in settings
-    video_url = f"/static/videos/{filename}"
-    
-    settings = read_table(SETTINGS_TABLE, default_cols=["key", "value"])
-    # remove old if exists
-    settings = settings[settings["key"] != "hero_video"]
-    # add new
-    new_setting = {"key": "hero_video", "value": video_url}
-    settings = pd.concat([settings, pd.DataFrame([new_setting])], ignore_index=True)
-    write_table(SETTINGS_TABLE, settings)
-    
-    # Return URL
+    try:
+        video_url, filename = await media.save_upload(request, "hero_video")
+    except media.MediaError as e:
+        return media_error(e)
+    # settings are written from the threadpool like any other sync database call
+    await run_in_threadpool(db.upsert, SETTINGS_TABLE, {"key": "hero_video", "value": video_url}, key="key")
     return {"url": video_url, "filename": filename}
 
 @app.get("/api/settings/hero-video")
-def get_hero_video():
+def get_hero_video(request: Request):
     """Get hero video URL (public endpoint)"""
-    settings = read_table(SETTINGS_TABLE)
-    row = settings[settings["key"] == "hero_video"]
-    
-    if not row.empty:
-        return {"video_url": row.iloc[0]["value"]}
-    return {"video_url": None}
+    etag = table_etag(request, SETTINGS_TABLE)
+    return not_modified(request, etag) or tagged({"video_url": get_settings().get("hero_video")}, etag)
 
 class SocialLinksRequest(BaseModel):
     facebook_url: str = ""
@@ -1737,26 +1831,25 @@ def save_social_links(request: Request, links: SocialLinksRequest):
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
     
-    settings = read_table(SETTINGS_TABLE)
-    
     # Update or add each social link
     for key, value in [("facebook_url", links.facebook_url), 
                        ("whatsapp_url", links.whatsapp_url), 
                        ("instagram_url", links.instagram_url)]:
-        # Remove old if exists
-        settings = settings[settings["key"] != key]
-        # Add new
-        if value:  # Only add if not empty
-            new_setting = {"key": key, "value": value}
-            settings = pd.concat([settings, pd.DataFrame([new_setting])], ignore_index=True)
+        if value:  # Only keep if not empty
+            db.upsert(SETTINGS_TABLE, {"key": key, "value": value}, key="key")
+        else:
+            db.delete_rows(SETTINGS_TABLE, {"key": key})
     
-    write_table(SETTINGS_TABLE, settings)
     return {"message": "Social links saved successfully"}
 
 @app.get("/api/settings/social-links")
-def get_social_links():
+def get_social_links(request: Request):
     """Get social media links (public endpoint)"""
-    settings = read_table(SETTINGS_TABLE)
+    etag = table_etag(request, SETTINGS_TABLE)
+    cached_response = not_modified(request, etag)
+    if cached_response:
+        return cached_response
+    settings = get_settings()
     
     result = {
         "facebook_url": "",
@@ -1765,54 +1858,43 @@ def get_social_links():
     }
     
     for key in result.keys():
-        row = settings[settings["key"] == key]
-        if not row.empty:
-            result[key] = row.iloc[0]["value"]
+        if key in settings:
+            result[key] = settings[key]
     
-    return result
+    return tagged(result, etag)
 
 @app.post("/api/employee/upload-logo")
-async def upload_logo(request: Request, file: UploadFile = File(...)):
+async def upload_logo(request: Request):
     """Upload company logo (employee auth required)"""
     try:
-        employee_required(request)
+        await run_in_threadpool(employee_required, request)
     except HTTPException:
         return JSONResponse(status_code=401, content={"message": "Unauthorized"})
-    
-    # Create logos directory if it doesn't exist
-    Path("static/logos").mkdir(parents=True, exist_ok=True)
-    
-    # Generate filename
-    file_ext = Path(file.filename).suffix
-    filename = f"logo{file_ext}"
-    file_path = Path("static/logos") / filename
-    
-    # Save file
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Store logo URL in settings
-    logo_url = f"/static/logos/{filename}"
-    
-    settings = read_table(SETTINGS_TABLE)
-    # Remove old if exists
-    settings = settings[settings["key"] != "logo_url"]
-    # Add new
-    new_setting = {"key": "logo_url", "value": logo_url}
-    settings = pd.concat([settings, pd.DataFrame([new_setting])], ignore_index=True)
-    write_table(SETTINGS_TABLE, settings)
-    
+    try:
+        logo_url, filename = await media.save_upload(request, "logo")
+    except media.MediaError as e:
+        return media_error(e)
+    # an SVG logo is text, so keep a gzipped copy for static_files to send
+    await run_in_threadpool(static_files.precompress, logo_url.lstrip("/"))
+    await run_in_threadpool(db.upsert, SETTINGS_TABLE, {"key": "logo_url", "value": logo_url}, key="key")
     return {"url": logo_url, "filename": filename}
 
+@app.post("/api/employee/media/gc")
+def collect_media_garbage(request: Request, dry_run: bool = True):
+    """Delete uploaded files no car or setting uses (admin only); by default only reports what would go"""
+    try:
+        username = employee_required(request)
+        if username != "admin":
+            return JSONResponse(status_code=403, content={"message": "Admin access required"})
+    except HTTPException:
+        return JSONResponse(status_code=401, content={"message": "Unauthorized"})
+    return media.collect_garbage(dry_run=dry_run)
+
 @app.get("/api/settings/logo")
-def get_logo():
+def get_logo(request: Request):
     """Get logo URL (public endpoint)"""
-    settings = read_table(SETTINGS_TABLE)
-    row = settings[settings["key"] == "logo_url"]
-    
-    if not row.empty:
-        return {"logo_url": row.iloc[0]["value"]}
-    return {"logo_url": None}
+    etag = table_etag(request, SETTINGS_TABLE)
+    return not_modified(request, etag) or tagged({"logo_url": get_settings().get("logo_url")}, etag)
 
 if __name__ == '__main__':
     import uvicorn
@@ -0,0 +1,165 @@
+"""
+sessions.py
+
+Session store for employee and customer logins.
+
+Each session is one row in its session table, keyed by token, so checking
+a login is a primary-key probe. A short-lived in-process cache sits in
+front of it so repeated requests with the same cookie don't hit SQLite.
+
+With several worker processes, a logout or expiry sweep in one worker has to
+reach the others' caches too, so each session table's cache is dropped
+whenever db sees that table written by another connection.
+
+Sessions carry a server-side expires_at. Using a session in the second
+half of its lifetime pushes expires_at out again (sliding renewal), and a
+background sweeper deletes expired rows in batches so the tables stay small.
+"""
+
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import db
+
+# Default lifetime (seconds) per session table, also used when renewing
+SESSION_LIFETIMES = {
+    "employee_sessions": 60 * 60 * 8,
+    "customer_sessions": 60 * 60 * 24 * 30,
+}
+
+# How long a validated session is trusted from memory before re-checking the table
+CACHE_TTL = 30
+CACHE_MAX_ENTRIES = 10000
+
+SWEEP_INTERVAL = 300
+SWEEP_BATCH = 500
+
+_cache = {}  # (table_name, token) -> (expires_at monotonic, row dict)
+_lock = threading.Lock()
+_sweeper_stop = threading.Event()
+
+
+def _remember(table_name, token, row):
+    now = time.monotonic()
+    with _lock:
+        if len(_cache) >= CACHE_MAX_ENTRIES:
+            for key in [k for k, (exp, _) in _cache.items() if exp <= now]:
+                del _cache[key]
+            if len(_cache) >= CACHE_MAX_ENTRIES:
+                _cache.clear()
+        _cache[(table_name, token)] = (now + CACHE_TTL, row)
+
+
+def forget(table_name, token=None):
+    """Drop one cached session, or every cached session of `table_name`."""
+    with _lock:
+        if token is not None:
+            _cache.pop((table_name, token), None)
+            return
+        for key in [k for k in _cache if k[0] == table_name]:
+            del _cache[key]
+
+
+for _table in SESSION_LIFETIMES:
+    db.on_change(_table, lambda table_name=_table: forget(table_name))
+
+
+def _expiry(seconds):
+    return (datetime.utcnow() + timedelta(seconds=seconds)).isoformat()
+
+
+def get_session(table_name, token, on_renew=None):
+    """
+    Return the session row for `token` as a dict, or None if there is no such
+    session or it has expired. If the session gets renewed, `on_renew(lifetime)`
+    is called so the caller can extend the cookie to match.
+    """
+    if not token:
+        return None
+    db.poll_changes()
+    hit = _cache.get((table_name, token))
+    if hit is not None and hit[0] > time.monotonic():
+        row = hit[1]
+    else:
+        row = db.get_row(table_name, {"token": token})
+        if row is None:
+            forget(table_name, token)
+            return None
+
+    now = datetime.utcnow()
+    expires_at = row.get("expires_at")
+    if not expires_at or datetime.fromisoformat(expires_at) <= now:
+        # sessions from before expiry was tracked have no expires_at and are treated as expired
+        forget(table_name, token)
+        return None
+
+    lifetime = SESSION_LIFETIMES[table_name]
+    if (datetime.fromisoformat(expires_at) - now).total_seconds() < lifetime / 2:
+        row = {**row, "expires_at": _expiry(lifetime)}
+        db.update_rows(table_name, {"token": token}, {"expires_at": row["expires_at"]})
+        if on_renew is not None:
+            on_renew(lifetime)
+    _remember(table_name, token, row)
+    return row
+
+
+def create_session(table_name, lifetime=None, **data):
+    """Insert a new session holding `data`, valid for `lifetime` seconds, and return its token."""
+    token = str(uuid.uuid4())
+    now = datetime.utcnow()
+    row = {
+        "token": token,
+        **data,
+        "login_at": now.isoformat(),
+        "expires_at": _expiry(lifetime or SESSION_LIFETIMES[table_name]),
+    }
+    db.insert_row(table_name, row)
+    _remember(table_name, token, row)
+    return token
+
+
+def delete_session(table_name, token):
+    forget(table_name, token)
+    if token:
+        db.delete_rows(table_name, {"token": token})
+
+
+# --- Expiry ---
+
+def sweep_expired():
+    """Delete expired sessions from every session table. Returns {table: rows deleted}."""
+    now = datetime.utcnow().isoformat()
+    return {table: db.delete_expired(table, "expires_at", now, SWEEP_BATCH) for table in SESSION_LIFETIMES}
+
+
+def session_counts():
+    """Live and expired (not yet swept) session counts per table."""
+    now = datetime.utcnow().isoformat()
+    conn = db.get_connection()
+    result = {}
+    for table in SESSION_LIFETIMES:
+        live = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE expires_at >= ?", (now,)).fetchone()[0]
+        total = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        result[table] = {"live": live, "expired": total - live}
+    return result
+
+
+def _sweep_loop():
+    while not _sweeper_stop.wait(SWEEP_INTERVAL):
+        try:
+            sweep_expired()
+        except Exception as e:
+            print(f"Session sweep failed: {e}")
+
+
+def start_sweeper():
+    """Sweep once now, then every SWEEP_INTERVAL seconds on a daemon thread."""
+    _sweeper_stop.clear()
+    sweep_expired()
+    threading.Thread(target=_sweep_loop, name="session-sweeper", daemon=True).start()
+
+
+def stop_sweeper():
+    _sweeper_stop.set()
@@ -0,0 +1,253 @@
+"""
+static_files.py
+
+Delivery of /static: car images, the hero video and logos.
+
+Starlette's StaticFiles (0.27 here) always sends the whole file, so seeking in
+the hero video or resuming a download fetches all 4 MB again, and it sets no
+Cache-Control. StaticFiles here is a drop-in ASGI app that adds:
+
+- single byte ranges (Range, If-Range; 206 and 416), so a player fetches
+  only the part it plays;
+- Cache-Control: immutable for uploads named by their content hash (see
+  media.py), which never change, and revalidation by ETag for the rest;
+- precompressed variants: an up-to-date <file>.br or <file>.gz next to a file
+  is sent instead when the client accepts that encoding (see precompress());
+- zero-copy sends through the ASGI "http.response.zerocopy" extension when
+  the server offers it. Otherwise the file is read in large chunks with
+  os.pread on the threadpool, never on the event loop.
+
+Hidden files, such as uploads still being written, are never served.
+"""
+
+import email.utils
+import gzip
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+
+import media
+
+CHUNK_SIZE = 256 * 1024
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+
+# (content coding, file suffix), in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# types worth compressing; images and video already are
+COMPRESSIBLE = {".svg", ".css", ".js", ".json", ".html", ".txt", ".xml"}
+PRECOMPRESS_MIN_BYTES = 1024
+
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+mimetypes.add_type("image/avif", ".avif")
+mimetypes.add_type("image/webp", ".webp")
+
+
+def _accepts(accept_encoding, coding):
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def _lookup(path, accept_encoding):
+    """(path to send, stat, content coding or None), or None if there is no such file."""
+    try:
+        st = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    if not os.path.isfile(path):
+        return None
+    if os.path.splitext(path)[1].lower() in COMPRESSIBLE:
+        for coding, suffix in ENCODINGS:
+            if not _accepts(accept_encoding, coding):
+                continue
+            try:
+                variant = os.stat(path + suffix)
+            except FileNotFoundError:
+                continue
+            # a variant older than its file is stale
+            if variant.st_mtime >= st.st_mtime:
+                return path + suffix, variant, coding
+    return path, st, None
+
+
+def _byte_range(header, if_range, etag, size):
+    """
+    (start, end) of the single range asked for, inclusive; None to send the
+    whole file; "unsatisfiable" for a range past the end.
+    """
+    if not header or (if_range and if_range != etag):
+        return None
+    match = RANGE.match(header.replace(" ", ""))
+    if not match or match.group(1) == match.group(2) == "":
+        # malformed, or several ranges: the whole file is a valid answer
+        return None
+    first, last = match.groups()
+    if first == "":
+        length = int(last)
+        if length == 0:
+            return "unsatisfiable"
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        return "unsatisfiable"
+    if end < start:
+        return None
+    return start, end
+
+
+def _not_modified(headers, etag, mtime):
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    since = headers.get("if-modified-since")
+    if since:
+        try:
+            return int(mtime) <= email.utils.parsedate_to_datetime(since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class StaticFiles:
+    """Serve files under `directory` (see the module docstring)."""
+
+    def __init__(self, directory):
+        self.root = os.path.realpath(directory)
+
+    async def __call__(self, scope, receive, send):
+        assert scope["type"] == "http"
+        if scope["method"] not in ("GET", "HEAD"):
+            await self._respond(send, 405, [(b"allow", b"GET, HEAD")])
+            return
+        parts = [p for p in scope["path"].split("/") if p]
+        # no hidden files (in-progress uploads) and no way out through ".."
+        if not parts or any(p.startswith(".") for p in parts):
+            await self._respond(send, 404)
+            return
+        path = os.path.realpath(os.path.join(self.root, *parts))
+        if os.path.commonpath([path, self.root]) != self.root:
+            await self._respond(send, 404)
+            return
+
+        headers = Headers(scope=scope)
+        found = await run_in_threadpool(_lookup, path, headers.get("accept-encoding", ""))
+        if found is None:
+            await self._respond(send, 404)
+            return
+        send_path, st, coding = found
+
+        etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+        response_headers = [
+            (b"etag", etag.encode()),
+            (b"last-modified", email.utils.formatdate(st.st_mtime, usegmt=True).encode()),
+            (b"cache-control", (IMMUTABLE if media.CONTENT_NAME.match(parts[-1]) else REVALIDATE).encode()),
+        ]
+        if os.path.splitext(path)[1].lower() in COMPRESSIBLE:
+            response_headers.append((b"vary", b"accept-encoding"))
+        if _not_modified(headers, etag, st.st_mtime):
+            await self._respond(send, 304, response_headers)
+            return
+
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type.endswith(("+xml", "/javascript", "/json")):
+            content_type += "; charset=utf-8"
+        response_headers.append((b"content-type", content_type.encode()))
+        status, start, length = 200, 0, st.st_size
+        if coding:
+            response_headers.append((b"content-encoding", coding.encode()))
+        else:
+            response_headers.append((b"accept-ranges", b"bytes"))
+            byte_range = _byte_range(headers.get("range"), headers.get("if-range"), etag, st.st_size)
+            if byte_range == "unsatisfiable":
+                await self._respond(send, 416, response_headers + [(b"content-range", f"bytes */{st.st_size}".encode())])
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                status, length = 206, end - start + 1
+                response_headers.append((b"content-range", f"bytes {start}-{end}/{st.st_size}".encode()))
+        response_headers.append((b"content-length", str(length).encode()))
+
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+        if scope["method"] == "HEAD" or length == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        fd = await run_in_threadpool(os.open, send_path, os.O_RDONLY)
+        try:
+            if "http.response.zerocopy" in scope.get("extensions", {}):
+                # the server copies from the file to the socket itself (sendfile)
+                with os.fdopen(os.dup(fd), "rb") as f:
+                    await send({"type": "http.response.zerocopy", "file": f, "offset": start, "count": length, "more_body": False})
+                return
+            offset, end = start, start + length
+            while offset < end:
+                chunk = await run_in_threadpool(os.pread, fd, min(CHUNK_SIZE, end - offset), offset)
+                if not chunk:
+                    # the file shrank under us; end the body short rather than hang
+                    break
+                offset += len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": offset < end})
+            if offset < end:
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    async def _respond(send, status, headers=()):
+        body = b"" if status == 304 else {404: b"Not Found", 405: b"Method Not Allowed", 416: b""}.get(status, b"")
+        if status != 304:
+            headers = [*headers, (b"content-length", str(len(body)).encode())]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+# --- Precompressed variants ---
+
+def precompress(path):
+    """
+    Write <path>.gz next to a compressible file of at least
+    PRECOMPRESS_MIN_BYTES, unless an up-to-date one exists. Returns whether it
+    wrote one. Like uploads, the variant is written to a temp file and renamed.
+    """
+    path = str(path)
+    if os.path.splitext(path)[1].lower() not in COMPRESSIBLE or os.path.basename(path).startswith("."):
+        return False
+    try:
+        st = os.stat(path)
+        if st.st_size < PRECOMPRESS_MIN_BYTES:
+            return False
+        if os.stat(path + ".gz").st_mtime >= st.st_mtime:
+            return False
+    except FileNotFoundError:
+        if not os.path.isfile(path):
+            return False
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=media.TEMP_PREFIX)
+    try:
+        with open(path, "rb") as src, os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as out:
+            shutil.copyfileobj(src, out)
+        os.chmod(temp_path, media.FILE_MODE)
+        os.replace(temp_path, path + ".gz")
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return True
+
+
+def precompress_tree(directory):
+    """precompress() every file under `directory`. Returns the number of variants written."""
+    written = 0
+    for folder, _, names in os.walk(directory):
+        for name in names:
+            written += precompress(os.path.join(folder, name))
+    return written
@@ -0,0 +1,93 @@
+"""
+templates.py
+
+Row templates for the server-rendered HTML pages.
+
+The pages used to format every row with an f-string over a DataFrame from
+iterrows(), building the whole page in memory before sending any of it. A
+Template is a str.format-style string such as "<td>{make}</td><td>{price:.0f}</td>"
+parsed once, at import, into a positional format string and the fields that
+fill it. Rendering a row is then one str.format call over values taken from a
+row dict, HTML-escaped. A field that is None or empty renders as its default.
+
+table() yields a page of rows as HTML chunks, so pages can stream their body
+with a StreamingResponse instead of holding it all.
+"""
+
+import html
+import string
+from urllib.parse import urlencode
+
+# rows rendered per chunk yielded by table()
+CHUNK_ROWS = 100
+
+
+class Template:
+    """A compiled row template (see the module docstring)."""
+
+    def __init__(self, source, defaults=None):
+        defaults = defaults or {}
+        pieces, self.fields = [], []
+        for literal, field, spec, conversion in string.Formatter().parse(source):
+            # literal braces survive the second format() call doubled
+            pieces.append(literal.replace("{", "{{").replace("}", "}}"))
+            if field is not None:
+                if conversion or not field.isidentifier():
+                    raise ValueError(f"Unsupported template field {{{field}}}")
+                pieces.append(f"{{{len(self.fields)}}}")
+                self.fields.append((field, spec, html.escape(defaults.get(field, ""))))
+        self._format = "".join(pieces).format
+
+    def render(self, row):
+        values = []
+        for field, spec, default in self.fields:
+            value = row.get(field)
+            if value is None or value == "":
+                values.append(default)
+                continue
+            try:
+                text = format(value, spec)
+            except (TypeError, ValueError):
+                # a spec like .0f on a value that isn't a number (say, from a CSV import)
+                text = str(value)
+            values.append(html.escape(text))
+        return self._format(*values)
+
+
+def table(headers, rows, row_template, empty="<p>No rows.</p>"):
+    """
+    Yield an HTML table of `rows`, or `empty` if there are none, CHUNK_ROWS
+    rows per chunk. `row_template` is a Template, or a function of the row
+    returning the Template to use.
+    """
+    pick = row_template if callable(row_template) else lambda row: row_template
+    head = "<table border='1' cellpadding='5'><tr>" + "".join(f"<th>{html.escape(h)}</th>" for h in headers) + "</tr>"
+    chunk = [head]
+    count = 0
+    for row in rows:
+        chunk.append(pick(row).render(row))
+        count += 1
+        if count % CHUNK_ROWS == 0:
+            yield "".join(chunk)
+            chunk = []
+    if count == 0:
+        yield empty
+        return
+    chunk.append("</table>")
+    yield "".join(chunk)
+
+
+def pager(path, params, cursor, next_cursor, cursor_param="cursor"):
+    """
+    Links to the first and next page of a paged listing at `path`. `params`
+    are the query parameters to keep; either link is left out when there is
+    no such page.
+    """
+    def url(query):
+        return html.escape(path + ("?" + urlencode(query) if query else ""))
+    links = []
+    if cursor:
+        links.append(f"<a href='{url(params)}'>First page</a>")
+    if next_cursor:
+        links.append(f"<a href='{url({**params, cursor_param: next_cursor})}'>Next page</a>")
+    return f"<p>{' | '.join(links)}</p>" if links else ""
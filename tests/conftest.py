@@ -0,0 +1,18 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import db
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """A fresh database in a temp directory, which is also the working directory."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(db, "DB_FILE", tmp_path / "test.db")
+    db.init_db()
+    yield db
+    db.close_connections()
@@ -0,0 +1,83 @@
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client(temp_db):
+    import server
+    server.init_data()
+    temp_db.insert_row("cars", {"id": "sold-1", "make": "Kia", "model": "Seltos", "price": 900000, "status": "sold"})
+    client = TestClient(server.app)
+    client.post("/api/register", json={"name": "A", "phone": "9000000001", "password": "pw"})
+    assert client.post("/api/login", json={"phone": "9000000001", "password": "pw"}).status_code == 200
+    return client
+
+
+def holds_and_items(db):
+    conn = db.get_connection()
+    return conn.execute("SELECT COUNT(*) FROM car_holds").fetchone()[0], conn.execute("SELECT COUNT(*) FROM cart_items").fetchone()[0]
+
+
+def test_add_available_car(client, temp_db):
+    assert client.post("/api/cart/add", json={"car_id": "car-1"}).status_code == 200
+    assert holds_and_items(temp_db) == (1, 1)
+
+
+def test_add_unknown_car(client, temp_db):
+    assert client.post("/api/cart/add", json={"car_id": "no-such-car"}).status_code == 404
+    assert client.post("/cart/add", data={"car_id": "no-such-car"}, follow_redirects=False).status_code == 404
+    assert holds_and_items(temp_db) == (0, 0)
+
+
+def test_add_sold_car(client, temp_db):
+    assert client.post("/api/cart/add", json={"car_id": "sold-1"}).status_code == 409
+    assert client.post("/cart/add", data={"car_id": "sold-1"}, follow_redirects=False).status_code == 409
+    assert holds_and_items(temp_db) == (0, 0)
+
+
+def test_add_car_held_by_another_cart(client, temp_db):
+    import server
+    other = TestClient(server.app)
+    other.post("/api/register", json={"name": "B", "phone": "9000000002", "password": "pw"})
+    assert other.post("/api/login", json={"phone": "9000000002", "password": "pw"}).status_code == 200
+    assert "car-1" in [car["id"] for car in other.get("/api/cars").json()]
+    assert client.post("/api/cart/add", json={"car_id": "car-1"}).status_code == 200
+    assert other.post("/api/cart/add", json={"car_id": "car-1"}).status_code == 409
+    assert other.post("/cart/add", data={"car_id": "car-1"}, follow_redirects=False).status_code == 409
+    assert holds_and_items(temp_db) == (1, 1)
+    assert "car-1" not in [car["id"] for car in other.get("/api/cars").json()]
+
+
+def test_concurrent_checkouts_sell_each_car_once(temp_db, monkeypatch):
+    import random
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    import holds
+    import server
+    # holds off, so only the checkout transaction stands between buyers of the same car
+    monkeypatch.setattr(holds, "HOLD_SECONDS", 0)
+    rng = random.Random(1)
+    car_ids = [f"race-{i}" for i in range(10)]
+    carts = {f"buyer-{b}": rng.sample(car_ids, 3) for b in range(40)}
+    with temp_db.transaction("cars", "cart_items") as conn:
+        conn.executemany("INSERT INTO cars (id, make, model, price, status) VALUES (?, 'Kia', 'Seltos', 900000, 'available')",
+                         [(car_id,) for car_id in car_ids])
+        conn.executemany("INSERT INTO cart_items (session_id, car_id, added_at) VALUES (?, ?, '')",
+                         [(session_id, car_id) for session_id, cart in carts.items() for car_id in cart])
+    start = threading.Barrier(len(carts))
+
+    def checkout(session_id):
+        start.wait()
+        return session_id, server.checkout_cart(session_id)[0]
+
+    with ThreadPoolExecutor(len(carts)) as pool:
+        outcomes = dict(pool.map(checkout, carts))
+    conn = temp_db.get_connection()
+    sales = conn.execute("SELECT car_id, session_id FROM sales").fetchall()
+    assert len(sales) == len({car_id for car_id, _ in sales})
+    sold_to = dict(sales)
+    for session_id, ok in outcomes.items():
+        assert all(sold_to.get(car_id) == session_id for car_id in carts[session_id]) == ok
+    assert any(outcomes.values())
+    assert conn.execute("SELECT COUNT(*) FROM cars WHERE status = 'sold'").fetchone()[0] == len(sales)
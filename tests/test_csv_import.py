@@ -0,0 +1,29 @@
+import io
+
+
+def test_import_sales_csv(temp_db):
+    # the cars "owned_by" triggers read from sales, which once broke swapping it in
+    db = temp_db
+    db.insert_row("cars", {"id": "car-1", "make": "Honda", "model": "City", "status": "sold"})
+    db.insert_row("sales", {"order_id": "old", "session_id": "s", "car_id": "car-1", "price": 1, "timestamp": "2020"})
+    text = io.StringIO("order_id,session_id,car_id,price,timestamp,phone\n"
+                       "o-1,s-1,car-1,700000,2024-01-01T00:00:00,9999\n"
+                       "o-2,s-2,car-2,800000,2024-01-02T00:00:00,8888\n")
+    report = db.import_csv("sales", text)
+    assert report == {"loaded": 2, "rejected": 0, "errors": []}
+    rows = db.get_connection().execute("SELECT order_id, phone FROM sales ORDER BY order_id").fetchall()
+    assert rows == [("o-1", "9999"), ("o-2", "8888")]
+    # the owner triggers still work on the imported table
+    before = db.owner_version("9999")
+    db.update_rows("sales", {"order_id": "o-1"}, {"price": 1})
+    assert db.owner_version("9999") != before
+
+
+def test_failed_import_keeps_rows(temp_db):
+    db = temp_db
+    db.insert_row("sales", {"order_id": "keep", "session_id": "s", "car_id": "c", "price": 1, "timestamp": "2020"})
+    try:
+        db.import_csv("sales", io.StringIO("order_id,price\nx,notanumber\n"))
+    except ValueError:
+        pass
+    assert db.get_connection().execute("SELECT order_id FROM sales").fetchall() == [("keep",)]
@@ -0,0 +1,24 @@
+import sqlite3
+
+import pytest
+
+
+def test_missing_table_counts_as_empty(temp_db):
+    assert temp_db.count_rows("no_such_table") == 0
+    assert temp_db.count_by("no_such_table", "status") == {}
+    assert temp_db.delete_rows("no_such_table", {"id": "x"}) == 0
+
+
+def test_lock_timeout_is_not_zero_rows(temp_db, monkeypatch):
+    temp_db.insert_row("cart_items", {"session_id": "s", "car_id": "car-1", "added_at": "2024-01-01"})
+    temp_db.close_connections()
+    monkeypatch.setattr(temp_db, "BUSY_TIMEOUT_MS", 50)
+    writer = sqlite3.connect(temp_db.DB_FILE)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            temp_db.delete_rows("cart_items", {"session_id": "s"})
+    finally:
+        writer.rollback()
+        writer.close()
+    assert temp_db.count_rows("cart_items") == 1
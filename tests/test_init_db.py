@@ -0,0 +1,19 @@
+def versions(db):
+    return dict(db.get_connection().execute("SELECT table_name, version FROM table_versions"))
+
+
+def test_init_db_again_bumps_nothing(temp_db):
+    # every process runs init_db at startup; a bump would empty every cache
+    db = temp_db
+    before = versions(db)
+    db.init_db()
+    assert versions(db) == before
+
+
+def test_init_db_bumps_migrated_table(temp_db):
+    db = temp_db
+    db.get_connection().execute("DROP INDEX idx_contacts_timestamp_contact_id")
+    before = versions(db)
+    db.init_db()
+    after = versions(db)
+    assert {t for t in after if after[t] != before.get(t)} == {"contacts"}
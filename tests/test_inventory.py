@@ -0,0 +1,9 @@
+import inventory
+
+
+def test_status_matches_any_case(temp_db):
+    temp_db.insert_row("cars", {"id": "cap-1", "make": "Kia", "model": "Seltos", "price": 900000, "status": "Available"})
+    temp_db.insert_row("cars", {"id": "sold-1", "make": "Kia", "model": "Sonet", "price": 700000, "status": "Sold"})
+    result = inventory.query({"make": ["kia"]})
+    assert result["ids"] == ["cap-1"]
+    assert result["facets"]["make"] == [{"value": "Kia", "count": 1}]
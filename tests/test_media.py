@@ -0,0 +1,72 @@
+import io
+import os
+import stat
+
+import pytest
+from fastapi.testclient import TestClient
+
+from PIL import Image
+
+import media
+
+
+def png():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def employee(temp_db):
+    import server
+    server.init_data()
+    client = TestClient(server.app)
+    assert client.post("/api/employee/login", json={"username": "admin", "password": "admin123"}).status_code == 200
+    yield client
+    # uploads queue resized copies on a worker pool
+    server.derivatives.shutdown(wait=True)
+
+
+def test_upload_is_readable_by_others(employee):
+    r = employee.post("/api/employee/upload-image", files={"file": ("car.png", png(), "image/png")})
+    assert r.status_code == 200
+    mode = stat.S_IMODE(os.stat(r.json()["url"].lstrip("/")).st_mode)
+    assert mode == media.FILE_MODE and mode & stat.S_IROTH
+
+
+def test_upload_rejects_wrong_type(employee):
+    r = employee.post("/api/employee/upload-image", files={"file": ("car.png", b"not an image", "image/png")})
+    assert r.status_code == 415
+    assert not [n for n in os.listdir(media.KINDS["car_image"]["directory"]) if not n.startswith(".")]
+
+
+def test_derivatives_are_readable_by_others(tmp_path):
+    import derivatives
+    source = tmp_path / "car.png"
+    source.write_bytes(png())
+    for _, filename, _, _ in derivatives.render(source, tmp_path):
+        assert stat.S_IMODE(os.stat(tmp_path / filename).st_mode) == media.FILE_MODE
+
+
+def test_precompressed_copies_are_readable_by_others(tmp_path):
+    import static_files
+    svg = tmp_path / "logo.svg"
+    svg.write_text("<svg xmlns='http://www.w3.org/2000/svg'>" + "<rect/>" * 500 + "</svg>")
+    assert static_files.precompress(svg)
+    assert stat.S_IMODE(os.stat(str(svg) + ".gz").st_mode) == media.FILE_MODE
+
+
+def test_recorded_derivatives_refresh_catalog_only(employee, temp_db):
+    from concurrent.futures import Future
+    import derivatives
+    temp_db.update_rows("cars", {"id": "car-1"}, {"image": "/uploads/car.png"})
+    before = employee.get("/api/cars")
+    cars_version = temp_db.table_version("cars")
+    future = Future()
+    future.set_result([(size, f"car-{size}.webp", width, width) for size, width in derivatives.SIZES.items()])
+    derivatives._record("/uploads/car.png", future)
+    assert temp_db.table_version("cars") == cars_version
+    after = employee.get("/api/cars", headers={"If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    car = next(car for car in after.json() if car["id"] == "car-1")
+    assert car["images"]["thumb"] == f"/{derivatives.SOURCE_DIRECTORY}/car-thumb.webp"
@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.fixture
+def cars(temp_db):
+    for i in range(5):
+        temp_db.insert_row("cars", {"id": f"car-{i}", "make": "Kia", "price": 100 * i, "status": "available"})
+    return temp_db
+
+
+def test_pages_follow_cursor(cars):
+    db = cars
+    first, cursor = db.fetch_page("cars", order_by="price", limit=3)
+    rest, end = db.fetch_page("cars", order_by="price", limit=3, cursor=cursor)
+    assert [r["id"] for r in first + rest] == [f"car-{i}" for i in range(5)] and end is None
+
+
+@pytest.mark.parametrize("position", [["x", {}], [[1], "car-1"], [True, "car-1"], ["car-1"], [1, 2, 3]])
+def test_forged_cursor_is_rejected(cars, position):
+    with pytest.raises(ValueError):
+        cars.fetch_page("cars", order_by="price", limit=3, cursor=cars.encode_cursor(position))
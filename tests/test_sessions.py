@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+
+def test_employee_login_uses_configured_lifetime(temp_db):
+    import server
+    server.init_data()
+    client = TestClient(server.app)
+    r = client.post("/api/employee/login", json={"username": "admin", "password": "admin123"})
+    assert r.status_code == 200
+    assert f"Max-Age={server.EMP_SESSION_MAX_AGE}" in r.headers["set-cookie"]
+    session = temp_db.get_row(server.EMP_SESSIONS_TABLE, {"token": client.cookies[server.EMP_SESSION_COOKIE]})
+    lifetime = (datetime.fromisoformat(session["expires_at"]) - datetime.fromisoformat(session["login_at"])).total_seconds()
+    assert abs(lifetime - server.EMP_SESSION_MAX_AGE) < 5
+
+
+def test_current_customer(temp_db):
+    import server
+    server.init_data()
+    client = TestClient(server.app)
+    assert client.get("/api/user").status_code == 401
+    client.post("/api/register", json={"name": "A", "phone": "9000000001", "password": "pw"})
+    client.post("/api/login", json={"phone": "9000000001", "password": "pw"})
+    assert client.get("/api/user").json() == {"name": "A", "phone": "9000000001"}